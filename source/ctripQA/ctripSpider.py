@@ -9,9 +9,14 @@ Province.
 
 # 导入模块
 import os
-import requests
-from lxml import etree
-from requests.exceptions import Timeout, ProxyError, HTTPError, RequestException, ReadTimeout, TooManyRedirects
+import sys
+
+# 共享的下载引擎等公共模块位于马蜂窝爬虫目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'mafengwo'))
+from fetcher import Fetcher
+from extractors import extract
+from metrics import logger
 
 # 全局变量定义
 HEADER = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) '
@@ -24,62 +29,124 @@ filename = 'HainanQAinfo.txt'
 
 class CtripQASpider:
     # 文档字符串
-
+    '''
+    CtripQASpider class allows users to fetch all questions of a keyword from
+    ctrip asks website, pages are downloaded concurrently by the shared
+    Fetcher and questions are appended to file as each page is parsed.
+    '''
 
     # 爬虫静态成员定义
     base_url = "http://you.ctrip.com/asks/search/p{}"
+    # 首页之后的页面只需要问题列表区块，首页还要读取分页链接
+    list_target = ('ul', 'class', 'asklist')
 
     # 初始化方法
-    def __init__(self, *, kw='海南'):
-        self.questions = list()
+    def __init__(self, *, kw='海南', deduper=None, fetcher=None, output=None):
+        self.count = 0
         self.keyword = kw
-        if not os.path.exists(savePath):
-            os.makedirs(savePath)
-        filePath = os.path.join(savePath, filename)
-        self.file = open(filePath, 'w', encoding='utf-8')
+        # 数据文件名，为None时使用默认文件名
+        self.filename = output or filename
+        # 近似重复问题过滤器，为None时保留全部问题
+        self.deduper = deduper
+        # 已保存的问题，重复运行时不再追加
+        self.seen = set()
+        self.fetcher = fetcher or Fetcher()
+        self.last_page = None
 
 
     # 爬虫主程序
     def run(self, pStart=1, pEnd=50):
-        for page in range(pStart, pEnd+1):
-            html = self.html_downloader(page)
-            if html:
-                self.html_parser(html)
-        self.data_saver()
+        '''
+        Fetches question pages from `pStart` to the real last page (at most
+        `pEnd`), the last page is read from the pager of the first page and
+        shrinks once an empty page is met. Questions already saved in the
+        data file are not appended again.
+
+        Returns the data file path, raises RuntimeError if the first page
+        failed, since the pages to fetch are unknown without it.
+        '''
+        if not os.path.exists(savePath):
+            os.makedirs(savePath)
+        filePath = os.path.join(savePath, self.filename)
+        self.seen = self.saved_questions(filePath)
+        # 追加写入，extractWords只对新增问题增量提取关键词
+        with open(filePath, 'a', encoding='utf-8') as file:
+            self.last_page = None
+            parsed = self.html_downloader(pStart)
+            if parsed is None:
+                raise RuntimeError(f'问答第{pStart}页下载失败，无法获取页数，'
+                                   f'请检查网络后重试！')
+            self.last_page = min(self.get_last_page(parsed) or pEnd, pEnd)
+            self.data_saver(file, self.html_parser(parsed))
+            for page, parsed in self.fetcher.map_unordered(
+                    self.html_downloader, self.pages(pStart+1)):
+                questions = self.html_parser(parsed) \
+                    if parsed is not None else None
+                if parsed is not None and not questions:
+                    # 空页面说明已经超过真实的最后一页
+                    self.last_page = min(self.last_page, page-1)
+                if questions:
+                    self.data_saver(file, questions)
+        logger.info('>>> %s questions saved.', self.count)
+        return filePath
+
+
+    # 待下载页码生成方法
+    def pages(self, start):
+        page = start
+        while page <= self.last_page:
+            yield page
+            page += 1
+
+
+    # 最后页码解析方法
+    def get_last_page(self, parsed):
+        questions, last_page = parsed
+        return last_page
 
 
     # HTTP请求页面方法
     def html_downloader(self, num):
-        try:
-            response = requests.get(self.base_url.format(num),
-                                    params={'keywords': self.keyword},
-                                    headers=HEADER)
-            html = response.text
-            print('>> Request Webpage Success.')
-        except:
-            print('>> Exceptions occured!')
-            html = None
-        finally:
-            return html
+        target = self.list_target if self.last_page else None
+        response = self.fetcher.request_until(
+            'GET', self.base_url.format(num), target,
+            params={'keywords': self.keyword}, headers=HEADER)
+        # 页面在下载线程中解析为(问题列表, 最后页码)
+        return extract('ask', response) if response else None
 
     # 页面解析方法
-    def html_parser(self, html):
-        selector = etree.HTML(html)
-        for question in selector.xpath('//ul[@class="asklist"]/li/p'):
-            self.questions.append(question.xpath('string(.)').strip())
+    def html_parser(self, parsed):
+        questions, last_page = parsed
+        return questions
+
+    # 已保存问题读取方法
+    def saved_questions(self, filePath):
+        # 问答页面没有问题id，以问题文本作为问题的标识
+        if not os.path.exists(filePath):
+            return set()
+        with open(filePath, encoding='utf-8') as file:
+            return {line.strip() for line in file if line.strip()}
 
     # 数据存储方法
-    def data_saver(self):
-        for question in self.questions:
-            self.file.write(question + '\n')
-
-
-    # 析构方法
-    def __del__(self):
-        self.file.close()
+    def data_saver(self, file, questions):
+        new = list()
+        for question in questions:
+            if question not in self.seen:
+                self.seen.add(question)
+                new.append(question)
+        questions = new
+        if self.deduper:
+            questions = list(self.deduper.filter(questions))
+        for question in questions:
+            file.write(question + '\n')
+        file.flush()
+        self.count += len(questions)
 
 
 # 测试代码：
 if __name__ == '__main__':
-    spider = CtripQASpider()
-    spider.run()
+    from dedup import QuestionDeduper
+    from profiler import entry_point
+    with QuestionDeduper() as deduper:
+        spider = CtripQASpider(deduper=deduper)
+        entry_point('CtripQASpider', spider.run)
@@ -1,10 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import jieba
-import jieba.analyse
+import os
+import sys
+import argparse
 
-with open('./ctripqainfos/HainanQAinfo.txt') as file:
-    data = file.read()
-    tag = jieba.analyse.extract_tags(data)
-    print(tag)
+# 共享的问答关键词索引模块位于马蜂窝爬虫目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'mafengwo'))
+from keywords import KeywordIndex
+from settings import KEYWORD_INDEX
+
+
+# 命令行入口函数
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extracts TF-IDF keywords of newly saved QA questions.')
+    parser.add_argument('area', nargs='?', default='海南',
+                        help='area name the questions belong to')
+    parser.add_argument('-k', type=int, default=20,
+                        help='number of keywords to print')
+    parser.add_argument('--file', default='./ctripqainfos/HainanQAinfo.txt',
+                        help='one question per line txt file')
+    parser.add_argument('--index', default=KEYWORD_INDEX,
+                        help='persistent keyword index path')
+    args = parser.parse_args(argv)
+
+    # 只对上次运行后新增的问题分词，并累加到持久化的词频计数中
+    index = KeywordIndex(args.index)
+    index.ingest_file(args.file, area=args.area)
+    for word, weight in index.top_k(args.area, args.k):
+        print(f'{word}\t{weight:.6f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
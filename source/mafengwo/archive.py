@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a ResponseArchive class which keeps every fetched response in
+rolling WARC files, one gzip member per record, with a SQLite index from
+URL to file offset. A record is read back by one memory-mapped slice, and
+a whole crawl is re-extracted sequentially from disk after a parser fix,
+without the network. API keys in URLs, e.g. Baidu's `ak`, are never
+archived.
+
+:Usage:
+    python archive.py list --match 'https://hotels.ctrip.com/hotel/*'
+    python archive.py reparse hotel_detail --output HotelDetails.jsonl
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import sys
+import gzip
+import json
+import mmap
+import time
+import uuid
+import zlib
+import sqlite3
+import argparse
+import threading
+
+# 相关第三方库导入
+
+# 本地库导入
+from fetcher import charset
+from metrics import metrics, logger
+from settings import ARCHIVE_PATH, ARCHIVE_ROLL_BYTES
+
+
+# 全局变量：
+# 各页面类型的默认URL匹配模式（SQLite GLOB语法）
+PAGE_URLS = {
+    'resort': 'http://www.mafengwo.cn/poi/*',
+    'hotel_list': 'https://hotels.ctrip.com/hotel/*/p*',
+    'hotel_detail': 'https://hotels.ctrip.com/hotel/*.html*',
+    'question': 'http://www.mafengwo.cn/qa/ajax_qa/more*',
+    'ask': 'http://you.ctrip.com/asks/search/p*',
+}
+# 记录中的响应体已解码，不再保存传输层首部
+DROP_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+# 存档前从URL中去掉的密钥参数
+SECRET_PARAMS = ('ak',)
+# 进程共享的存档实例
+shared = None
+shared_lock = threading.Lock()
+
+
+# 函数定义：
+
+# 共享存档获取函数
+def shared_archive():
+    # 文档字符串
+    '''
+    Returns the archive shared by all fetchers of this process, files of
+    different processes never collide as their names carry the pid.
+    '''
+    # 方法实现
+    global shared
+    with shared_lock:
+        if shared is None:
+            shared = ResponseArchive()
+        return shared
+
+
+# URL密钥去除函数
+def public_url(url):
+    # 文档字符串
+    '''
+    Returns `url` without query parameters in `SECRET_PARAMS`, the other
+    parameters are kept as they were encoded.
+    '''
+    # 方法实现
+    base, mark, query = url.partition('?')
+    if not mark:
+        return url
+    query, hash_mark, fragment = query.partition('#')
+    params = [param for param in query.split('&')
+              if param.partition('=')[0] not in SECRET_PARAMS]
+    return base + ('?' + '&'.join(params) if params else '') + hash_mark + \
+        fragment
+
+
+# WARC记录构建函数
+def warc_record(response, content, truncated=False):
+    # 文档字符串
+    '''
+    Builds a WARC/1.0 response record of `response` with its decoded body
+    `content`, secrets are dropped from its URL.
+    '''
+    # 方法实现
+    reason = getattr(response, 'reason', None) or \
+        getattr(response, 'reason_phrase', '')
+    lines = [f'HTTP/1.1 {response.status_code} {reason}']
+    lines.extend(f'{key}: {value}' for key, value in response.headers.items()
+                 if key.lower() not in DROP_HEADERS)
+    lines.append(f'Content-Length: {len(content)}')
+    block = ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + content
+    headers = [
+        'WARC/1.0',
+        'WARC-Type: response',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+        'WARC-Date: ' + time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        f'WARC-Target-URI: {public_url(str(response.url))}',
+        'Content-Type: application/http; msgtype=response',
+        f'Content-Length: {len(block)}',
+    ]
+    if truncated:
+        headers.insert(-2, 'WARC-Truncated: length')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8') + block + \
+        b'\r\n\r\n'
+
+
+# WARC记录解析函数
+def parse_record(record):
+    # 文档字符串
+    '''
+    Parses a decompressed WARC response record.
+
+    :Returns:
+     - an :class:`ArchivedResponse`.
+    '''
+    # 方法实现
+    warc_head, _, rest = record.partition(b'\r\n\r\n')
+    warc = dict(line.split(': ', 1) for line
+                in warc_head.decode('utf-8').split('\r\n')[1:])
+    block = rest[:int(warc['Content-Length'])]
+    http_head, _, content = block.partition(b'\r\n\r\n')
+    status_line, *lines = http_head.decode('utf-8').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines)
+    return ArchivedResponse(warc['WARC-Target-URI'],
+                            int(status_line.split(' ', 2)[1]), headers,
+                            content, 'WARC-Truncated' in warc)
+
+
+# 类定义：
+
+# 存档响应
+class ArchivedResponse(object):
+    # 文档字符串
+    '''
+    ArchivedResponse class is a response read back from the archive, which
+    has `url`, `status_code`, `headers`, `content`, `encoding`, `text` and
+    `json` as a `requests` response, so spiders and extractors take it as
+    is. `truncated` is True if the body was cut short by a streamed parse.
+    '''
+
+    # 初始化方法
+    def __init__(self, url, status_code, headers, content, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+        self.encoding = charset(self)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def __bool__(self):
+        return self.status_code < 400
+
+
+# 响应存档
+class ResponseArchive(object):
+    # 文档字符串
+    '''
+    ResponseArchive class appends responses to rolling `.warc.gz` files in
+    `path`. Every record is its own gzip member, as usual for WARC, so it
+    can be read alone from its offset. The `index.sqlite` side index maps
+    URL to (file, offset, length), and is shared by the archives of all
+    crawl processes.
+
+    :Usage:
+        with ResponseArchive() as archive:
+            archive.write(response)
+            page = archive.read(url)
+            for page in archive.records('https://hotels.ctrip.com/*'):
+                ...
+
+    '''
+
+    # 初始化方法
+    def __init__(self, path=ARCHIVE_PATH, roll_bytes=ARCHIVE_ROLL_BYTES):
+        # 文档字符串
+        '''
+        Initialize a new instance of the ResponseArchive.
+
+        :Args:
+         - path : a str of archive directory.
+         - roll_bytes : an int of size after which writing moves on to a
+         new file.
+        '''
+        # 方法实现
+        self.path = path
+        self.roll_bytes = roll_bytes
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.prefix = time.strftime('%Y%m%d%H%M%S') + f'-{os.getpid()}'
+        self.sequence = 0
+        self.file = None
+        self.maps = dict()
+        self.lock = threading.Lock()
+        self.connection = None
+        self.connect()
+
+    # 索引连接方法
+    def connect(self):
+        # 文档字符串
+        '''
+        Returns the connection of the SQLite index, opens it again if the
+        archive was closed.
+        '''
+        # 方法实现
+        if self.connection is None:
+            self.connection = sqlite3.connect(
+                os.path.join(self.path, 'index.sqlite'), timeout=60,
+                check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS records(
+                    url TEXT, file TEXT, offset INTEGER, length INTEGER,
+                    status INTEGER, fetched REAL, truncated INTEGER);
+                CREATE INDEX IF NOT EXISTS idx_url ON records(url, fetched);
+            ''')
+        return self.connection
+
+    # 存档文件切换方法
+    def roll(self):
+        if self.file is not None:
+            self.file.close()
+        self.sequence += 1
+        self.name = f'{self.prefix}-{self.sequence:05d}.warc.gz'
+        self.file = open(os.path.join(self.path, self.name), 'ab')
+
+    # 响应写入方法
+    def write(self, response, content=None, truncated=False):
+        # 文档字符串
+        '''
+        Appends a gzip compressed record of `response` and indexes it by
+        its URL without secrets.
+
+        :Args:
+         - response : a :class:`Response` whose body is read.
+         - content : bytes of body read from a streamed response, None for
+         `response.content`.
+         - truncated : a bool of whether `content` stops before the end of
+         the body.
+        '''
+        # 方法实现
+        content = response.content if content is None else content
+        data = gzip.compress(warc_record(response, content, truncated), 6)
+        with self.lock:
+            if self.file is None or self.file.tell() >= self.roll_bytes:
+                self.roll()
+            offset = self.file.tell()
+            self.file.write(data)
+            self.file.flush()
+            connection = self.connect()
+            connection.execute(
+                'INSERT INTO records VALUES(?, ?, ?, ?, ?, ?, ?)',
+                (public_url(str(response.url)), self.name, offset, len(data),
+                 response.status_code, time.time(), int(truncated)))
+            connection.commit()
+        metrics.inc('archive_bytes_total', len(data))
+
+    # 存档文件映射方法
+    def mapped(self, name, end):
+        # 文档字符串
+        '''
+        Returns the memory map of archive file `name`, mapped again if the
+        file grew past the old map.
+        '''
+        # 方法实现
+        mapped = self.maps.get(name)
+        if mapped is None or len(mapped) < end:
+            with open(os.path.join(self.path, name), 'rb') as file:
+                mapped = self.maps[name] = mmap.mmap(file.fileno(), 0,
+                                                     access=mmap.ACCESS_READ)
+        return mapped
+
+    # 记录读取方法
+    def load(self, name, offset, length):
+        mapped = self.mapped(name, offset + length)
+        # 16 + MAX_WBITS解压单个gzip成员
+        return parse_record(zlib.decompress(mapped[offset:offset + length],
+                                            16 + zlib.MAX_WBITS))
+
+    # 最新响应读取方法
+    def read(self, url):
+        # 文档字符串
+        '''
+        Returns the latest :class:`ArchivedResponse` of `url`, or None if it
+        was never archived.
+        '''
+        # 方法实现
+        row = self.connect().execute(
+            'SELECT file, offset, length FROM records WHERE url = ? '
+            'ORDER BY fetched DESC LIMIT 1', (public_url(url),)).fetchone()
+        return self.load(*row) if row else None
+
+    # 存档记录遍历方法
+    def records(self, match=None, latest=True):
+        # 文档字符串
+        '''
+        Yields archived responses in file order, so files are read
+        sequentially.
+
+        :Args:
+         - match : a str of SQLite GLOB pattern of URLs, None for all.
+         - latest : a bool of whether to keep only the latest record of
+         each URL.
+        '''
+        # 方法实现
+        where = 'WHERE url GLOB ?' if match else ''
+        query = f'SELECT url, file, offset, length, fetched FROM records ' \
+                f'{where}'
+        if latest:
+            query = f'SELECT file, offset, length FROM ({query}) AS r ' \
+                    f'WHERE fetched = (SELECT MAX(fetched) FROM records ' \
+                    f'WHERE url = r.url)'
+        else:
+            query = f'SELECT file, offset, length FROM ({query})'
+        rows = self.connect().execute(query + ' ORDER BY file, offset',
+                                       (match,) if match else ()).fetchall()
+        for row in rows:
+            yield self.load(*row)
+
+    # 存档统计方法
+    def count(self, match=None):
+        where = 'WHERE url GLOB ?' if match else ''
+        return self.connect().execute(
+            f'SELECT COUNT(DISTINCT url), COUNT(*), COALESCE(SUM(length), 0) '
+            f'FROM records {where}', (match,) if match else ()).fetchone()
+
+    # 存档关闭方法
+    def close(self):
+        # 文档字符串
+        '''
+        Closes the archive file, memory maps and index, they are opened again
+        on next use, so closing the archive shared by fetchers is safe.
+        '''
+        # 方法实现
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            for mapped in self.maps.values():
+                mapped.close()
+            self.maps = dict()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# 存档页面重新提取函数
+def reparse(archive, page_type, match=None, backend=None, output=None):
+    # 文档字符串
+    '''
+    Extracts every archived page of `page_type` again, e.g. after a parser
+    fix, and writes {"url", "item"} json lines to `output`.
+
+    :Returns:
+     - a tuple of (pages, seconds).
+    '''
+    # 方法实现
+    from extractors import extract
+    match = match or PAGE_URLS[page_type]
+    pages = 0
+    start = time.perf_counter()
+    file = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    try:
+        for response in archive.records(match):
+            page = response
+            if page_type == 'question':
+                # 问答异步接口的页面在json的html字段中
+                page = (response.json().get('data') or {}).get('html', '')
+            try:
+                item = extract(page_type, page, backend)
+            except Exception as e:
+                logger.warning('>> failed extracting %s: %s', response.url, e)
+                continue
+            file.write(json.dumps({'url': response.url, 'item': item},
+                                  ensure_ascii=False) + '\n')
+            pages += 1
+    finally:
+        if output:
+            file.close()
+    return pages, time.perf_counter() - start
+
+
+# 命令行入口函数
+def main(argv=None):
+    # 方法实现
+    parser = argparse.ArgumentParser(
+        description='Reads the response archive without the network.')
+    parser.add_argument('--path', default=ARCHIVE_PATH,
+                        help='archive directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    listing = commands.add_parser('list', help='archived urls and sizes')
+    listing.add_argument('--match', help='GLOB pattern of urls')
+    again = commands.add_parser('reparse',
+                                help='extract archived pages again')
+    again.add_argument('page_type', choices=sorted(PAGE_URLS))
+    again.add_argument('--match', help='GLOB pattern of urls, defaults to '
+                                       'the pattern of page type')
+    again.add_argument('--backend', help='parser backend, defaults to the '
+                                         'backend of page type')
+    again.add_argument('--output', help='json lines file, default stdout')
+    args = parser.parse_args(argv)
+
+    with ResponseArchive(args.path) as archive:
+        if args.command == 'list':
+            urls, records, size = archive.count(args.match)
+            print(f'{urls} urls, {records} records, {size} bytes')
+            return 0
+        pages, seconds = reparse(archive, args.page_type, args.match,
+                                 args.backend, args.output)
+        print(f'{pages} pages extracted in {seconds:.2f}s', file=sys.stderr)
+    return 0
+
+
+# 测试代码：
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a registry of save backends for spiders and savers. A backend is
+registered by name with the packages it needs, its capabilities and the
+`module:function` paths of its dumping/loading functions, which are only
+imported when the backend is selected, so a json worker never imports
+pyarrow or any database driver.
+
+Capabilities of backends:
+ - records : loads dict items back as they were dumped, with their value
+   types, so the data can be merged into, e.g. by `CtripSpider.refresh`.
+ - stream : dumps items one by one from an iterator without holding them
+   all, e.g. items of a frontier sink.
+ - swap : loads into a staging table/collection and swaps it over the live
+   one.
+
+:Usage:
+    backend = get_backend('parquet', kind='file')
+    backend.dump(items, backend.path('HainanHotels'), kind='hotel')
+    register('orc', 'file', suffix='orc', requires=('pyarrow',),
+             capabilities=('records',), dump='plugin:dump_orc',
+             load='plugin:load_orc')
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import csv
+import json
+import importlib
+from importlib.util import find_spec
+
+# 相关第三方库导入
+# 后端依赖的第三方库在选中该后端时才导入
+
+# 本地库导入
+from settings import save_path
+
+
+# 全局变量：
+# 后端类型：数据文件或数据库
+KINDS = ('file', 'database')
+# 后端能力
+CAPABILITIES = ('records', 'stream', 'swap')
+# 已注册的存储后端
+BACKENDS = dict()
+
+
+# 函数定义：
+
+# 存储后端注册函数
+def register(name, kind, *, capabilities=(), requires=(),
+             suffix=None, dump=None, load=None):
+    # 文档字符串
+    '''
+    Registers a save backend, a registered backend of the same name is
+    replaced so that plugins can override builtin ones.
+
+    :Args:
+     - name : a str of backend name, i.e. the `save_mode` to select it.
+     - kind : a str of `file` or `database`.
+     - capabilities : a sequence of str in `CAPABILITIES`.
+     - requires : a sequence of top level module names the backend needs.
+     - suffix : a str of data file suffix, None for a dataset directory.
+     - dump : a str of `module:function` path of the dumping function
+       `dump(items, path, kind=None, key=None)` of file backends.
+     - load : a str of `module:function` path of the loading function
+       `load(path, key=None)` of file backends.
+
+    :Returns:
+     - the registered :class:`SaveBackend`.
+    '''
+    # 方法实现
+    if kind not in KINDS:
+        raise RuntimeError(f'存储后端类型{kind}不存在，请输入'
+                           f'{"、".join(KINDS)}！')
+    unknown = set(capabilities) - set(CAPABILITIES)
+    if unknown:
+        raise RuntimeError(f'存储后端能力{"、".join(sorted(unknown))}不存在，'
+                           f'请输入{"、".join(CAPABILITIES)}！')
+    BACKENDS[name] = SaveBackend(name, kind, capabilities, requires, suffix,
+                                 dump, load)
+    return BACKENDS[name]
+
+
+# 存储后端列举函数
+def backend_names(kind=None, capability=None):
+    # 文档字符串
+    '''
+    Returns names of registered backends of `kind` supporting `capability`,
+    None for any.
+    '''
+    # 方法实现
+    return tuple(name for name, backend in BACKENDS.items()
+                 if kind in (None, backend.kind)
+                 and (capability is None or backend.supports(capability)))
+
+
+# 存储后端获取函数
+def get_backend(name, kind=None):
+    # 文档字符串
+    '''
+    Returns the registered backend `name` of `kind`, None for any kind.
+    '''
+    # 方法实现
+    backend = BACKENDS.get(name)
+    if backend is None or kind not in (None, backend.kind):
+        raise RuntimeError(f'存储模式指定有误，请输入'
+                           f'{"、".join(backend_names(kind))}')
+    return backend
+
+
+# json文件写入函数
+def dump_json(items, path, kind=None, key=None):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(items, file, ensure_ascii=False)
+
+
+# json文件读取函数
+def load_json(path, key=None):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+# json lines文件写入函数
+def dump_jsonl(items, path, kind=None, key=None):
+    with open(path, 'w', encoding='utf-8') as file:
+        for item in items:
+            file.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+# json lines文件读取函数
+def load_jsonl(path, key=None):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+# csv单元格编码函数
+def csv_cell(value):
+    # 文档字符串
+    '''
+    Encodes a value as a csv cell which `csv_value` decodes back: None is
+    an empty cell, a str is kept as is unless it would read as json, other
+    values are json text.
+    '''
+    # 方法实现
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        try:
+            json.loads(value)
+        except ValueError:
+            if value:
+                return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+# csv单元格解码函数
+def csv_value(cell):
+    if cell == '':
+        return None
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return cell
+
+
+# csv文件写入函数
+def dump_csv(items, path, kind=None, key=None):
+    # 文档字符串
+    '''
+    Writes dict items as csv rows, columns are keys of the first item and
+    cells are encoded by `csv_cell`, so numbers, bools, None and nested
+    lists and dicts keep their types when loaded.
+    '''
+    # 方法实现
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = None
+        for item in items:
+            if writer is None:
+                writer = csv.DictWriter(file, fieldnames=list(item),
+                                        extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({k: csv_cell(v) for k, v in item.items()})
+
+
+# csv文件读取函数
+def load_csv(path, key=None):
+    with open(path, encoding='utf-8', newline='') as file:
+        return [{k: csv_value(v) for k, v in row.items()}
+                for row in csv.DictReader(file)]
+
+
+# txt文件写入函数
+def dump_txt(items, path, kind=None, key=None):
+    # 只是初步用于QA问题爬取，每行一个字符串
+    with open(path, 'w', encoding='utf-8') as file:
+        for item in items:
+            file.write(''.join([item, '\n']))
+
+
+# txt文件读取函数
+def load_txt(path, key=None):
+    with open(path, encoding='utf-8') as file:
+        return [line.rstrip('\n') for line in file]
+
+
+# 函数路径解析函数
+def resolve(target):
+    module, _, attr = target.partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+
+# 类定义：
+
+# 存储后端
+class SaveBackend(object):
+    # 文档字符串
+    '''
+    SaveBackend class describes a registered save backend, file backends
+    dump and load data files through functions imported on first use.
+
+    :Usage:
+        backend = get_backend('jsonl')
+        backend.dump(frontier.items('poi'), backend.path('HainanPOIs'))
+
+    '''
+
+    # 初始化方法
+    def __init__(self, name, kind, capabilities=(), requires=(),
+                 suffix=None, dump=None, load=None):
+        self.name = name
+        self.kind = kind
+        self.capabilities = frozenset(capabilities)
+        self.requires = tuple(requires)
+        self.suffix = suffix
+        self.dumper = dump
+        self.loader = load
+
+    # 能力判断方法
+    def supports(self, capability):
+        return capability in self.capabilities
+
+    # 依赖检查方法
+    def check(self):
+        # 文档字符串
+        '''
+        Raises RuntimeError if any package the backend needs is missing,
+        packages are only looked up, not imported.
+        '''
+        # 方法实现
+        missing = [module for module in self.requires
+                   if find_spec(module) is None]
+        if missing:
+            raise RuntimeError(f'存储后端{self.name}需要安装'
+                               f'{"、".join(missing)}！')
+        return self
+
+    # 数据文件路径方法
+    def path(self, name, directory=None):
+        file_name = f'{name}.{self.suffix}' if self.suffix else name
+        return os.path.join(directory or save_path, file_name)
+
+    # 数据写入方法
+    def dump(self, items, path, kind=None, key=None):
+        # 文档字符串
+        '''
+        Dumps `items` into data file `path`.
+
+        :Args:
+         - items : an iterable of items, materialized into a list first
+           unless the backend supports `stream`.
+         - path : a str of data file path, see `path`.
+         - kind : a str of item kind, needed by columnar backends.
+         - key : a str of shard key, e.g. area name, used by datasets.
+        '''
+        # 方法实现
+        if self.dumper is None:
+            raise RuntimeError(f'存储后端{self.name}不能写入数据文件！')
+        if not self.supports('stream') and not isinstance(items, list):
+            items = list(items)
+        return resolve(self.check().dumper)(items, path, kind, key)
+
+    # 数据读取方法
+    def load(self, path, key=None):
+        # 文档字符串
+        '''
+        Loads items of data file `path`, only items of `key` for datasets,
+        None for all items.
+        '''
+        # 方法实现
+        if self.loader is None:
+            raise RuntimeError(f'存储后端{self.name}不能读取数据文件！')
+        return resolve(self.check().loader)(path, key)
+
+    def __repr__(self):
+        return (f'SaveBackend({self.name!r}, {self.kind!r}, '
+                f'{sorted(self.capabilities)})')
+
+
+# 内置存储后端：
+register('json', 'file', capabilities=('records',), suffix='json',
+         dump='backends:dump_json', load='backends:load_json')
+register('jsonl', 'file', capabilities=('records', 'stream'), suffix='jsonl',
+         dump='backends:dump_jsonl', load='backends:load_jsonl')
+register('csv', 'file', capabilities=('records', 'stream'), suffix='csv',
+         dump='backends:dump_csv', load='backends:load_csv')
+register('txt', 'file', capabilities=('stream',), suffix='txt',
+         dump='backends:dump_txt', load='backends:load_txt')
+register('parquet', 'file', capabilities=('records',), requires=('pyarrow',),
+         suffix='parquet', dump='columnar:dump_columnar',
+         load='columnar:load_columnar')
+register('feather', 'file', capabilities=('records',), requires=('pyarrow',),
+         suffix='feather', dump='columnar:dump_columnar',
+         load='columnar:load_columnar')
+register('shards', 'file', capabilities=('records', 'stream'),
+         dump='shards:dump_shards', load='shards:load_shards')
+register('mongodb', 'database', capabilities=('swap',),
+         requires=('pymongo',))
+register('mysql', 'database', capabilities=('swap',), requires=('pymysql',))
+register('neo4j', 'database', requires=('py2neo',))
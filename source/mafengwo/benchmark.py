@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Benchmarks of the crawl stack which run without the real websites.
+
+`transport` serves fixed size pages with a fixed latency from a local
+server speaking both HTTP/1.1 and cleartext HTTP/2 (hypercorn required),
+and compares requests per second of every fetcher transport.
+
+`parity` extracts every recorded page (see `RECORD_PAGES`) with every
+parser backend and fails if any backend's result differs from lxml's.
+`parser` times the backends per page type, and `--save` writes the fastest
+backend with parity of each page type to `PARSER_BACKENDS_PATH`.
+
+:Usage:
+    python benchmark.py transport --requests 2000 --workers 64 \\
+                                  --latency 0.05 --size 200000
+    python benchmark.py parity --pages ./SmartTripData/PageSamples
+    python benchmark.py parity --pages ../tests/fixtures/pages
+    python benchmark.py parser --pages ./SmartTripData/PageSamples --save
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+
+# 相关第三方库导入
+
+# 本地库导入
+from fetcher import Fetcher
+from extractors import PAGE_TYPES, BACKENDS, extract
+from settings import PAGE_SAMPLES_PATH, PARSER_BACKENDS_PATH
+
+
+# 函数定义：
+
+# 空闲端口获取函数
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# 结果表格式化函数
+def format_table(rows):
+    widths = [max(len(str(row[i])) for row in rows)
+              for i in range(len(rows[0]))]
+    lines = ['  '.join(str(cell).ljust(width) for cell, width
+                       in zip(row, widths)) for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+# 传输层基准测试函数
+def bench_transport(requests=2000, workers=64, latency=0.05, size=200000,
+                    transports=('requests', 'http2')):
+    # 文档字符串
+    '''
+    Fetches `requests` distinct pages from a local server through every
+    transport with `workers` fetch threads.
+
+    :Returns:
+     - a list of (transport, requests, seconds, requests per second, failed)
+       rows.
+    '''
+    # 方法实现
+    rows = [('transport', 'requests', 'seconds', 'req/s', 'failed')]
+    with BenchServer(latency, size) as server:
+        for name in transports:
+            if name == 'http2':
+                # 本地服务器是明文h2c，需要以先验知识直接使用HTTP/2
+                from transport import Http2Transport
+                transport = Http2Transport(workers, http1=False)
+            else:
+                transport = name
+            fetcher = Fetcher(workers=workers, transport=transport)
+            urls = [f'{server.url}/page/{num}' for num in range(requests)]
+            start = time.perf_counter()
+            failed = sum(response is None for _, response
+                         in fetcher.map_unordered(
+                             lambda url: fetcher.request('GET', url), urls))
+            seconds = time.perf_counter() - start
+            fetcher.close()
+            rows.append((name, requests, f'{seconds:.2f}',
+                         f'{requests / seconds:.1f}', failed))
+    return rows
+
+
+# 页面样本读取函数
+def load_samples(pages):
+    # 文档字符串
+    '''
+    Reads recorded pages under `pages`/<page_type>/.
+
+    :Returns:
+     - a dict of page type to a list of (file name, utf-8 bytes) pairs.
+    '''
+    # 方法实现
+    samples = dict()
+    for page_type in PAGE_TYPES:
+        sample_dir = os.path.join(pages, page_type)
+        if not os.path.isdir(sample_dir):
+            continue
+        for name in sorted(os.listdir(sample_dir)):
+            with open(os.path.join(sample_dir, name), 'rb') as file:
+                samples.setdefault(page_type, []).append((name, file.read()))
+    return samples
+
+
+# 提取结果序列化函数
+def dump_result(page_type, page, backend):
+    try:
+        return json.dumps(extract(page_type, page, backend),
+                          ensure_ascii=False, sort_keys=True)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+
+# 解析后端一致性检查函数
+def check_parity(samples, backends=tuple(BACKENDS)):
+    # 文档字符串
+    '''
+    Extracts every sample with every backend and compares the json of each
+    result with lxml's.
+
+    :Returns:
+     - a list of (page type, backend, pages, mismatched) rows, and a list of
+       (page type, file name, backend, expected, got) mismatches.
+    '''
+    # 方法实现
+    rows = [('page', 'backend', 'pages', 'mismatched')]
+    mismatches = list()
+    for page_type, pages in samples.items():
+        expected = [dump_result(page_type, page, 'lxml') for _, page in pages]
+        for backend in backends:
+            if backend == 'lxml':
+                continue
+            failed = 0
+            for (name, page), want in zip(pages, expected):
+                got = dump_result(page_type, page, backend)
+                if got != want:
+                    failed += 1
+                    mismatches.append((page_type, name, backend, want, got))
+            rows.append((page_type, backend, len(pages), failed))
+    return rows, mismatches
+
+
+# 解析后端基准测试函数
+def bench_parser(samples, repeat=20, backends=tuple(BACKENDS)):
+    # 文档字符串
+    '''
+    Extracts the samples of every page type `repeat` times with every
+    backend, and picks the fastest backend of each page type among lxml and
+    the backends with parity on all its samples.
+
+    :Returns:
+     - a list of (page type, backend, pages, ms per page, speedup, parity)
+       rows, and a dict of page type to picked backend.
+    '''
+    # 方法实现
+    _, mismatches = check_parity(samples, backends)
+    failed = {(page_type, backend) for page_type, _, backend, _, _
+              in mismatches}
+    rows = [('page', 'backend', 'pages', 'ms/page', 'speedup', 'parity')]
+    picked = dict()
+    for page_type, pages in samples.items():
+        # 结果不一致的后端不计时，也不会被选中
+        seconds = dict()
+        for backend in backends:
+            if (page_type, backend) in failed:
+                continue
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for _, page in pages:
+                    extract(page_type, page, backend)
+            seconds[backend] = time.perf_counter() - start
+        for backend in backends:
+            if backend not in seconds:
+                rows.append((page_type, backend, len(pages), '-', '-', False))
+                continue
+            rows.append((page_type, backend, len(pages),
+                         f'{seconds[backend] * 1000 / repeat / len(pages):.3f}',
+                         f'{seconds["lxml"] / seconds[backend]:.2f}x', True))
+        picked[page_type] = min(seconds, key=seconds.get)
+    return rows, picked
+
+
+# 类定义：
+
+# 本地测试服务器
+class BenchServer(object):
+    # 文档字符串
+    '''
+    BenchServer class runs a hypercorn server in a background thread, which
+    answers every request with a `size` bytes html page after `latency`
+    seconds, over HTTP/1.1 or cleartext HTTP/2.
+    '''
+
+    def __init__(self, latency, size):
+        # 按需导入hypercorn，缺少时在主线程报错
+        from hypercorn.config import Config
+        from hypercorn.asyncio import serve
+        self.hypercorn_serve = serve
+        self.latency = latency
+        self.body = (b'<html><body>' + b'x' * max(size - 27, 0) +
+                     b'</body></html>')
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.config = Config()
+        self.config.bind = [f'127.0.0.1:{self.port}']
+        self.config.loglevel = 'WARNING'
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run,
+                                       args=(self.serve(),),
+                                       name='bench-server', daemon=True)
+
+    # ASGI应用
+    async def app(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        await asyncio.sleep(self.latency)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type',
+                                 b'text/html; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        self.ready.set()
+        await self.hypercorn_serve(self.app, self.config,
+                                   shutdown_trigger=self.stopped.wait)
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait()
+        # 等待端口开始监听
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', self.port)).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.loop.call_soon_threadsafe(self.stopped.set)
+        self.thread.join()
+
+
+# 命令行入口函数
+def main(argv=None):
+    # 方法实现
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the crawl stack locally.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    transport = commands.add_parser(
+        'transport', help='requests per second of fetcher transports')
+    transport.add_argument('--requests', type=int, default=2000)
+    transport.add_argument('--workers', type=int, default=64,
+                           help='fetch threads, i.e. requests in flight')
+    transport.add_argument('--latency', type=float, default=0.05,
+                           help='server seconds per response')
+    transport.add_argument('--size', type=int, default=200000,
+                           help='bytes per page')
+    transport.add_argument('--transports', default='requests,http2')
+    parity = commands.add_parser(
+        'parity', help='identical results of parser backends on samples')
+    parity.add_argument('--pages', default=PAGE_SAMPLES_PATH,
+                        help='directory of recorded pages')
+    parity.add_argument('--backends', default=','.join(BACKENDS))
+    parser_bench = commands.add_parser(
+        'parser', help='milliseconds per page of parser backends')
+    parser_bench.add_argument('--pages', default=PAGE_SAMPLES_PATH,
+                              help='directory of recorded pages')
+    parser_bench.add_argument('--backends', default=','.join(BACKENDS))
+    parser_bench.add_argument('--repeat', type=int, default=20)
+    parser_bench.add_argument('--save', action='store_true',
+                              help='write picked backends to '
+                                   'PARSER_BACKENDS_PATH')
+    args = parser.parse_args(argv)
+
+    if args.command == 'transport':
+        print(format_table(bench_transport(
+            args.requests, args.workers, args.latency, args.size,
+            args.transports.split(','))))
+        return 0
+
+    samples = load_samples(args.pages)
+    if not samples:
+        print(f'no recorded pages under {args.pages}, '
+              f'set RECORD_PAGES = True and crawl first.')
+        return 1
+    backends = ['lxml'] + [backend for backend in args.backends.split(',')
+                           if backend != 'lxml']
+    if args.command == 'parity':
+        rows, mismatches = check_parity(samples, backends)
+        print(format_table(rows))
+        for page_type, name, backend, want, got in mismatches:
+            print(f'\n{page_type}/{name} {backend}:\n'
+                  f'  lxml: {want}\n  {backend}: {got}')
+        return 1 if mismatches else 0
+
+    rows, picked = bench_parser(samples, args.repeat, backends)
+    print(format_table(rows))
+    print(json.dumps(picked, ensure_ascii=False))
+    if args.save:
+        save_dir = os.path.dirname(PARSER_BACKENDS_PATH)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        with open(PARSER_BACKENDS_PATH, 'w', encoding='utf-8') as file:
+            json.dump(picked, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+# 测试代码：
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines typed columnar schemas of all spiders' items and helper functions to
+write and read them as Parquet or Arrow IPC(Feather) files.
+
+Columns marked as json columns hold json text of their values, for a map
+column json text of each map value, so nested values of any type are read
+back as they were written. Items of kinds without a schema, e.g. spiders
+without `ITEM_KIND`, are written with one json column per item key.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import json
+
+# 相关第三方库导入
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+
+# 本地库导入
+from settings import ROW_GROUP_SIZE
+
+
+# 全局变量：
+# 字符串列表类型
+STR_LIST = pa.list_(pa.string())
+# json列的字段元数据
+JSON_METADATA = {b'encoding': b'json'}
+
+# 马蜂窝景点数据表结构
+RESORT_SCHEMA = pa.schema([
+    ('poi_id', pa.int64()),
+    ('resortName', pa.string()),
+    ('areaName', pa.string()),
+    ('areaId', pa.int64()),
+    ('address', pa.string()),
+    ('lat', pa.float64()),
+    ('lng', pa.float64()),
+    ('introduction', pa.string()),
+    ('openInfo', pa.string()),
+    ('ticketsInfo', pa.string()),
+    ('transInfo', pa.string()),
+    ('tel', pa.string()),
+    ('item_site', pa.string()),
+    ('item_time', pa.string()),
+    ('payAbstracts', pa.string()),
+    ('source', pa.string()),
+    ('timeStamp', pa.string()),
+])
+# 携程酒店数据表结构
+HOTEL_SCHEMA = pa.schema([
+    ('hotel_id', pa.int64()),
+    ('hotel_name', pa.string()),
+    ('address', pa.string()),
+    ('business_zone', pa.string()),
+    ('lowest_price', pa.int64()),
+    ('hotel_label', STR_LIST),
+    ('newbooking', pa.string()),
+    ('hotel_level', pa.string()),
+    ('hotel_score', pa.float64()),
+    ('hotel_proposition', pa.float64()),
+    ('judge_count', pa.int64()),
+    ('recommend', pa.string()),
+    ('ctrip_qualified', pa.bool_()),
+    ('ctrip_star', pa.int64()),
+    ('country_star', pa.int64()),
+    ('ctrip_corporate', pa.string()),
+    ('sale_amount', pa.int64()),
+    ('reserve_count', pa.float64()),
+    ('contact', pa.string()),
+    ('introduction', pa.string()),
+    ('hotel_facilities', pa.map_(pa.string(), STR_LIST)),
+    pa.field('hotel_policy', pa.map_(pa.string(), pa.string()),
+             metadata=JSON_METADATA),
+    ('surround_facilities', pa.map_(pa.string(), STR_LIST)),
+])
+# 问答数据表结构
+QUESTION_SCHEMA = pa.schema([
+    ('question', pa.string()),
+])
+# 百度POI数据表结构
+POI_SCHEMA = pa.schema([
+    ('uid', pa.string()),
+    ('name', pa.string()),
+    ('location', pa.struct([('lat', pa.float64()), ('lng', pa.float64())])),
+    ('address', pa.string()),
+    ('province', pa.string()),
+    ('city', pa.string()),
+    ('area', pa.string()),
+    ('street_id', pa.string()),
+    ('telephone', pa.string()),
+    ('detail', pa.int64()),
+    pa.field('detail_info', pa.map_(pa.string(), pa.string()),
+             metadata=JSON_METADATA),
+    ('tags', STR_LIST),
+])
+
+# 爬虫数据类型到表结构的映射
+SCHEMAS = {
+    'resort': RESORT_SCHEMA,
+    'hotel': HOTEL_SCHEMA,
+    'question': QUESTION_SCHEMA,
+    'poi': POI_SCHEMA,
+}
+# 列式文件格式及其文件后缀
+FORMATS = ('parquet', 'feather')
+
+
+# 函数定义：
+
+# json列判断函数
+def is_json(field):
+    return (field.metadata or {}).get(b'encoding') == b'json'
+
+
+# json文本编码函数
+def to_json(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+# json文本解码函数
+def from_json(text):
+    return None if text is None else json.loads(text)
+
+
+# 数据表结构获取函数
+def item_schema(data, kind):
+    # 文档字符串
+    '''
+    Returns the schema of `kind`, for kinds not in `SCHEMAS`, e.g. None of
+    spiders without `ITEM_KIND`, a schema of one json column per key of
+    dict items.
+
+    :Args:
+     - data : a list of spider fetched items.
+     - kind : a str of item kind, None for no kind.
+
+    :Returns:
+     - a :class:`pyarrow.Schema` of the items.
+    '''
+    # 方法实现
+    if kind in SCHEMAS:
+        return SCHEMAS[kind]
+    if not all(isinstance(item, dict) for item in data):
+        raise RuntimeError(f'数据类型{kind}没有列式表结构，且数据不是字典，'
+                           f'请设置爬虫的ITEM_KIND！')
+    names = dict.fromkeys(key for item in data for key in item)
+    return pa.schema([pa.field(name, pa.string(), metadata=JSON_METADATA)
+                      for name in names])
+
+
+# 数据行预处理函数
+def prepare_rows(data, schema, kind=None):
+    # 文档字符串
+    '''
+    Converts spider fetched items into rows that fit `schema`.
+
+    Question strings are wrapped into single-column rows, dict values of
+    map columns are turned into key-value pair lists, and values of json
+    columns, or map values of json map columns, into json text.
+
+    :Args:
+     - data : a list of spider fetched items.
+     - schema : a :class:`pyarrow.Schema` returned by `item_schema`.
+     - kind : a str of item kind, key of `SCHEMAS`.
+
+    :Returns:
+     - rows : a list of dict rows.
+    '''
+    # 方法实现
+    if kind == 'question':
+        return [{'question': question} for question in data]
+    map_keys = [field.name for field in schema
+                if isinstance(field.type, pa.MapType)]
+    json_keys = [field.name for field in schema if is_json(field)]
+    rows = list()
+    for item in data:
+        row = dict(item)
+        for key in map_keys:
+            value = row.get(key)
+            if isinstance(value, dict):
+                row[key] = list(value.items())
+        for key in json_keys:
+            value = row.get(key)
+            if key in map_keys and isinstance(value, list):
+                row[key] = [(k, to_json(v)) for k, v in value]
+            else:
+                row[key] = to_json(value)
+        rows.append(row)
+    return rows
+
+
+# 列式数据写入函数
+def write_table(data, file_path, kind, fmt='parquet'):
+    # 文档字符串
+    '''
+    Writes spider fetched items into a Parquet or Feather file with the typed
+    schema of `kind`, `ROW_GROUP_SIZE` rows per row group.
+
+    :Args:
+     - data : a list of spider fetched items.
+     - file_path : a str of the columnar file path.
+     - kind : a str of item kind, see `item_schema`.
+     - fmt : a str of columnar file format, `parquet` or `feather`.
+    '''
+    # 方法实现
+    if fmt not in FORMATS:
+        raise RuntimeError('列式存储格式指定有误，请输入parquet、feather')
+    schema = item_schema(data, kind)
+    rows = prepare_rows(data, schema, kind)
+    if fmt == 'parquet':
+        with pq.ParquetWriter(file_path, schema,
+                              compression='snappy') as writer:
+            for i in range(0, len(rows), ROW_GROUP_SIZE):
+                writer.write_table(pa.Table.from_pylist(
+                    rows[i:i+ROW_GROUP_SIZE], schema=schema))
+    else:
+        feather.write_feather(pa.Table.from_pylist(rows, schema=schema),
+                              file_path, chunksize=ROW_GROUP_SIZE)
+
+
+# 列式数据读取函数
+def read_table(file_path, columns=None, filters=None):
+    # 文档字符串
+    '''
+    Reads a Parquet or Feather file into an Arrow Table.
+
+    Only `columns` are read, and Parquet row groups which can not match
+    `filters` are skipped, e.g. filters=[('areaName', '=', '三亚')].
+
+    :Args:
+     - file_path : a str of the columnar file path.
+     - columns : a list of column names to read, None for all columns.
+     - filters : a list of (column, op, value) tuples of row filters.
+
+    :Returns:
+     - a :class:`pyarrow.Table` of read data.
+    '''
+    # 方法实现
+    if file_path.endswith('.feather'):
+        table = feather.read_table(file_path, columns=columns)
+        if filters:
+            import pyarrow.compute as pc
+            ops = {'=': pc.equal, '==': pc.equal, '!=': pc.not_equal,
+                   '<': pc.less, '<=': pc.less_equal, '>': pc.greater,
+                   '>=': pc.greater_equal}
+            for column, op, value in filters:
+                table = table.filter(ops[op](table[column], value))
+        return table
+    return pq.read_table(file_path, columns=columns, filters=filters)
+
+
+# 列式数据转换函数
+def to_records(table):
+    # 文档字符串
+    '''
+    Converts an Arrow Table back into a list of spider item dicts.
+
+    :Args:
+     - table : a :class:`pyarrow.Table` read by `read_table`.
+
+    :Returns:
+     - records : a list of dict items, map columns restored to dicts and
+       json columns decoded.
+    '''
+    # 方法实现
+    map_keys = [field.name for field in table.schema
+                if isinstance(field.type, pa.MapType)]
+    json_keys = [field.name for field in table.schema if is_json(field)]
+    records = table.to_pylist()
+    for record in records:
+        for key in map_keys:
+            if record.get(key) is not None:
+                record[key] = dict(record[key])
+        for key in json_keys:
+            value = record.get(key)
+            if isinstance(value, dict):
+                record[key] = {k: from_json(v) for k, v in value.items()}
+            else:
+                record[key] = from_json(value)
+    return records
+
+
+# 列式存储后端写入函数
+def dump_columnar(items, path, kind=None, key=None):
+    # 文档字符串
+    '''
+    Dumps items as the `parquet`/`feather` save backend, the format follows
+    suffix of `path`, see :mod:`backends`.
+    '''
+    # 方法实现
+    write_table(items, path, kind, os.path.splitext(path)[1].lstrip('.'))
+
+
+# 列式存储后端读取函数
+def load_columnar(path, key=None):
+    return to_records(read_table(path))
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a ConnectorRegistry class allows savers and spiders to share lazily
+opened, pooled database connectors of MongoDB, Neo4j and MySQL.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import queue
+import threading
+from contextlib import contextmanager
+
+# 相关第三方库导入
+# 数据库驱动在首次使用对应数据库时才导入
+
+# 本地库导入
+from metrics import logger
+
+
+# 全局变量：
+# 支持的数据库类型
+BACKENDS = ('mongodb', 'neo4j', 'mysql')
+# 各数据库在settings中的配置名称
+CONF_NAMES = {'mongodb': 'MONGO_CONF', 'neo4j': 'NEO_CONF', 'mysql': 'SQL_CONF'}
+
+
+# 类定义：
+
+# 数据库连接器注册表
+class ConnectorRegistry(object):
+    # 文档字符串
+    '''
+    ConnectorRegistry class keeps one lazily created client per database
+    backend, MongoDB and Neo4j clients pool connections themselves, MySQL
+    connections are pooled by the registry.
+
+    No database is touched until a connector is actually requested.
+
+    :Usage:
+        with ConnectorRegistry() as registry:
+            registry.mongodb()['HainanResorts'].find_one()
+            with registry.mysql() as connection:
+                ...
+
+    '''
+
+    # 类静态成员定义
+
+    # 初始化方法
+    def __init__(self, confs=None, pool_size=None):
+        # 文档字符串
+        '''
+        Initialize a new instance of the ConnectorRegistry.
+
+        :Args:
+         - confs : a dict of backend name to its connecting keyword arguments,
+         None to read `MONGO_CONF`, `NEO_CONF` and `SQL_CONF` from settings
+         on first use, missing ones may be added by `configure`.
+         - pool_size : an int of maximum idle MySQL connections kept in pool,
+         None to read `SQL_POOL_SIZE` from settings.
+        '''
+        # 方法实现
+        self.confs = confs
+        self.pool_size = pool_size
+        self.clients = dict()
+        self.lock = threading.Lock()
+        self.mysql_pool = queue.LifoQueue()
+
+    # 数据库配置读取方法
+    def load_confs(self):
+        # 文档字符串
+        '''
+        Reads confs of backends from settings unless they were given, the
+        settings of Meituan spider directory have none of them.
+        '''
+        # 方法实现
+        with self.lock:
+            if self.confs is None:
+                import settings
+                self.confs = {backend: getattr(settings, name)
+                              for backend, name in CONF_NAMES.items()
+                              if hasattr(settings, name)}
+
+    # 数据库配置补充方法
+    def configure(self, confs):
+        # 文档字符串
+        '''
+        Adds connecting keyword arguments of backends which are not
+        configured yet, configured backends keep theirs, so that spiders with
+        their own settings can still share the registry of the process.
+
+        :Args:
+         - confs : a dict of backend name to its connecting keyword
+         arguments.
+        '''
+        # 方法实现
+        self.load_confs()
+        with self.lock:
+            for backend, conf in confs.items():
+                self.confs.setdefault(backend, conf)
+
+    # 数据库配置获取方法
+    def conf(self, backend):
+        # 文档字符串
+        '''
+        Returns connecting keyword arguments of `backend`.
+        '''
+        # 方法实现
+        self.load_confs()
+        if backend not in self.confs:
+            raise RuntimeError(f'数据库{backend}未配置，请检查配置！')
+        return self.confs[backend]
+
+    # MongoDB连接器获取方法
+    def mongodb(self):
+        # 文档字符串
+        '''
+        Returns the shared MongoDB database of `authSource`, creates the
+        pooled MongoClient on first call.
+        '''
+        # 方法实现
+        conf = self.conf('mongodb')
+        with self.lock:
+            if 'mongodb' not in self.clients:
+                from pymongo import MongoClient
+                logger.debug('>>>> connecting mongodb.')
+                self.clients['mongodb'] = MongoClient(**conf)
+        return self.clients['mongodb'][conf.get('authSource')]
+
+    # Neo4j连接器获取方法
+    def neo4j(self):
+        # 文档字符串
+        '''
+        Returns the shared py2neo Graph, creates it on first call.
+        '''
+        # 方法实现
+        conf = self.conf('neo4j')
+        with self.lock:
+            if 'neo4j' not in self.clients:
+                from py2neo import Graph
+                logger.debug('>>>> connecting neo4j.')
+                self.clients['neo4j'] = Graph(**conf)
+        return self.clients['neo4j']
+
+    # MySQL连接获取方法
+    def acquire_mysql(self):
+        # 文档字符串
+        '''
+        Takes an idle MySQL connection out of pool, or opens a new one when the
+        pool is empty. Idle connections are pinged and reconnected if broken.
+        '''
+        # 方法实现
+        try:
+            connection = self.mysql_pool.get_nowait()
+            connection.ping(reconnect=True)
+        except queue.Empty:
+            import pymysql
+            logger.debug('>>>> connecting mysql.')
+            connection = pymysql.connect(**self.conf('mysql'))
+            with self.lock:
+                self.clients.setdefault('mysql', list()).append(connection)
+        return connection
+
+    # MySQL连接归还方法
+    def release_mysql(self, connection):
+        # 文档字符串
+        '''
+        Puts a MySQL connection back to pool, closes it if the pool is full
+        or the registry was closed while the connection was borrowed.
+        '''
+        # 方法实现
+        if self.pool_size is None:
+            from settings import SQL_POOL_SIZE
+            self.pool_size = SQL_POOL_SIZE
+        with self.lock:
+            owned = connection in self.clients.get('mysql', ())
+            if owned and self.mysql_pool.qsize() < self.pool_size:
+                self.mysql_pool.put(connection)
+                return
+            if owned:
+                self.clients['mysql'].remove(connection)
+        # 注册表关闭时已经关闭了借出的连接
+        if connection.open:
+            connection.close()
+
+    # MySQL连接上下文方法
+    @contextmanager
+    def mysql(self):
+        # 文档字符串
+        '''
+        Context manager of a pooled MySQL connection, rolls back uncommitted
+        changes if an exception occured.
+        '''
+        # 方法实现
+        connection = self.acquire_mysql()
+        try:
+            yield connection
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.release_mysql(connection)
+
+    # 健康检查方法
+    def health_check(self):
+        # 文档字符串
+        '''
+        Checks every opened backend without opening new ones.
+
+        :Returns:
+         - a dict of opened backend name to a bool of whether it's healthy.
+        '''
+        # 方法实现
+        status = dict()
+        for backend, client in list(self.clients.items()):
+            try:
+                if backend == 'mongodb':
+                    client.admin.command('ping')
+                elif backend == 'neo4j':
+                    client.run('RETURN 1')
+                else:
+                    for connection in list(client):
+                        connection.ping(reconnect=False)
+                status[backend] = True
+            except Exception as e:
+                logger.warning('>>>> %s health check failed: %s', backend, e)
+                status[backend] = False
+        return status
+
+    # 连接关闭方法
+    def close(self):
+        # 文档字符串
+        '''
+        Closes all opened clients and connections, they will be reopened
+        lazily on next use.
+        '''
+        # 方法实现
+        with self.lock:
+            for backend, client in self.clients.items():
+                logger.info('>>>> closing %s.', backend)
+                if backend == 'mongodb':
+                    client.close()
+                elif backend == 'mysql':
+                    for connection in client:
+                        connection.close()
+            self.clients.clear()
+            self.mysql_pool = queue.LifoQueue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# 全局共享的数据库连接器注册表
+registry = ConnectorRegistry()
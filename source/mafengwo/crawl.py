@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Unified command line entry point of all spiders. Runs any set of spider
+jobs with their own parameters in parallel processes, which share one
+budget of concurrent requests, then writes a combined run report.
+
+:Usage:
+    python crawl.py mafengwo:area=海南,output=HainanResorts \\
+                    ctrip:area=sanya43,pages=10,save_mode=parquet \\
+                    ctrip:area=haikou42,output=HaikouHotels,refresh=1 \\
+                    baidu:area=海口,tag=美食,output=HaikouFood \\
+                    'baidu:area=海口,tag=all,ak=ak1|ak2|ak3,output=HaikouPoi' \\
+                    mafengwo_qa:area=area-12938,keywords=1 \\
+                    ctrip_qa:keyword=海南,pages=50 \\
+                    meituan:save_mode=csv --processes 3
+    python crawl.py ctrip:area=sanya43 --frontier ./Frontier.sqlite \\
+                    --workers 4
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import metrics, logger
+from settings import CRAWL_PROCESSES, CRAWL_FETCH_BUDGET, BAIDU_AKS, \
+                     FETCH_TRANSPORT, save_path
+
+
+# 全局变量：
+# 各类爬虫任务支持的参数
+JOB_PARAMS = {
+    'mafengwo': ('area', 'pages', 'output', 'save_mode'),
+    'ctrip': ('area', 'pages', 'output', 'save_mode', 'refresh'),
+    'mafengwo_qa': ('area', 'pages', 'output', 'keywords', 'dedup'),
+    'baidu': ('area', 'tag', 'ak', 'pages', 'output', 'save_mode'),
+    'ctrip_qa': ('keyword', 'pages', 'output', 'dedup'),
+    'meituan': ('save_mode',),
+}
+# 整数、布尔和列表类型的任务参数，列表参数的多个值以|分隔
+INT_PARAMS = ('pages',)
+BOOL_PARAMS = ('keywords', 'dedup', 'refresh')
+LIST_PARAMS = ('tag', 'ak')
+
+
+# 函数定义：
+
+# 任务参数检查函数
+def check_job(job):
+    # 文档字符串
+    '''
+    Checks spider and parameters of a job dict, and converts parameter
+    types.
+
+    :Returns:
+     - a dict of job with `spider` and its parameters.
+    '''
+    # 方法实现
+    job = dict(job)
+    spider = job.pop('spider', None)
+    if spider not in JOB_PARAMS:
+        raise RuntimeError(f'爬虫{spider}不存在，请输入'
+                           f'{"、".join(JOB_PARAMS)}！')
+    for key, value in job.items():
+        if key not in JOB_PARAMS[spider]:
+            raise RuntimeError(f'爬虫{spider}不支持参数{key}，请输入'
+                               f'{"、".join(JOB_PARAMS[spider])}！')
+        if key in INT_PARAMS:
+            job[key] = int(value)
+        elif key in BOOL_PARAMS:
+            job[key] = str(value).lower() in ('1', 'true', 'yes')
+        elif key in LIST_PARAMS and isinstance(value, str):
+            job[key] = value if value == 'all' else value.split('|')
+    return dict(job, spider=spider)
+
+
+# 任务描述解析函数
+def parse_job(spec):
+    # 文档字符串
+    '''
+    Parses a job description of `spider[:key=value[,key=value...]]`, used
+    as argparse argument type, so errors are raised as
+    :class:`argparse.ArgumentTypeError`.
+    '''
+    # 方法实现
+    spider, _, params = spec.partition(':')
+    job = dict(param.partition('=')[::2]
+               for param in filter(None, params.split(',')))
+    try:
+        return check_job(dict(job, spider=spider))
+    except (RuntimeError, ValueError) as e:
+        raise argparse.ArgumentTypeError(f'{spec}: {e}')
+
+
+# 爬虫任务构建函数
+def build_spider(job, fetcher):
+    # 文档字符串
+    '''
+    Creates the spider of a job.
+
+    :Returns:
+     - a tuple of (spider, run keyword arguments).
+    '''
+    # 方法实现
+    spider = job['spider']
+    kwargs = {'output': job.get('output'), 'fetcher': fetcher}
+    if 'save_mode' in job:
+        kwargs['save_mode'] = job['save_mode']
+    deduper = None
+    if job.get('dedup'):
+        from dedup import QuestionDeduper
+        deduper = QuestionDeduper()
+
+    if spider == 'meituan':
+        sys.path.append(os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), os.pardir, 'meituan'))
+        from spider_develop import MeituanSpider
+        return MeituanSpider(saveMode=job.get('save_mode', 'txt')), {}
+
+    if spider == 'ctrip_qa':
+        sys.path.append(os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), os.pardir, 'ctripQA'))
+        from ctripSpider import CtripQASpider
+        return CtripQASpider(kw=job.get('keyword', '海南'), deduper=deduper,
+                             fetcher=fetcher, output=job.get('output')), \
+            {'pEnd': job.get('pages', 50)}
+
+    from spider import MafengwoSpider, CtripSpider, MafengwoQASpider, \
+        BaiduPoiSpider
+    kwargs['max_pages'] = job.get('pages')
+    if spider == 'mafengwo':
+        return MafengwoSpider(job.get('area', '海南'), **kwargs), {}
+    if spider == 'ctrip':
+        return CtripSpider(job.get('area', 'sanya43'), **kwargs), \
+            {'refresh': job.get('refresh', False)}
+    if spider == 'mafengwo_qa':
+        return MafengwoQASpider(job.get('area', 'area-12938'), deduper,
+                                **kwargs), \
+            {'keywords': job.get('keywords', False)}
+    return BaiduPoiSpider(job.get('ak', BAIDU_AKS), job.get('area', '海口'),
+                          job.get('tag', '交通设施'), **kwargs), {}
+
+
+# 任务作用域函数
+def job_scope(spider):
+    # 同一爬虫的不同任务按地区和输出文件名分开任务队列、结果和爬取记录
+    return f'{spider.area_name}-{spider.output}'
+
+
+# 爬虫关闭函数
+def close_spider(spider):
+    # 文档字符串
+    '''
+    Closes the near-duplicate filter of a spider and the spider itself if it
+    holds files or connections, e.g. the Meituan spider.
+    '''
+    # 方法实现
+    deduper = getattr(spider, 'deduper', None)
+    if deduper:
+        deduper.close()
+    if hasattr(spider, 'close'):
+        spider.close()
+
+
+# 爬虫任务执行函数
+def run_job(job, fetch_workers, profile=False, frontier=None, seed=False,
+            transport=FETCH_TRANSPORT):
+    # 文档字符串
+    '''
+    Runs one job in a worker process, failures are reported instead of
+    raised so that other jobs keep running.
+
+    :Args:
+     - job : a dict of job parsed by `parse_job`.
+     - fetch_workers : an int of concurrent requests share of this job.
+     - profile : a bool of whether to profile the job.
+     - frontier : a str of shared frontier path to run the job as one of
+     its distributed workers, None to run the job alone.
+     - seed : a bool of whether this worker seeds the frontier.
+     - transport : a str of fetcher transport, `requests` or `http2`.
+
+    :Returns:
+     - a json serializable dict of job report.
+    '''
+    # 方法实现
+    metrics.reset()
+    name = '-'.join([job['spider'], job.get('output') or job['spider'],
+                     str(os.getpid())])
+    report = {'job': job, 'name': name, 'pid': os.getpid(),
+              'fetch_workers': fetch_workers, 'status': 'ok'}
+    start = time.time()
+    fetcher = spider = queue = None
+    try:
+        from fetcher import Fetcher
+        fetcher = Fetcher(workers=fetch_workers, transport=transport)
+        spider, kwargs = build_spider(job, fetcher)
+        run = partial(spider.run, **kwargs)
+        if frontier:
+            from frontier import Frontier
+            queue = Frontier(frontier, scope=job_scope(spider))
+            run = partial(spider.run_worker, queue, seed)
+        if profile:
+            from profiler import Profiler
+            with Profiler(name):
+                run()
+        else:
+            run()
+        # 问答爬虫边爬取边写入文件，只记录问题数
+        report['items'] = getattr(spider, 'count', None) or \
+            len(getattr(spider, 'data', ()))
+        report['output'] = getattr(spider, 'output', None) or \
+            getattr(spider, 'filename', None)
+    except Exception as e:
+        logger.error('>>> job %s failed: %s', name, e)
+        report.update(status='failed', error=repr(e),
+                      traceback=traceback.format_exc())
+    finally:
+        if fetcher:
+            fetcher.close()
+        if queue:
+            queue.close()
+        if spider:
+            close_spider(spider)
+    report['seconds'] = time.time() - start
+    report['metrics'] = metrics.snapshot()
+    return report
+
+
+# 多任务调度函数
+def crawl(jobs, processes=CRAWL_PROCESSES, fetch_budget=CRAWL_FETCH_BUDGET,
+          profile=False, frontier=None, workers=1, seed=True,
+          transport=FETCH_TRANSPORT):
+    # 文档字符串
+    '''
+    Runs jobs in at most `processes` parallel processes, running jobs share
+    `fetch_budget` concurrent requests evenly.
+
+    With a shared `frontier`, every job runs as `workers` distributed
+    workers, the first of which seeds the frontier if `seed` is set. Other
+    nodes may join by running the same jobs with `seed` off.
+
+    :Returns:
+     - a dict of combined run report.
+    '''
+    # 方法实现
+    runs = [(job, seed and index == 0) for job in jobs
+            for index in range(workers)]
+    processes = max(min(processes, len(runs)), 1)
+    fetch_workers = max(fetch_budget // processes, 1)
+    report = {'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'processes': processes, 'fetch_budget': fetch_budget,
+              'transport': transport,
+              'jobs': list()}
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(run_job, job, fetch_workers, profile,
+                               frontier, seed, transport): job
+                   for job, seed in runs}
+        for num, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            logger.info('>>> [%s/%s] job %s %s in %.1f s.', num, len(runs),
+                        result['name'], result['status'], result['seconds'])
+            report['jobs'].append(result)
+    report['seconds'] = time.time() - start
+    return report
+
+
+# 运行报告汇总函数
+def report_table(report):
+    # 文档字符串
+    '''
+    Formats a combined run report as a text table.
+    '''
+    # 方法实现
+    rows = [('job', 'status', 'items', 'seconds', 'output')]
+    for job in report['jobs']:
+        rows.append((job['name'], job['status'], str(job.get('items', '')),
+                     f'{job["seconds"]:.1f}', str(job.get('output', ''))))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+             for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    lines.append(f'{len(report["jobs"])} jobs in {report["seconds"]:.1f} s '
+                 f'with {report["processes"]} processes.')
+    return '\n'.join(lines)
+
+
+# 命令行入口函数
+def main(argv=None):
+    # 方法实现
+    parser = argparse.ArgumentParser(
+        description='Runs spider jobs in parallel processes.')
+    parser.add_argument('jobs', nargs='*', type=parse_job,
+                        help='spider[:key=value,...], spiders: '
+                             + ', '.join(f'{name}({"/".join(params)})'
+                                         for name, params
+                                         in JOB_PARAMS.items()))
+    parser.add_argument('--jobs-file', help='a json file of job dict list')
+    parser.add_argument('--processes', type=int, default=CRAWL_PROCESSES,
+                        help='maximum parallel job processes')
+    parser.add_argument('--fetch-budget', type=int,
+                        default=CRAWL_FETCH_BUDGET,
+                        help='concurrent requests shared by running jobs')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile every job into save_path')
+    parser.add_argument('--frontier', help='shared frontier queue path, '
+                                           'runs jobs as distributed workers')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='distributed workers per job with --frontier')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='join a frontier seeded by another node')
+    parser.add_argument('--transport', default=FETCH_TRANSPORT,
+                        choices=('requests', 'http2'),
+                        help='fetcher transport, http2 multiplexes requests '
+                             'over a few connections')
+    parser.add_argument('--report', help='combined report path, defaults to '
+                                         'save_path/crawl-<time>.json')
+    args = parser.parse_args(argv)
+
+    jobs = list(args.jobs)
+    if args.jobs_file:
+        with open(args.jobs_file, encoding='utf-8') as file:
+            jobs.extend(check_job(job) for job in json.load(file))
+    if not jobs:
+        parser.error('请指定需要运行的爬虫任务！')
+
+    report = crawl(jobs, args.processes, args.fetch_budget, args.profile,
+                   args.frontier, args.workers if args.frontier else 1,
+                   not args.no_seed, args.transport)
+    print(report_table(report))
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    report_path = args.report or os.path.join(
+        save_path, time.strftime('crawl-%Y%m%d-%H%M%S.json'))
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    logger.info('>>> run report written into %s.', report_path)
+    return 0 if all(job['status'] == 'ok' for job in report['jobs']) else 1
+
+
+# 测试代码：
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,16 +11,22 @@ from different website.
 
 # 导入模块：
 # 标准库导入
+import copy
 import json
 import os
+import tempfile
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 相关第三方库导入
-import pymysql
-from pymongo import MongoClient as Client
-from py2neo import Node, Relationship, Graph
+# 数据库驱动和pyarrow在选中对应存储后端时才导入
 
 # 本地库导入
-from settings import NEO_CONF, MONGO_CONF, SQL_CONF, save_path
+from backends import get_backend
+from connector import registry as shared_registry
+from metrics import metrics, logger
+from shards import is_dataset, dataset_path, read_manifest, read_shard
+from settings import SQL_CHUNK_SIZE, KEEP_VERSIONS, INGEST_WORKERS
 
 
 # 全局变量：
@@ -45,17 +51,173 @@ RESORT_SQL = '''CREATE TABLE IF NOT EXISTS {0}(
     timeStamp  VARCHAR(30)
     );'''
 # 酒店数据建表SQL语句
-# 酒店数据的结构还需修改，酒店数据还不能操作MySQL数据库
-HOTEL_SQL = '''
+# 酒店标签、设施、政策和周边设施等嵌套字段以JSON文本存储
+HOTEL_SQL = '''CREATE TABLE IF NOT EXISTS {0}(
+    hotel_id   INTEGER NOT NULL,
+    hotel_name VARCHAR(128),
+    address    VARCHAR(255),
+    business_zone VARCHAR(64),
+    lowest_price INTEGER,
+    hotel_label TEXT,
+    newbooking VARCHAR(128),
+    hotel_level VARCHAR(30),
+    hotel_score FLOAT,
+    hotel_proposition FLOAT,
+    judge_count INTEGER,
+    recommend  VARCHAR(128),
+    ctrip_qualified BOOLEAN,
+    ctrip_star INTEGER,
+    country_star INTEGER,
+    ctrip_corporate VARCHAR(64),
+    sale_amount BIGINT,
+    reserve_count FLOAT,
+    contact    VARCHAR(64),
+    introduction TEXT,
+    hotel_facilities TEXT,
+    hotel_policy TEXT,
+    surround_facilities TEXT
+    );'''
+# 饭店数据建表SQL语句
+RESTAURANT_SQL = '''CREATE TABLE IF NOT EXISTS {0}(
+    poiid      INTEGER NOT NULL,
+    restName   VARCHAR(128),
+    category   VARCHAR(64),
+    brandName  VARCHAR(128),
+    brandId    INTEGER,
+    brandLogo  VARCHAR(255),
+    avgScore   FLOAT,
+    avgPrice   FLOAT,
+    lowestPrice FLOAT,
+    areaName   VARCHAR(30),
+    areaId     INTEGER,
+    latitude   FLOAT,
+    longitude  FLOAT,
+    address    VARCHAR(255),
+    floor      VARCHAR(64),
+    parkingInfo TEXT,
+    payAbstracts TEXT,
+    openInfo   VARCHAR(255),
+    phone      VARCHAR(128),
+    introduction TEXT,
+    menus      TEXT,
+    isSnack    BOOLEAN,
+    isWaimai   INTEGER,
+    latestWeekCoupon INTEGER,
+    historyCouponCount INTEGER,
+    wifi       BOOLEAN,
+    isSupportAppointment BOOLEAN,
+    source     VARCHAR(30),
+    timeStamp  VARCHAR(30)
+    );'''
+# 各数据表的二级索引，批量导入前删除，导入后重建
+RESORT_INDEXES = {
+    'idx_poi_id': 'poi_id', 'idx_area_id': 'areaId',
+}
+HOTEL_INDEXES = {
+    'idx_hotel_id': 'hotel_id', 'idx_business_zone': 'business_zone',
+    'idx_lowest_price': 'lowest_price',
+}
+RESTAURANT_INDEXES = {
+    'idx_poiid': 'poiid', 'idx_area_id': 'areaId', 'idx_avg_price': 'avgPrice',
+}
+
+
+# 可读取的数据文件存储后端，按查找顺序排列
+DATA_MODES = ('json', 'jsonl', 'csv', 'parquet', 'feather')
+# 影子集合/表和历史版本的名称后缀
+STAGING_SUFFIX = '__staging'
+BACKUP_SUFFIX = '__old_'
+
+
+# 函数定义：
+
+# 历史版本命名函数
+def backup_name(name):
+    # 文档字符串
+    '''
+    Returns a time ordered backup version name of table/collection `name`,
+    with microseconds so that swaps within one second don't clash.
+    '''
+    # 方法实现
+    return name + BACKUP_SUFFIX + \
+        datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
 
 
+# 建表语句解析函数
+def sql_columns(create_sql):
+    # 文档字符串
+    '''
+    Parses column names out of a `CREATE TABLE` sql statement.
 
-'''
-# 饭店数据建表SQL语句
-RESTAURANT_SQL = '''
+    :Args:
+     - create_sql : a str of table creating sql statement.
 
+    :Returns:
+     - a list of column names in table defining order.
+    '''
+    # 方法实现
+    body = create_sql[create_sql.index('(')+1:create_sql.rindex(')')]
+    return [line.split()[0] for line in body.split(',\n') if line.strip()]
 
-'''
+
+# MySQL数据值转换函数
+def sql_value(value):
+    # 文档字符串
+    '''
+    Converts a spider item value into a MySQL column value, nested lists and
+    dicts are dumped as json text.
+    '''
+    # 方法实现
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+# LOAD DATA文本转义函数
+def infile_value(value):
+    # 文档字符串
+    '''
+    Escapes a MySQL column value in the default `LOAD DATA` text format:
+    tab separated fields, backslash escapes and `\\N` for NULL.
+    '''
+    # 方法实现
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return str(int(value))
+    return (str(value).replace('\\', '\\\\').replace('\0', '\\0')
+            .replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+# 数据文件读取函数
+def read_data_file(file_name):
+    # 文档字符串
+    '''
+    Reads spider fetched data file of `file_name` in `save_path`.
+
+    Looks up a sharded dataset directory of `file_name` first, then data
+    files of file backends in `DATA_MODES` order, columnar parquet/feather
+    files are converted to json-like dict items.
+
+    :Args:
+     - file_name : a str of data file name without suffix.
+
+    :Returns:
+     - a list of dict formatted data items.
+    '''
+    # 方法实现
+    if is_dataset(file_name):
+        path = dataset_path(file_name)
+        return [item for shard in read_manifest(file_name)['shards']
+                for item in read_shard(os.path.join(path, shard['file']),
+                                       shard['sha256'])]
+    for save_mode in DATA_MODES:
+        backend = get_backend(save_mode, kind='file')
+        file_path = backend.path(file_name)
+        if os.access(file_path, os.F_OK):
+            return backend.load(file_path)
+    raise RuntimeError(f'数据文件{file_name}不存在，请检查数据！')
 
 
 # 类定义：
@@ -70,98 +232,469 @@ class BaseSaver(object):
 
     '''
     # 数据存储器的静态成员定义
-    SAVE_MODES = ('mongodb', 'neo4j', 'mysql')
+    # 数据表/集合的二级索引
+    index_conf = dict()
 
     # 初始化方法：
-    def __init__(self, save_mode="neo4j"):
+    def __init__(self, save_mode="neo4j", registry=None):
         # 文档字符串
         '''
         Initialize an instance of BaseSaver.
 
-        Connect to a kind of database specified by `save_mode` param.
+        Uses a kind of database specified by `save_mode` param, a database
+        backend of :mod:`backends`, the database is connected lazily through
+        `registry` on first use.
 
         :Args:
          - save_mode : a str of database to save data in.
+         - registry : a :class:`ConnectorRegistry` to take connectors from,
+         None for the registry shared in process.
          - create_sql (deprecated): a str of table creating sql statement for
          MySQL database.
 
         '''
         # 方法实现
-        if save_mode not in self.SAVE_MODES:
-            raise RuntimeError('存储模式指定有误，请输入mongodb、neo4j或者mysql')
+        # 只检查所选数据库的驱动是否安装，驱动在首次连接时才导入
+        self.backend = get_backend(save_mode, kind='database').check()
         self.save_mode = save_mode
+        self.registry = registry or shared_registry
+        # 从连接池借出的MySQL连接
+        self.connection = None
+
+        # 基类不能用来存储数据进入MySQL数据库（未定义下述，报错）
+        # Neo4j数据库同理（什么也没做）
+        # self.create_sql = RESORT_SQL
+
+    # 数据库连接器属性
+    @property
+    def connector(self):
+        # 文档字符串
+        '''
+        The database connector of `save_mode`: a MongoDB database, a py2neo
+        Graph or a MySQL connection borrowed from pool until `close`.
+        '''
+        # 方法实现
         if self.save_mode == 'mongodb':
-            # mongodb initialize
-            print('>>>> we are in mongodb.')
-            self.connector = Client(**MONGO_CONF)[MONGO_CONF.get('authSource')]
+            return self.registry.mongodb()
         elif self.save_mode == 'neo4j':
-            # neo4j initialize
-            print('>>>> we are in neo4j.')
-            self.connector = Graph(**NEO_CONF)
-        else:
-            # mysql initialize
-            print('>>>> we are in mysql.')
-            self.connector = pymysql.connect(**SQL_CONF)
-
-            # 基类不能用来存储数据进入MySQL数据库（未定义下述，报错）
-            # Neo4j数据库同理（什么也没做）
-            # self.create_sql = RESORT_SQL
+            return self.registry.neo4j()
+        if self.connection is None:
+            self.connection = self.registry.acquire_mysql()
+        return self.connection
 
     # 数据存储方法：
-    def data_save(self, *file_name_iter):
+    def data_save(self, *file_name_iter, bulk_mode='insert', swap=False,
+                  target=None, workers=INGEST_WORKERS):
         # 文档字符串
         '''
         Reads from multiple spider fetched data json files,
         and save them into different databases.
 
-        Wipes out the old data and saves the new fetched ones.
+        Data files are parsed concurrently in `workers` threads. Each file
+        is then loaded into its own collection/table by a pool of `workers`
+        threads, or all files are merged into `target`. Neo4j data are always
+        merged into one knowledge graph.
+
+        Wipes out the old data and saves the new fetched ones. With `swap`,
+        MongoDB and MySQL data are loaded into a staging collection/table
+        first and then swapped over the live one, so readers never see an
+        empty or half-loaded target.
 
         :Args:
          - *file_name_iter : a var-positional params of file name to fetch data
          from and table/collection name to save data in.
+         - bulk_mode : a str of MySQL bulk loading mode, `insert` for chunked
+         multi-row INSERTs or `infile` for LOAD DATA LOCAL INFILE.
+         - swap : a bool of whether to use staging-and-swap loading.
+         - target : a str of merged table/collection name, None to load every
+         file into its own table/collection.
+         - workers : an int of maximum parsing and loading threads.
+        '''
+        # 方法实现
+        if not file_name_iter:
+            raise RuntimeError('请指定需要存储的数据文件！')
+        if swap and not self.backend.supports('swap'):
+            raise RuntimeError(f'{self.save_mode}数据库不支持影子表切换导入！')
+        if len(file_name_iter) == 1:
+            target = target or file_name_iter[0]
+        if target or self.save_mode == 'neo4j':
+            self.json_data = list()
+            for file_name, data in self.parse_files(file_name_iter, workers):
+                self.json_data.extend(data)
+            self.load_target(target, self.json_data, bulk_mode, swap)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix='load') as pool:
+            futures = {
+                pool.submit(self.load_worker, file_name, data, bulk_mode,
+                            swap): file_name
+                for file_name, data in self.parse_files(file_name_iter,
+                                                        workers)
+            }
+            for num, future in enumerate(as_completed(futures), 1):
+                future.result()
+                logger.info('>>> [%s/%s] saved %s.', num, len(futures),
+                            futures[future])
+
+    # 数据文件并行解析方法：
+    def parse_files(self, file_names, workers=INGEST_WORKERS):
+        # 文档字符串
+        '''
+        Parses data files in a pool of threads, yields (file_name, data)
+        pairs as soon as each file is parsed. Shards of sharded datasets are
+        parsed as separate files, a dataset is yielded once all its shards
+        are parsed.
+
+        Threads overlap reading, decompressing and checksumming, which
+        release the GIL, while parsed items stay in this process: parsing
+        in worker processes pickled every item back to the parent, which
+        cost about twice as much as parsing itself.
+
+        :Args:
+         - file_names : a sequence of data file names without suffix.
+         - workers : an int of maximum parsing threads.
+        '''
+        # 方法实现
+        jobs = list()
+        parts = dict()
+        for file_name in file_names:
+            shards = read_manifest(file_name)['shards'] \
+                if is_dataset(file_name) else None
+            if not shards:
+                parts[file_name] = [None]
+                jobs.append((file_name, 0, read_data_file, (file_name,)))
+                continue
+            path = dataset_path(file_name)
+            parts[file_name] = [None] * len(shards)
+            jobs.extend((file_name, num, read_shard,
+                         (os.path.join(path, shard['file']), shard['sha256']))
+                        for num, shard in enumerate(shards))
+        workers = max(min(workers, len(jobs)), 1)
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix='parse') as pool:
+            futures = {pool.submit(func, *args): (file_name, num)
+                       for file_name, num, func, args in jobs}
+            done = 0
+            for future in as_completed(futures):
+                file_name, num = futures[future]
+                parts[file_name][num] = future.result()
+                if any(part is None for part in parts[file_name]):
+                    continue
+                data = [item for part in parts.pop(file_name)
+                        for item in part]
+                done += 1
+                logger.info('>>> [%s/%s] parsed %s: %s records.', done,
+                            len(file_names), file_name, len(data))
+                yield file_name, data
+
+    # 单文件导入工作方法：
+    def load_worker(self, name, data, bulk_mode='insert', swap=False):
+        # 文档字符串
+        '''
+        Loads one file's data into table/collection `name` in a worker thread.
+
+        MongoDB client is thread-safe and shared, while MySQL connections are
+        not, so every MySQL worker borrows its own pooled connection.
+        '''
+        # 方法实现
+        if self.save_mode != 'mysql':
+            self.load_target(name, data, bulk_mode, swap)
+            return
+        worker = copy.copy(self)
+        worker.connection = None
+        try:
+            worker.load_target(name, data, bulk_mode, swap)
+        finally:
+            worker.close()
+
+    # 数据导入方法：
+    def load_target(self, name, data, bulk_mode='insert', swap=False):
+        # 文档字符串
+        '''
+        Wipes out the old data of table/collection `name` and saves `data`,
+        saving seconds are recorded as the `save` stage.
+
+        :Args:
+         - name : a str of table/collection name, ignored by Neo4j.
+         - data : a list of dict formatted data items.
+         - bulk_mode : a str of `insert` or `infile`.
+         - swap : a bool of whether to use staging-and-swap loading.
         '''
         # 方法实现
-        # 此处可以拓展成任意文件类型，其他文件类型的数据转换成json再写即可
-        self.json_data = list()
-        for file_name in file_name_iter:
-            file_path = os.path.join(save_path, file_name+'.json')
-            if not os.access(file_path, os.F_OK):
-                raise RuntimeError(f'数据文件{file_path}不存在，请检查数据！')
-            with open(file_path, 'r', encoding='utf-8') as file:
-                self.json_data.extend(json.load(file, encoding='utf-8'))
+        metrics.inc('items_total', value=len(data), stage='save',
+                    target=self.save_mode)
+        with metrics.timer(stage='save', target=self.save_mode):
+            if self.save_mode == 'mongodb':
+                logger.info('>>> we are saving %s to mongodb.', name)
+                if swap:
+                    self.mongo_swap_load(name, data)
+                    return
+                # 删除原始数据
+                self.connector.drop_collection(name)
+                # 保存新数据
+                if data:
+                    self.connector[name].insert_many(data)
+            elif self.save_mode == 'neo4j':
+                logger.info('>>> we are saving to neo4j.')
+                # 删除原始数据, 一定要小心使用
+                self.graph_cleaner()
+                # 保存新数据
+                self.graph_builder()
+            else:
+                logger.info('>>> we are saving %s to mysql.', name)
+                if swap:
+                    self.mysql_swap_load(name, data, bulk_mode)
+                    return
+                self.bulk_load(name, data, bulk_mode)
+
+    # MongoDB影子集合切换导入方法：
+    def mongo_swap_load(self, name, data):
+        # 文档字符串
+        '''
+        Loads data items into staging collection of `name`, builds indexes
+        there, renames the live collection to a backup version, which keeps
+        its indexes without copying data, then renames the staging
+        collection to the live one. Readers may miss the live collection
+        only between the two renames.
 
+        :Args:
+         - name : a str of live collection name.
+         - data : a list of dict formatted data items.
+        '''
+        # 方法实现
+        staging = self.connector[name + STAGING_SUFFIX]
+        staging.drop()
+        if data:
+            staging.insert_many(data, ordered=False)
+        for index_name, column in self.index_conf.items():
+            staging.create_index(column, name=index_name)
+        if name in self.connector.list_collection_names():
+            # 重命名只修改元数据，旧集合的数据和索引原样保留为历史版本
+            self.connector[name].rename(backup_name(name))
+        staging.rename(name, dropTarget=True)
+        self.prune_backups(name)
+        logger.info('>>> swapped %s documents into %s.', len(data), name)
+
+    # MySQL影子表切换导入方法：
+    def mysql_swap_load(self, name, data, bulk_mode='insert'):
+        # 文档字符串
+        '''
+        Bulk loads data items into staging table of `name` with its indexes,
+        then atomically renames the live table to a backup version and the
+        staging table to the live one in a single RENAME TABLE statement.
+
+        :Args:
+         - name : a str of live table name.
+         - data : a list of dict formatted data items.
+         - bulk_mode : a str of `insert` or `infile`.
+        '''
+        # 方法实现
+        staging = name + STAGING_SUFFIX
+        with self.connector.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {staging}')
+        self.bulk_load(staging, data, bulk_mode)
+        with self.connector.cursor() as cursor:
+            if name in self.mysql_tables(cursor, name):
+                cursor.execute(f'RENAME TABLE {name} TO {backup_name(name)}, '
+                               f'{staging} TO {name}')
+            else:
+                cursor.execute(f'RENAME TABLE {staging} TO {name}')
+        self.prune_backups(name)
+        logger.info('>>> swapped %s rows into %s.', len(data), name)
+
+    # 数据回滚方法：
+    def rollback(self, name):
+        # 文档字符串
+        '''
+        Rolls the live collection/table `name` back to its latest backup
+        version, the rolled back data are dropped.
+
+        :Args:
+         - name : a str of live table/collection name.
+        '''
+        # 方法实现
+        backups = self.list_backups(name)
+        if not backups:
+            raise RuntimeError(f'{name}没有可回滚的历史版本！')
+        latest = backups[-1]
+        logger.info('>>> rolling %s back to %s.', name, latest)
         if self.save_mode == 'mongodb':
-            print('>>> we are saving to mongodb.')
-            # 删除原始数据
-            self.connector.drop_collection(file_name)
-            # 保存新数据
-            self.connector[file_name].insert_many(self.json_data)
-        elif self.save_mode == 'neo4j':
-            print('>>> we are saving to neo4j.')
-            # 删除原始数据, 一定要小心使用
-            self.graph_cleaner()
-            # 保存新数据
-            self.graph_builder()
+            self.connector[latest].rename(name, dropTarget=True)
+        elif self.save_mode == 'mysql':
+            with self.connector.cursor() as cursor:
+                # 中断的导入可能留下影子表，先删除才能重命名
+                cursor.execute(f'DROP TABLE IF EXISTS {name}{STAGING_SUFFIX}')
+                cursor.execute(f'RENAME TABLE {name} TO {name}{STAGING_SUFFIX}'
+                               f', {latest} TO {name}')
+                cursor.execute(f'DROP TABLE {name}{STAGING_SUFFIX}')
         else:
-            print('>>> we are saving to mysql.')
-            # 准备sql语句
-            data_key = self.json_data[0].keys()
-            sql_key = ','.join(data_key)
-            sql_value = ', '.join([f'%({key})s' for key in data_key])
-            sql = '''
-            INSERT INTO {0}({1})
-            VALUES ({2});
-            '''.format(file_name, sql_key, sql_value)
-            print(sql)
+            raise RuntimeError('Neo4j数据库不支持版本回滚')
 
+    # 历史版本列举方法：
+    def list_backups(self, name):
+        # 文档字符串
+        '''
+        Lists backup versions of collection/table `name`, oldest first.
+        '''
+        # 方法实现
+        prefix = name + BACKUP_SUFFIX
+        if self.save_mode == 'mongodb':
+            names = self.connector.list_collection_names()
+        else:
             with self.connector.cursor() as cursor:
-                cursor.execute(self.create_sql.format(file_name))
-                self.connector.commit()
-                # 删除原始数据，一定要小心使用
-                cursor.execute(f"DELETE FROM {file_name}")
-                # 保存新数据
-                cursor.executemany(sql, self.json_data)
-                self.connector.commit()
+                names = self.mysql_tables(cursor, prefix)
+        return sorted(n for n in names if n.startswith(prefix))
+
+    # 历史版本清理方法：
+    def prune_backups(self, name):
+        # 文档字符串
+        '''
+        Drops backup versions of `name` except the latest `KEEP_VERSIONS` ones.
+        '''
+        # 方法实现
+        backups = self.list_backups(name)
+        for backup in backups[:max(len(backups) - KEEP_VERSIONS, 0)]:
+            logger.info('>>> dropping old version: %s', backup)
+            if self.save_mode == 'mongodb':
+                self.connector.drop_collection(backup)
+            else:
+                with self.connector.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {backup}')
+
+    # MySQL数据表查询方法：
+    def mysql_tables(self, cursor, prefix):
+        # 文档字符串
+        '''
+        Returns names of tables in current MySQL database starting with
+        `prefix`.
+        '''
+        # 方法实现
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name LIKE %s",
+            (prefix.replace('_', '\\_') + '%',))
+        return [row[0] for row in cursor.fetchall()]
+
+    # MySQL批量导入方法：
+    def bulk_load(self, table_name, data, bulk_mode='insert'):
+        # 文档字符串
+        '''
+        Bulk loads data items into MySQL table `table_name`.
+
+        Validates item keys against columns of `self.create_sql`, drops
+        secondary indexes of `self.index_conf`, wipes out the old data, streams
+        the new data in chunks of `SQL_CHUNK_SIZE` rows, then rebuilds the
+        indexes once.
+
+        :Args:
+         - table_name : a str of MySQL table name.
+         - data : a list of dict formatted data items.
+         - bulk_mode : a str of `insert` or `infile`.
+        '''
+        # 方法实现
+        if bulk_mode not in ('insert', 'infile'):
+            raise RuntimeError('批量导入模式指定有误，请输入insert或者infile')
+        columns = sql_columns(self.create_sql)
+        unknown = set().union(*(item.keys() for item in data)) - set(columns)
+        if unknown:
+            raise RuntimeError(f'数据字段{sorted(unknown)}不在表结构中，请检查数据！')
+
+        with self.connector.cursor() as cursor:
+            cursor.execute(self.create_sql.format(table_name))
+            self.drop_indexes(cursor, table_name)
+            cursor.execute('SET unique_checks=0')
+            # 删除原始数据，一定要小心使用
+            cursor.execute(f"DELETE FROM {table_name}")
+            # 保存新数据
+            if bulk_mode == 'infile':
+                self.infile_rows(cursor, table_name, columns, data)
+            else:
+                self.insert_rows(cursor, table_name, columns, data)
+            cursor.execute('SET unique_checks=1')
+            self.connector.commit()
+            self.create_indexes(cursor, table_name)
+        logger.info('>>> loaded %s rows into %s.', len(data), table_name)
+
+    # 多行INSERT导入方法：
+    def insert_rows(self, cursor, table_name, columns, data):
+        # 文档字符串
+        '''
+        Inserts data items with multi-row INSERT statements, `SQL_CHUNK_SIZE`
+        rows per statement.
+        '''
+        # 方法实现
+        row_sql = '({0})'.format(', '.join(['%s'] * len(columns)))
+        for i in range(0, len(data), SQL_CHUNK_SIZE):
+            chunk = data[i:i+SQL_CHUNK_SIZE]
+            sql = 'INSERT INTO {0}({1}) VALUES {2}'.format(
+                table_name, ','.join(columns),
+                ', '.join([row_sql] * len(chunk)))
+            cursor.execute(sql, [sql_value(item.get(key)) for item in chunk
+                                 for key in columns])
+
+    # LOAD DATA导入方法：
+    def infile_rows(self, cursor, table_name, columns, data):
+        # 文档字符串
+        '''
+        Writes data items into a temporary tab separated file and loads it
+        with `LOAD DATA LOCAL INFILE`, which needs `local_infile` enabled in
+        `SQL_CONF` and on MySQL server.
+        '''
+        # 方法实现
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n',
+                                         suffix='.tsv', delete=False) as file:
+            for item in data:
+                file.write('\t'.join([infile_value(sql_value(item.get(key)))
+                                      for key in columns]))
+                file.write('\n')
+        try:
+            cursor.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE {0} CHARACTER SET utf8mb4"
+                " ({1})".format(table_name, ','.join(columns)), (file.name,))
+        finally:
+            os.remove(file.name)
+
+    # 二级索引删除方法：
+    def drop_indexes(self, cursor, table_name):
+        # 文档字符串
+        '''
+        Drops existing secondary indexes of `self.index_conf` on `table_name`.
+        '''
+        # 方法实现
+        cursor.execute(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table_name,))
+        existing = {row[0] for row in cursor.fetchall()}
+        for index_name in self.index_conf:
+            if index_name in existing:
+                cursor.execute(f'ALTER TABLE {table_name} DROP INDEX '
+                               f'{index_name}')
+
+    # 二级索引重建方法：
+    def create_indexes(self, cursor, table_name):
+        # 文档字符串
+        '''
+        Rebuilds secondary indexes of `self.index_conf` on `table_name` with
+        one ALTER TABLE statement.
+        '''
+        # 方法实现
+        if not self.index_conf:
+            return
+        cursor.execute('ALTER TABLE {0} {1}'.format(table_name, ', '.join(
+            [f'ADD INDEX {name} ({column})'
+             for name, column in self.index_conf.items()])))
+
+    # 数据文件读取方法：
+    def load_data(self, file_name):
+        # 文档字符串
+        '''
+        Reads spider fetched data file of `file_name` in `save_path`, see
+        `read_data_file`.
+        '''
+        # 方法实现
+        return read_data_file(file_name)
 
     # 知识图谱删除方法：
     def graph_cleaner(self):
@@ -171,20 +704,23 @@ class BaseSaver(object):
     def graph_builder(self):
         pass
 
-    # 数据存储器退出方法：
-    def __del__(self):
+    # 数据存储器关闭方法：
+    def close(self):
         # 文档字符串
         '''
-        The deconstructor of BaseSaver class.
-
-        Deconstructs an instance of BaseSaver, closes Databases.
+        Returns the borrowed MySQL connection to pool. Shared MongoDB and
+        Neo4j clients are closed by the registry.
         '''
         # 方法实现
-        print(f'>>>> closing {self.save_mode}.')
-        if self.save_mode == 'mongodb':
-            self.connector.client.close()
-        elif self.save_mode == 'mysql':
-            self.connector.close()
+        if self.connection is not None:
+            self.registry.release_mysql(self.connection)
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 # 马蜂窝景点数据存储器子类：
@@ -202,8 +738,9 @@ class MafengwoSaver(BaseSaver):
     # 数据存储器静态成员定义
 
     # 初始化方法
-    def __init__(self, save_mode="neo4j"):
-        super(MafengwoSaver, self).__init__(save_mode)
+    def __init__(self, save_mode="neo4j", registry=None):
+        super(MafengwoSaver, self).__init__(save_mode, registry)
+        self.index_conf = RESORT_INDEXES
         if self.save_mode == "mysql":
             self.create_sql = RESORT_SQL
 
@@ -230,8 +767,9 @@ class MafengwoSaver(BaseSaver):
         relationship between them.
         '''
         # 方法实现
+        from py2neo import Node, Relationship
         for info in self.json_data:
-            print('>> saving:', info)
+            logger.debug('>> saving: %s', info)
             areaInfo = {
                 'address': info['address'], 'areaId': info['areaId'],
                 'areaName': info['areaName'], 'lat': info['lat'],
@@ -261,8 +799,9 @@ class CtripSaver(BaseSaver):
     # 类静态成员定义
 
     # 初始化方法
-    def __init__(self, save_mode="neo4j"):
-        super(CtripSaver, self).__init__(save_mode)
+    def __init__(self, save_mode="neo4j", registry=None):
+        super(CtripSaver, self).__init__(save_mode, registry)
+        self.index_conf = HOTEL_INDEXES
         if self.save_mode == "mysql":
             self.create_sql = HOTEL_SQL
 
@@ -290,8 +829,9 @@ class CtripSaver(BaseSaver):
         hasSurround relationship between them.
         '''
         # 方法实现
+        from py2neo import Node, Relationship
         for info in self.json_data:
-            print('>> saving:', info)
+            logger.debug('>> saving: %s', info)
             # 准备地点节点属性
             area_info = {
                 'address': info['address'],
@@ -318,7 +858,56 @@ class CtripSaver(BaseSaver):
                     | Relationship(hotel_node, 'hasSurround', surround_node))
 
 
+# 美团饭店数据存储器子类
+class MeituanSaver(BaseSaver):
+    # 文档字符串
+    '''
+    Defines a MeituanSaver class inherited from BaseSaver class.
+
+    MeituanSaver class allows users to save all restaurants infos data fetched
+    from meituan api.
+
+    :Usage:
+
+    '''
+
+    # 类静态成员定义
+
+    # 初始化方法
+    def __init__(self, save_mode="neo4j", registry=None):
+        super(MeituanSaver, self).__init__(save_mode, registry)
+        self.index_conf = RESTAURANT_INDEXES
+        if self.save_mode == "mysql":
+            self.create_sql = RESTAURANT_SQL
+
+    # 知识图谱删除方法
+    def graph_cleaner(self):
+        # 文档字符串
+        '''
+        Deletes restaurant nodes of meituan data in Graph Database Neo4j.
+        '''
+        # 方法实现
+        self.connector.run("match (n:restaurant) detach delete n")
+
+    # 知识图谱生成方法
+    def graph_builder(self):
+        # 文档字符串
+        '''
+        Builds restaurant nodes of meituan data in Graph Database Neo4j.
+        '''
+        # 方法实现
+        from py2neo import Node
+        for info in self.json_data:
+            self.connector.create(Node("restaurant", **info))
+
+
 # 测试代码：
 if __name__ == '__main__':
-    saver = CtripSaver()
-    saver.data_save('HaikouHotels', 'SanyaHotels')
+    from profiler import entry_point
+
+    def main():
+        with shared_registry, CtripSaver() as saver:
+            saver.data_save('HaikouHotels', 'SanyaHotels')
+        print(metrics.summary())
+
+    entry_point('CtripSaver', main)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a QuestionDeduper class allows QA spiders to drop near-duplicate
+questions with MinHash signatures and a persisted LSH index.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import re
+import zlib
+import random
+import sqlite3
+import hashlib
+from array import array
+
+# 相关第三方库导入
+
+# 本地库导入
+from settings import DEDUP_INDEX, DEDUP_THRESHOLD, DEDUP_PERM, DEDUP_SHINGLE
+
+
+# 全局变量：
+# MinHash哈希函数使用的梅森素数
+MERSENNE_PRIME = (1 << 61) - 1
+# 哈希函数随机参数的种子，持久化的索引依赖固定的哈希函数
+HASH_SEED = 20181105
+# 问题归一化时去除的空白和标点
+PUNCTUATION = re.compile(r'[\s\W_]+')
+# 每插入多少条问题提交一次索引
+COMMIT_EVERY = 1000
+# LSH分桶键的版本，分桶键算法改变时升级，旧索引的分桶会按签名重建
+BUCKET_VERSION = 2
+
+
+# 函数定义：
+
+# LSH分段参数计算函数
+def lsh_params(threshold, num_perm):
+    # 文档字符串
+    '''
+    Picks LSH band number and rows per band whose S-curve threshold
+    (1/bands)^(1/rows) is closest to `threshold`.
+
+    :Args:
+     - threshold : a float of Jaccard similarity threshold.
+     - num_perm : an int of MinHash permutation number.
+
+    :Returns:
+     - a tuple of (bands, rows).
+    '''
+    # 方法实现
+    best = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1:]
+
+
+# 问题字符分片函数
+def shingles(question, size=DEDUP_SHINGLE):
+    # 文档字符串
+    '''
+    Returns the set of character shingles of a normalized question, which
+    ignores case, whitespaces and punctuations.
+    '''
+    # 方法实现
+    text = PUNCTUATION.sub('', question.lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i+size] for i in range(len(text) - size + 1)}
+
+
+# 类定义：
+
+# 问答近似重复问题过滤器
+class QuestionDeduper(object):
+    # 文档字符串
+    '''
+    QuestionDeduper class keeps MinHash signatures of seen questions and an
+    LSH band index in a SQLite file. A new question is only compared with
+    questions sharing at least one LSH bucket, so checking costs the same
+    however many millions of questions were seen.
+
+    :Usage:
+        with QuestionDeduper() as deduper:
+            unique = list(deduper.filter(questions))
+
+    '''
+
+    # 类静态成员定义
+
+    # 初始化方法
+    def __init__(self, index_path=DEDUP_INDEX, threshold=DEDUP_THRESHOLD,
+                 num_perm=DEDUP_PERM):
+        # 文档字符串
+        '''
+        Initialize a new instance of the QuestionDeduper, opens or creates the
+        persisted index of `index_path`.
+
+        :Args:
+         - index_path : a str of SQLite index file path.
+         - threshold : a float of Jaccard similarity above which questions are
+         near-duplicates.
+         - num_perm : an int of MinHash permutation number.
+        '''
+        # 方法实现
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rand = random.Random(HASH_SEED)
+        self.hash_a = [rand.randrange(1, MERSENNE_PRIME)
+                       for _ in range(num_perm)]
+        self.hash_b = [rand.randrange(0, MERSENNE_PRIME)
+                       for _ in range(num_perm)]
+        self.pending = 0
+
+        index_dir = os.path.dirname(index_path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        self.connection = sqlite3.connect(index_path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value REAL);
+            CREATE TABLE IF NOT EXISTS signatures(
+                id INTEGER PRIMARY KEY, question TEXT, signature BLOB);
+            CREATE TABLE IF NOT EXISTS buckets(
+                band INTEGER, bucket INTEGER, id INTEGER);
+            CREATE INDEX IF NOT EXISTS idx_bucket ON buckets(band, bucket);
+        ''')
+        meta = dict(self.connection.execute('SELECT key, value FROM meta'))
+        if not meta:
+            self.connection.executemany(
+                'INSERT INTO meta VALUES (?, ?)',
+                [('threshold', threshold), ('num_perm', num_perm),
+                 ('bucket_version', BUCKET_VERSION)])
+            self.connection.commit()
+        elif (meta['threshold'], meta['num_perm']) != (threshold, num_perm):
+            raise RuntimeError(f'去重索引{index_path}的参数与指定参数不一致，'
+                               f'请使用新的索引文件！')
+        elif meta.get('bucket_version') != BUCKET_VERSION:
+            self.rebuild_buckets()
+
+    # MinHash签名计算方法
+    def signature(self, question):
+        # 文档字符串
+        '''
+        Computes MinHash signature of a question's character shingles.
+
+        :Returns:
+         - an array of `num_perm` unsigned ints, or None for empty question.
+        '''
+        # 方法实现
+        hashes = [zlib.crc32(shingle.encode('utf-8'))
+                  for shingle in shingles(question)]
+        if not hashes:
+            return None
+        return array('Q', [min((a * h + b) % MERSENNE_PRIME for h in hashes)
+                           for a, b in zip(self.hash_a, self.hash_b)])
+
+    # LSH分桶方法
+    def band_keys(self, signature):
+        # 文档字符串
+        '''
+        Yields (band, bucket) keys of a signature, one per LSH band. Buckets
+        are signed 64 bit blake2b digests of the band's values, so persisted
+        buckets match whatever interpreter reads the index.
+        '''
+        # 方法实现
+        for band in range(self.bands):
+            values = signature[band*self.rows:(band+1)*self.rows]
+            digest = hashlib.blake2b(
+                b''.join(value.to_bytes(8, 'little') for value in values),
+                digest_size=8).digest()
+            yield band, int.from_bytes(digest, 'little', signed=True)
+
+    # 分桶重建方法
+    def rebuild_buckets(self):
+        # 文档字符串
+        '''
+        Recomputes LSH buckets of all indexed signatures with `band_keys`,
+        for indexes written with buckets of an older `BUCKET_VERSION`.
+        '''
+        # 方法实现
+        self.connection.execute('DELETE FROM buckets')
+        for row_id, blob in self.connection.execute(
+                'SELECT id, signature FROM signatures').fetchall():
+            signature = array('Q')
+            signature.frombytes(blob)
+            self.connection.executemany(
+                'INSERT INTO buckets VALUES (?, ?, ?)',
+                [(band, bucket, row_id)
+                 for band, bucket in self.band_keys(signature)])
+        self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                ('bucket_version', BUCKET_VERSION))
+        self.connection.commit()
+
+    # 近似重复判断方法
+    def is_duplicate(self, question, add=True):
+        # 文档字符串
+        '''
+        Checks whether a question is a near-duplicate of a seen question, by
+        estimated Jaccard similarity of candidates sharing an LSH bucket.
+
+        :Args:
+         - question : a str of question.
+         - add : a bool of whether to add a non-duplicate question into index.
+
+        :Returns:
+         - a bool of whether the question is a near-duplicate.
+        '''
+        # 方法实现
+        signature = self.signature(question)
+        if signature is None:
+            return True
+        keys = list(self.band_keys(signature))
+        candidates = set()
+        for band, bucket in keys:
+            candidates.update(row[0] for row in self.connection.execute(
+                'SELECT id FROM buckets WHERE band = ? AND bucket = ?',
+                (band, bucket)))
+        for candidate in candidates:
+            other = array('Q')
+            other.frombytes(self.connection.execute(
+                'SELECT signature FROM signatures WHERE id = ?',
+                (candidate,)).fetchone()[0])
+            same = sum(x == y for x, y in zip(signature, other))
+            if same / self.num_perm >= self.threshold:
+                return True
+        if add:
+            self.add(question, signature, keys)
+        return False
+
+    # 问题入库方法
+    def add(self, question, signature, keys):
+        # 文档字符串
+        '''
+        Adds a question's signature and LSH buckets into index.
+        '''
+        # 方法实现
+        cursor = self.connection.execute(
+            'INSERT INTO signatures(question, signature) VALUES (?, ?)',
+            (question, signature.tobytes()))
+        self.connection.executemany(
+            'INSERT INTO buckets VALUES (?, ?, ?)',
+            [(band, bucket, cursor.lastrowid) for band, bucket in keys])
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.commit()
+
+    # 问题流过滤方法
+    def filter(self, questions):
+        # 文档字符串
+        '''
+        Yields questions which are not near-duplicates of seen ones, and adds
+        them into index.
+        '''
+        # 方法实现
+        for question in questions:
+            if not self.is_duplicate(question):
+                yield question
+        self.commit()
+
+    # 索引提交方法
+    def commit(self):
+        self.connection.commit()
+        self.pending = 0
+
+    # 索引关闭方法
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines page extractors of every page type on two parser backends: lxml
+with XPath, and selectolax (lexbor) with CSS selectors. Backends only
+select raw values from a page, shared builders turn them into items, so
+both backends give identical items. The backend of each page type is
+picked by `PARSER_BACKENDS`, or by `benchmark.py parser --save`.
+
+:Usage:
+    hotels = extract('hotel_list', response)['hotels']
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import re
+import json
+import hashlib
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import metrics
+from parsing import html_tree
+from settings import PARSER_BACKENDS, PARSER_BACKENDS_PATH, RECORD_PAGES, \
+                     PAGE_SAMPLES_PATH
+
+
+# 全局变量：
+# 页面类型：马蜂窝景点页、携程酒店列表页、携程酒店详情页、马蜂窝问答页、携程问答页
+PAGE_TYPES = ('resort', 'hotel_list', 'hotel_detail', 'question', 'ask')
+# 携程问答分页链接
+ASK_PAGE_PATTERN = re.compile(r'/asks/search/p(\d+)')
+# 携程酒店联系电话
+PHONE_PATTERN = re.compile(r'(\(\d{3,4}\)|\d{3,4}-|\s)?\d{8}')
+# 不保存的携程酒店政策
+SKIP_POLICIES = ("儿童政策", "可用支付方式")
+# 已创建的后端实例，和各页面类型使用的后端
+extractors = dict()
+backends = None
+
+
+# 函数定义：
+
+# 酒店列表字段构建函数
+def build_hotel(raw):
+    # 文档字符串
+    '''
+    Builds a hotel item of list page fields from raw strings selected by a
+    backend.
+    '''
+    # 方法实现
+    item = {
+        'hotel_id': int(raw['id']),
+        'hotel_name': raw['name'],
+        'address': raw['address'].strip('】 '),
+        'business_zone': raw['zone'],
+        'lowest_price': int(raw['price']),
+        'hotel_label': list(raw['labels']),
+        'newbooking': None,
+        'hotel_level': None,
+        'hotel_score': 0,
+        'hotel_proposition': 0,
+        'judge_count': 0,
+        'recommend': None,
+        'ctrip_qualified': raw['qualified'],
+        'ctrip_star': 0,
+        'country_star': 0,
+        'ctrip_corporate': raw['corporate'],
+        'sale_amount': 0,
+        'reserve_count': 0
+    }
+    # 更新携程酒店星级和国家酒店星级字段
+    if len(raw['diamond']) == 1:
+        item['ctrip_star'] = int(raw['diamond'][0].strip('hotel_diamond'))
+    if len(raw['stars']) == 1:
+        item['country_star'] = int(raw['stars'][0].strip('hotel_stars'))
+    # 更新酒店评价字段
+    if len(raw['level']) > 0:
+        item['hotel_level'] = raw['level']
+    if len(raw['score']) > 0:
+        item['hotel_score'] = float(raw['score'])
+    if len(raw['proposition']) > 0:
+        item['hotel_proposition'] = int(raw['proposition'].strip('%')) / 100
+    if len(raw['judge_count']) > 0:
+        item['judge_count'] = int(raw['judge_count'])
+        item['sale_amount'] = item['lowest_price'] * item['judge_count']
+        item['reserve_count'] = (item['hotel_proposition']
+                                 * item['judge_count'])
+    if len(raw['recommend']) > 0:
+        item['recommend'] = raw['recommend']
+    if len(raw['newbook']) > 0:
+        item['newbooking'] = raw['newbook']
+    return item
+
+
+# 酒店详情字段构建函数
+def build_detail(raw):
+    # 文档字符串
+    '''
+    Builds hotel detail fields from raw strings selected by a backend.
+    '''
+    # 方法实现
+    item = {
+        "contact": None,
+        "introduction": None,
+        "hotel_facilities": raw['facilities'],
+        "hotel_policy": dict(),
+        "surround_facilities": raw['surround']
+    }
+    if len(raw['phone']) > 0:
+        item['contact'] = PHONE_PATTERN.search(raw['phone'].strip()).group(0)
+    if len(raw['intro']) > 0:
+        item['introduction'] = raw['intro'].strip()
+    for key, value in raw['policy']:
+        if key in SKIP_POLICIES:
+            continue
+        item['hotel_policy'].setdefault(key, value)
+    return item
+
+
+# 页面数解析函数
+def page_number(text):
+    text = text.strip()
+    return int(text) if text.isdigit() else 1
+
+
+# 页面类型后端选择函数
+def backend_of(page_type):
+    # 文档字符串
+    '''
+    Returns the backend name of `page_type`: picked by the parser benchmark
+    if its result file exists, else `PARSER_BACKENDS`, else lxml.
+    '''
+    # 方法实现
+    global backends
+    if backends is None:
+        picked = dict(PARSER_BACKENDS)
+        if PARSER_BACKENDS_PATH and os.path.exists(PARSER_BACKENDS_PATH):
+            with open(PARSER_BACKENDS_PATH, encoding='utf-8') as file:
+                picked.update(json.load(file))
+        backends = picked
+    return backends.get(page_type, 'lxml')
+
+
+# 后端实例获取函数
+def get_extractor(backend):
+    extractor = extractors.get(backend)
+    if extractor is None:
+        if backend not in BACKENDS:
+            raise RuntimeError(f'解析后端{backend}不存在，请输入'
+                               f'{"、".join(BACKENDS)}！')
+        extractor = extractors[backend] = BACKENDS[backend]()
+    return extractor
+
+
+# 页面样本记录函数
+def record_page(page_type, page):
+    # 文档字符串
+    '''
+    Saves a page into `PAGE_SAMPLES_PATH/<page_type>/<md5>.html` as utf-8,
+    parity checks and parser benchmarks run on these samples.
+    '''
+    # 方法实现
+    if isinstance(page, str):
+        content = page.encode('utf-8')
+    elif isinstance(page, bytes):
+        content = page
+    elif hasattr(page, 'content'):
+        content = page.content
+        if (page.encoding or 'utf-8').lower() not in ('utf-8', 'utf8'):
+            content = content.decode(page.encoding, 'replace').encode('utf-8')
+    else:
+        return
+    sample_dir = os.path.join(PAGE_SAMPLES_PATH, page_type)
+    if not os.path.exists(sample_dir):
+        os.makedirs(sample_dir)
+    name = hashlib.md5(content).hexdigest()
+    with open(os.path.join(sample_dir, f'{name}.html'), 'wb') as file:
+        file.write(content)
+
+
+# 页面提取函数
+def extract(page_type, page, backend=None):
+    # 文档字符串
+    '''
+    Extracts a page of `page_type` with its backend, and records parse time
+    into `stage_seconds` labeled by page type and backend.
+
+    :Args:
+     - page_type : a str of page type in `PAGE_TYPES`.
+     - page : a :class:`Response`, bytes or str of the page.
+     - backend : a str of backend name, None for the backend of page type.
+
+    :Returns:
+     - extracted data of the page, see methods of :class:`LxmlExtractor`.
+    '''
+    # 方法实现
+    backend = backend or backend_of(page_type)
+    if RECORD_PAGES:
+        record_page(page_type, page)
+    extractor = get_extractor(backend)
+    with metrics.timer(stage='parse', page=page_type, backend=backend):
+        return getattr(extractor, page_type)(page)
+
+
+# 类定义：
+
+# lxml解析后端
+class LxmlExtractor(object):
+    # 文档字符串
+    '''
+    LxmlExtractor class extracts pages with lxml XPath, it is the reference
+    backend other backends are checked against.
+    '''
+
+    # 景点页面提取方法
+    def resort(self, page):
+        # 文档字符串
+        '''
+        Extracts a Mafengwo resort page.
+
+        :Returns:
+         - a dict of `details` and `baseinfo` dicts, `introduction`,
+           `resortName`, `areaName`, `areaId`, `address` and `poi` params of
+           location api, or None if the page is not a resort page, e.g. it
+           is a ban page of proxy.
+        '''
+        # 方法实现
+        blocks = html_tree(page).xpath('//div[@class="row row-top" '
+                                       'or @data-anchor="overview"]')
+        if len(blocks) != 2:
+            return None
+        row_top, overview = blocks
+        item = {'details': dict(), 'introduction': None, 'baseinfo': dict()}
+
+        mod_detail = overview.xpath('//div[@class="mod mod-detail"]')
+        if len(mod_detail) == 1:
+            for dl in mod_detail[0].xpath('dl'):
+                dt, dd = dl
+                item['details'][dt.text] = dd.xpath('string()').strip()
+
+            intro = mod_detail[0].xpath('div[@class="summary"]')
+            if len(intro) == 1:
+                item['introduction'] = intro[0].xpath('string()').strip()
+
+            base_info = mod_detail[0].xpath('ul[@class="baseinfo clearfix"]')
+            if len(base_info) == 1:
+                for li in base_info[0].xpath('li'):
+                    content = li.xpath('div[@class="content"]').pop()
+                    item['baseinfo'][li.get('class').replace('-', '_')] = \
+                        content.xpath('string()').strip()
+
+        a = row_top.xpath('//div[@class="drop"]/span/a').pop()
+        item['resortName'] = str(row_top.xpath('//div[@class="title"]'
+                                               '/h1/text()').pop())
+        item['areaName'] = a.text
+        item['areaId'] = int(re.search(r'(\d+)\.html', a.get('href'))[1])
+
+        mod_location = overview.xpath('div[@class="mod mod-location"]').pop()
+        item['poi'] = str(mod_location.xpath(
+            '//div[contains(@data-api,"poiLocationApi")]/@data-params').pop())
+        item['address'] = str(mod_location.xpath(
+            '//p[@class="sub"]/text()').pop())
+        return item
+
+    # 酒店列表页面提取方法
+    def hotel_list(self, page):
+        # 文档字符串
+        '''
+        Extracts a Ctrip hotel list page.
+
+        :Returns:
+         - a dict of `hotels`, a list of hotel items of list page fields,
+           and `pages`, an int of total list pages read from the pager.
+        '''
+        # 方法实现
+        tree = html_tree(page)
+        hotels = [build_hotel(self.hotel(elem)) for elem in tree.xpath(
+            "//div[contains(@class,'hotel_new_list')]")]
+        pages = tree.xpath("string(//div[@class='page_box']"
+                           "//a[@rel='nofollow'])")
+        return {'hotels': hotels, 'pages': page_number(pages)}
+
+    # 酒店列表项提取方法
+    def hotel(self, elem):
+        ico, label, judge = elem.xpath(".//span[@class='hotel_ico']"
+                                       "|.//span[@class='special_label']"
+                                       "|.//div[@class='hotelitem_judge_box']")
+        corporate = ico.xpath('./span[@data-role="title"]')
+        return {
+            'id': elem.xpath("@id").pop(),
+            'name': str(elem.xpath(".//h2[@class='hotel_name']"
+                                   "/a/@title").pop()),
+            'address': str(elem.xpath(".//p[@class='hotel_item_htladdress']"
+                                      "/text()").pop()),
+            'zone': str(elem.xpath(".//p[@class='hotel_item_htladdress']"
+                                   "/a[1]/text()").pop()),
+            'price': elem.xpath("string(.//div[contains(@class,"
+                                "'hotel_price')]/a)"),
+            'qualified': len(ico.xpath('./span[@class="ico_quality_gold"]'))
+                         == 1,
+            'corporate': corporate[0].get("class") if len(corporate) == 1
+                         else None,
+            'diamond': [str(cls) for cls in ico.xpath(
+                "./span[contains(@class,'hotel_diamond')]/@class")],
+            'stars': [str(cls) for cls in ico.xpath(
+                "./span[contains(@class,'hotel_stars')]/@class")],
+            'labels': [str(text) for text in label.xpath('.//text()')],
+            'level': judge.xpath('string(.//span[@class="hotel_level"])'),
+            'score': judge.xpath('string(.//span[@class="hotel_value"])'),
+            'proposition': judge.xpath('string(.//span[@class='
+                                       '"total_judgement_score"]/span)'),
+            'judge_count': judge.xpath('string(.//span[@class='
+                                       '"hotel_judgement"]/span)'),
+            'recommend': judge.xpath('string(.//span[@class="recommend"])'),
+            'newbook': elem.xpath('string(.//p[@class='
+                                  '"hotel_item_last_book"])'),
+        }
+
+    # 酒店详情页面提取方法
+    def hotel_detail(self, page):
+        # 文档字符串
+        '''
+        Extracts a Ctrip hotel detail page.
+
+        :Returns:
+         - a dict of hotel detail fields, or None if the page has no hotel
+           info block.
+        '''
+        # 方法实现
+        hotel_info = html_tree(page).xpath('//div[@id="hotel_info_comment"]')
+        if len(hotel_info) != 1:
+            return None
+        raw = {'phone': '', 'intro': '', 'facilities': dict(),
+               'policy': list(), 'surround': dict()}
+        hotel_intro = hotel_info[0].xpath('.//div[@id="htlDes"]')
+        if len(hotel_intro) == 1:
+            raw['phone'] = hotel_intro[0].xpath('string(.//span[@data-real]'
+                                                '/@data-real)')
+            raw['intro'] = hotel_intro[0].xpath('string(.//span[@itemprop='
+                                                '"description"])')
+        hotel_facility = hotel_info[0].xpath(".//div[@id='J_htl_facilities']")
+        if len(hotel_facility) == 1:
+            for tr in hotel_facility[0].xpath('.//tr[@data-init]'):
+                raw['facilities'].setdefault(
+                    tr.xpath('string(./th)'),
+                    [str(title) for title in tr.xpath('.//li[@title]/@title')])
+        hotel_policy = hotel_info[0].xpath('.//h2[text()="酒店政策"]')
+        if len(hotel_policy) == 1:
+            for tr in hotel_policy[0].getnext().xpath('.//tr'):
+                raw['policy'].append((tr.xpath('string(./th)'),
+                                      tr.xpath('string(./td)')))
+        surround = hotel_info[0].xpath('.//h2[text()="周边设施"]')
+        if len(surround) == 1:
+            for tr in surround[0].getnext().xpath('.//tr'):
+                raw['surround'].setdefault(
+                    tr.xpath('string(./th)'),
+                    [str(text) for text in tr.xpath('.//li/text()')])
+        return build_detail(raw)
+
+    # 马蜂窝问答页面提取方法
+    def question(self, page):
+        return [str(text) for text in html_tree(page).xpath(
+            '//li[contains(@class, "item clearfix")]/div[@class="title"]'
+            '/a/text()')]
+
+    # 携程问答页面提取方法
+    def ask(self, page):
+        # 文档字符串
+        '''
+        Extracts a Ctrip ask page.
+
+        :Returns:
+         - a tuple of (questions, last page number in pager or None).
+        '''
+        # 方法实现
+        tree = html_tree(page)
+        questions = [question.xpath('string(.)').strip() for question
+                     in tree.xpath('//ul[@class="asklist"]/li/p')]
+        numbers = [int(match[1]) for match in map(ASK_PAGE_PATTERN.search,
+                                                  tree.xpath('//a/@href'))
+                   if match]
+        return questions, max(numbers) if numbers else None
+
+
+# selectolax解析后端
+class LexborExtractor(object):
+    # 文档字符串
+    '''
+    LexborExtractor class extracts pages with CSS selectors of selectolax's
+    lexbor engine, which builds its tree several times faster than lxml.
+    XPath `text()`, `string()` and `.text` are emulated by `own_texts`,
+    `string` and `first_text`.
+    '''
+
+    # 初始化方法
+    def __init__(self):
+        # 按需导入selectolax，默认的lxml后端不依赖它
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser = LexborHTMLParser
+
+    # 页面解析方法
+    def tree(self, page):
+        if not isinstance(page, (str, bytes)):
+            encoding = (page.encoding or 'utf-8').lower()
+            page = page.content if encoding in ('utf-8', 'utf8') \
+                else page.content.decode(encoding, 'replace')
+        return self.parser(page)
+
+    # 子元素筛选方法
+    @staticmethod
+    def children(node, tag, cls=None):
+        return [child for child in node.iter() if child.tag == tag and
+                (cls is None or child.attributes.get('class') == cls)]
+
+    # 直接文本节点方法，对应XPath的text()
+    @staticmethod
+    def own_texts(node):
+        return [child.text_content for child in node.iter(include_text=True)
+                if child.tag == '-text']
+
+    # 首个文本方法，对应lxml元素的text属性
+    @staticmethod
+    def first_text(node):
+        first = next(node.iter(include_text=True), None)
+        return first.text_content if first is not None and \
+            first.tag == '-text' else None
+
+    # 首个匹配元素文本方法，对应XPath的string()
+    @staticmethod
+    def string(node, selector):
+        first = node.css_first(selector)
+        return first.text() if first is not None else ''
+
+    # 下一个兄弟元素方法
+    @staticmethod
+    def next_element(node):
+        node = node.next
+        while node is not None and node.tag.startswith(('-', '!')):
+            node = node.next
+        return node
+
+    # 景点页面提取方法
+    def resort(self, page):
+        tree = self.tree(page)
+        row_top = tree.css('div[class="row row-top"]')
+        overview = tree.css('div[data-anchor="overview"]')
+        if len(row_top) != 1 or len(overview) != 1:
+            return None
+        item = {'details': dict(), 'introduction': None, 'baseinfo': dict()}
+
+        mod_detail = tree.css('div[class="mod mod-detail"]')
+        if len(mod_detail) == 1:
+            for dl in self.children(mod_detail[0], 'dl'):
+                dt, dd = dl.iter()
+                item['details'][self.first_text(dt)] = dd.text().strip()
+
+            intro = self.children(mod_detail[0], 'div', 'summary')
+            if len(intro) == 1:
+                item['introduction'] = intro[0].text().strip()
+
+            base_info = self.children(mod_detail[0], 'ul', 'baseinfo clearfix')
+            if len(base_info) == 1:
+                for li in self.children(base_info[0], 'li'):
+                    content = self.children(li, 'div', 'content').pop()
+                    item['baseinfo'][li.attributes['class'].replace(
+                        '-', '_')] = content.text().strip()
+
+        a = tree.css('div[class="drop"] > span > a').pop()
+        item['resortName'] = [text for h1 in tree.css('div[class="title"] > h1')
+                              for text in self.own_texts(h1)].pop()
+        item['areaName'] = self.first_text(a)
+        item['areaId'] = int(re.search(r'(\d+)\.html',
+                                       a.attributes['href'])[1])
+
+        self.children(overview[0], 'div', 'mod mod-location').pop()
+        item['poi'] = tree.css('div[data-api*="poiLocationApi"][data-params]'
+                               ).pop().attributes['data-params']
+        item['address'] = [text for p in tree.css('p[class="sub"]')
+                           for text in self.own_texts(p)].pop()
+        return item
+
+    # 酒店列表页面提取方法
+    def hotel_list(self, page):
+        tree = self.tree(page)
+        hotels = [build_hotel(self.hotel(elem))
+                  for elem in tree.css('div[class*="hotel_new_list"]')]
+        pages = self.string(tree, 'div[class="page_box"] a[rel="nofollow"]')
+        return {'hotels': hotels, 'pages': page_number(pages)}
+
+    # 酒店列表项提取方法
+    def hotel(self, elem):
+        (ico,), (label,), (judge,) = (
+            elem.css('span[class="hotel_ico"]'),
+            elem.css('span[class="special_label"]'),
+            elem.css('div[class="hotelitem_judge_box"]'))
+        spans = self.children(ico, 'span')
+        corporate = [span for span in spans
+                     if span.attributes.get('data-role') == 'title']
+        classes = [span.attributes.get('class') or '' for span in spans]
+        addresses = elem.css('p[class="hotel_item_htladdress"]')
+        return {
+            'id': elem.attributes['id'],
+            'name': elem.css('h2[class="hotel_name"] > a[title]'
+                             ).pop().attributes['title'],
+            'address': [text for p in addresses
+                        for text in self.own_texts(p)].pop(),
+            'zone': [text for p in addresses
+                     for a in self.children(p, 'a')[:1]
+                     for text in self.own_texts(a)].pop(),
+            'price': self.string(elem, 'div[class*="hotel_price"] > a'),
+            'qualified': classes.count('ico_quality_gold') == 1,
+            'corporate': corporate[0].attributes.get('class')
+                         if len(corporate) == 1 else None,
+            'diamond': [cls for cls in classes if 'hotel_diamond' in cls],
+            'stars': [cls for cls in classes if 'hotel_stars' in cls],
+            'labels': [node.text_content for node
+                       in label.traverse(include_text=True)
+                       if node.tag == '-text'],
+            'level': self.string(judge, 'span[class="hotel_level"]'),
+            'score': self.string(judge, 'span[class="hotel_value"]'),
+            'proposition': self.string(
+                judge, 'span[class="total_judgement_score"] > span'),
+            'judge_count': self.string(
+                judge, 'span[class="hotel_judgement"] > span'),
+            'recommend': self.string(judge, 'span[class="recommend"]'),
+            'newbook': self.string(elem, 'p[class="hotel_item_last_book"]'),
+        }
+
+    # 酒店详情表格行方法
+    def table_rows(self, hotel_info, title):
+        heads = [h2 for h2 in hotel_info.css('h2')
+                 if title in self.own_texts(h2)]
+        if len(heads) != 1:
+            return []
+        return self.next_element(heads[0]).css('tr')
+
+    # 表格单元文本方法，对应XPath的string(./th)
+    def cell(self, tr, tag):
+        cells = self.children(tr, tag)
+        return cells[0].text() if cells else ''
+
+    # 酒店详情页面提取方法
+    def hotel_detail(self, page):
+        hotel_info = self.tree(page).css('div[id="hotel_info_comment"]')
+        if len(hotel_info) != 1:
+            return None
+        hotel_info = hotel_info[0]
+        raw = {'phone': '', 'intro': '', 'facilities': dict(),
+               'policy': list(), 'surround': dict()}
+        hotel_intro = hotel_info.css('div[id="htlDes"]')
+        if len(hotel_intro) == 1:
+            phone = hotel_intro[0].css_first('span[data-real]')
+            raw['phone'] = phone.attributes['data-real'] or '' \
+                if phone is not None else ''
+            raw['intro'] = self.string(hotel_intro[0],
+                                       'span[itemprop="description"]')
+        hotel_facility = hotel_info.css('div[id="J_htl_facilities"]')
+        if len(hotel_facility) == 1:
+            for tr in hotel_facility[0].css('tr[data-init]'):
+                raw['facilities'].setdefault(
+                    self.cell(tr, 'th'), [li.attributes['title'] for li
+                                          in tr.css('li[title]')])
+        for tr in self.table_rows(hotel_info, '酒店政策'):
+            raw['policy'].append((self.cell(tr, 'th'), self.cell(tr, 'td')))
+        for tr in self.table_rows(hotel_info, '周边设施'):
+            raw['surround'].setdefault(
+                self.cell(tr, 'th'), [text for li in tr.css('li')
+                                      for text in self.own_texts(li)])
+        return build_detail(raw)
+
+    # 马蜂窝问答页面提取方法
+    def question(self, page):
+        return [text for a in self.tree(page).css(
+                    'li[class*="item clearfix"] > div[class="title"] > a')
+                for text in self.own_texts(a)]
+
+    # 携程问答页面提取方法
+    def ask(self, page):
+        tree = self.tree(page)
+        questions = [p.text().strip()
+                     for p in tree.css('ul[class="asklist"] > li > p')]
+        numbers = [int(match[1]) for match in map(
+            ASK_PAGE_PATTERN.search,
+            (a.attributes['href'] or '' for a in tree.css('a[href]')))
+            if match]
+        return questions, max(numbers) if numbers else None
+
+
+# 解析后端名称到后端类的映射
+BACKENDS = {
+    'lxml': LxmlExtractor,
+    'selectolax': LexborExtractor,
+}
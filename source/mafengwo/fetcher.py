@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a Fetcher class shared by all spiders, which sends HTTP requests
+through a pluggable transport with timeouts and retries, and downloads
+pages concurrently in a bounded thread pool. Pages of which only one
+element is needed may be streamed and parsed until that element ends, and
+responses may be kept in a WARC archive for offline re-extraction.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import re
+import threading
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, \
+                               Future
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import metrics, logger
+from transport import get_transport
+from parsing import stream_page
+from settings import TIMEOUT, FETCH_WORKERS, FETCH_RETRIES, FETCH_COALESCE, \
+                     FETCH_TRANSPORT, FETCH_STREAM, STREAM_CHUNK_SIZE, \
+                     ARCHIVE_RESPONSES
+
+
+# 全局变量：
+# 响应头Content-Type中声明的字符集
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w-]+)', re.I)
+
+
+# 函数定义：
+
+# 响应字符集函数
+def charset(response, default='utf-8'):
+    # 文档字符串
+    '''
+    Returns the charset declared by Content-Type header of a response, or
+    `default` if it declares none.
+    '''
+    # 方法实现
+    match = CHARSET_PATTERN.search(response.headers.get('Content-Type', ''))
+    return match[1].lower() if match else default
+
+
+# 类定义：
+
+# 可追加的待下载队列
+class WorkQueue(deque):
+    # 文档字符串
+    '''
+    WorkQueue class is a deque iterated by popping from the left, which
+    stops while empty but may be iterated again after items are appended.
+    So :meth:`Fetcher.map_unordered` keeps pulling work that the caller
+    discovers from results already yielded, e.g. later pages of a list.
+
+    :Usage:
+        queue = WorkQueue(first_pages)
+        for page, result in fetcher.map_unordered(download, queue):
+            queue.extend(next_pages(page, result))
+
+    '''
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self:
+            raise StopIteration
+        return self.popleft()
+
+
+# 爬虫下载引擎
+class Fetcher(object):
+    # 文档字符串
+    '''
+    Fetcher class sends HTTP requests through a transport, by default
+    `requests` with one keep-alive session per thread, and maps download
+    functions over items with at most `workers` requests in flight.
+
+    Identical GET requests in flight at the same time are coalesced: the
+    first caller sends the request, and concurrent callers with the same
+    method, URL and params wait for and share its response.
+
+    :Usage:
+        fetcher = Fetcher()
+        for page, response in fetcher.map_unordered(download, pages):
+            ...
+
+    '''
+
+    # 类静态成员定义
+    # 待下载项耗尽标记
+    EXHAUSTED = object()
+    # 可合并的幂等请求方法
+    COALESCE_METHODS = ('GET', 'HEAD')
+
+    # 初始化方法
+    def __init__(self, workers=FETCH_WORKERS, retries=FETCH_RETRIES,
+                 timeout=TIMEOUT, coalesce=FETCH_COALESCE,
+                 transport=FETCH_TRANSPORT, stream=FETCH_STREAM,
+                 archive=ARCHIVE_RESPONSES):
+        # 文档字符串
+        '''
+        Initialize a new instance of the Fetcher.
+
+        :Args:
+         - workers : an int of maximum concurrent requests.
+         - retries : an int of maximum retry times of a request.
+         - timeout : a default (connect, read) timeout tuple of requests.
+         - coalesce : a bool of whether to share one response among
+         identical requests in flight.
+         - transport : a str of transport name of :mod:`transport`, e.g.
+         `requests` or `http2`, or a transport instance.
+         - stream : a bool of whether :meth:`request_until` streams pages,
+         False to download and parse whole pages.
+         - archive : a :class:`ResponseArchive` which successful responses
+         are written to, True for the archive shared in this process, or
+         False not to archive.
+        '''
+        # 方法实现
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.stream = stream
+        if archive is True:
+            # 按需导入存档模块，存档模块依赖本模块的charset函数
+            from archive import shared_archive
+            archive = shared_archive()
+        self.archive = archive or None
+        self.transport = get_transport(transport, workers)
+        self.flights = dict()
+        self.flights_lock = threading.Lock()
+
+    # 请求合并键方法
+    def flight_key(self, method, url, kwargs):
+        # 文档字符串
+        '''
+        Returns the key identical requests are coalesced by, or None if the
+        request must be sent on its own, e.g. it is not idempotent or its
+        response is streamed.
+        '''
+        # 方法实现
+        method = method.upper()
+        if not self.coalesce or method not in self.COALESCE_METHODS or \
+                kwargs.get('stream'):
+            return None
+        params = kwargs.get('params')
+        if isinstance(params, dict):
+            params = sorted(params.items(), key=lambda item: str(item[0]))
+        return method, url, repr(params)
+
+    # HTTP请求方法
+    def request(self, method, url, **kwargs):
+        # 文档字符串
+        '''
+        Sends an HTTP request, or waits for the response of an identical
+        request already in flight.
+
+        The shared flight is a :class:`concurrent.futures.Future`, so both
+        fetch threads and asyncio tasks (through `asyncio.wrap_future`) may
+        wait on it.
+
+        :Args:
+         - method : method for new HTTP Requests.
+         - url : URL for new HTTP Requests.
+         - **kwargs : key words arguments of :meth:`send`.
+
+        :Returns:
+         - a :class:`Response` if request suceeded or None if exceptions
+           occured.
+        '''
+        # 方法实现
+        return self.coalesced(self.flight_key(method, url, kwargs), url,
+                              self.send, method, url, **kwargs)
+
+    # 请求合并方法
+    def coalesced(self, key, url, func, *args, **kwargs):
+        # 文档字符串
+        '''
+        Calls `func(*args, **kwargs)` as the leader of flight `key`, or waits
+        for the result of the leader already in flight, None `key` calls it
+        on its own.
+        '''
+        # 方法实现
+        if key is None:
+            return func(*args, **kwargs)
+        with self.flights_lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Future()
+        if not leader:
+            metrics.inc('requests_coalesced_total', host=urlsplit(url).netloc)
+            return flight.result()
+        try:
+            result = func(*args, **kwargs)
+            flight.set_result(result)
+            return result
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self.flights_lock:
+                del self.flights[key]
+
+    # 请求指标标签方法
+    def labels(self, url, kwargs):
+        return {'host': urlsplit(url).netloc,
+                'proxy': (kwargs.get('proxies') or {}).get('http', 'direct')}
+
+    # 流式请求方法
+    def request_until(self, method, url, target, **kwargs):
+        # 文档字符串
+        '''
+        Sends an HTTP request and parses its body while it streams in, until
+        the `target` element is complete, then closes the response, so the
+        rest of the page is neither downloaded nor parsed. Read errors of
+        the stream are retried `retries` times.
+
+        Identical streamed requests of the same `target` in flight are
+        coalesced like :meth:`request`. Each attempt, from sending to the
+        end of streaming, is recorded once as fetch, the tree is already
+        parsed when it returns.
+
+        :Args:
+         - method : method for new HTTP Requests.
+         - url : URL for new HTTP Requests.
+         - target : a (tag, attribute, value) tuple of the element needed,
+         see :func:`parsing.stream_page`, None to request the whole page.
+         - **kwargs : key words arguments of :meth:`send`.
+
+        :Returns:
+         - a :class:`PartialPage`, a :class:`Response` if `stream` is False
+           or `target` is None, or None if exceptions occured.
+        '''
+        # 方法实现
+        if not self.stream or target is None:
+            return self.request(method, url, **kwargs)
+        key = self.flight_key(method, url, kwargs)
+        return self.coalesced(key and key + (target,), url, self.stream_until,
+                              method, url, target, **kwargs)
+
+    # 流式下载方法
+    def stream_until(self, method, url, target, **kwargs):
+        # 文档字符串
+        '''
+        Streams and parses a page until `target` without coalescing, see
+        :meth:`request_until`.
+        '''
+        # 方法实现
+        labels = self.labels(url, kwargs)
+        for num in range(1, self.retries + 1):
+            with metrics.timer(stage='fetch', **labels):
+                response = self.send(method, url, stream=True, **kwargs)
+                if response is None:
+                    return None
+                try:
+                    page = stream_page(self.transport.iter_body(
+                        response, STREAM_CHUNK_SIZE), target,
+                        response.encoding)
+                except self.transport.ERRORS as e:
+                    metrics.inc('requests_total', status='retry', **labels)
+                    logger.warning('2>> Exceptions Occured: %s', e,
+                                   extra=dict(labels, retries=num))
+                    continue
+                finally:
+                    self.transport.release(response)
+            if self.archive is not None:
+                self.archive.write(response, page.content, page.complete)
+            metrics.inc('stream_bytes_total', len(page.content),
+                        host=labels['host'],
+                        target='found' if page.complete else 'missing')
+            return page
+        logger.warning('2>> Exceed maximum retry times.', extra=labels)
+        return None
+
+    # HTTP请求发送方法
+    def send(self, method, url, retries=None, **kwargs):
+        # 文档字符串
+        '''
+        Sends an HTTP request through the transport.
+
+        If timeout, proxy, HTTP status or too many redirects errors of the
+        transport occured, retries HTTP Request `retries` times; If retry
+        exceeded or other exceptions occured, return None.
+
+        Every attempt is recorded into `stage_seconds` and `requests_total`
+        metrics labeled by host and proxy, streamed attempts are timed by
+        :meth:`stream_until` with their bodies instead.
+
+        :Args:
+         - method : method for new HTTP Requests supported by the :class
+           `Request` object in `requests` module.
+         - url : URL for new HTTP Requests.
+         - retries : an int of maximum attempts of this request, None for
+           `retries` of the fetcher, e.g. 1 when every attempt is charged.
+         - **kwargs : key words arguments supported by the :class:`Request`
+           object in `requests` module, `timeout` defaults to `TIMEOUT`.
+
+        :Returns:
+         - a :class:`Response` if request suceeded or None if exceptions
+           occured.
+        '''
+        # 方法实现
+        kwargs.setdefault('timeout', self.timeout)
+        labels = self.labels(url, kwargs)
+        for num in range(1, (retries or self.retries) + 1):
+            try:
+                timer = nullcontext() if kwargs.get('stream') else \
+                    metrics.timer(stage='fetch', **labels)
+                with timer:
+                    response = self.transport.request(method, url, **kwargs)
+                    self.transport.raise_for_status(response)
+                # 只记录字符集，页面以字节交给解析器，取文本时才解码
+                response.encoding = charset(response)
+                if self.archive is not None and not kwargs.get('stream'):
+                    self.archive.write(response)
+                metrics.inc('requests_total', status='ok', **labels)
+                logger.debug('2>> Request Webpage Success.')
+                return response
+            except self.transport.RETRY_ERRORS as e:
+                metrics.inc('requests_total', status='retry', **labels)
+                logger.warning('2>> Exceptions Occured: %s', e,
+                               extra=dict(labels, retries=num))
+            except self.transport.ERRORS as e:
+                metrics.inc('requests_total', status='error', **labels)
+                logger.warning('2>> Exception Occured: %s', e, extra=labels)
+                return None
+        logger.warning('2>> Exceed maximum retry times.', extra=labels)
+        return None
+
+    # 并发下载方法
+    def map_unordered(self, func, items):
+        # 文档字符串
+        '''
+        Calls `func(item)` for items in a pool of `workers` threads, yields
+        (item, result) pairs as soon as each call is done.
+
+        Items are pulled lazily with at most `2 * workers` calls in flight,
+        so `items` may be a generator which stops on results already seen.
+
+        :Args:
+         - func : a callable of one item, usually downloads a page.
+         - items : an iterable of items.
+        '''
+        # 方法实现
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='fetch') as pool:
+            pending = dict()
+            while True:
+                # 补充任务到并发上限，生成器可以根据已返回的结果停止产出
+                while len(pending) < 2 * self.workers:
+                    item = next(items, self.EXHAUSTED)
+                    if item is self.EXHAUSTED:
+                        break
+                    pending[pool.submit(func, item)] = item
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+    # 连接关闭方法
+    def close(self):
+        # 文档字符串
+        '''
+        Closes connections of the transport and the response archive.
+        '''
+        # 方法实现
+        self.transport.close()
+        if self.archive is not None:
+            self.archive.close()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a Frontier class which keeps the crawl frontier of spiders in a
+shared work queue with leasing, visibility timeouts and dedup, and a shared
+sink of crawled items, so several worker processes can crawl together.
+Queues and items of a frontier may be scoped to one job, e.g. one area, so
+jobs of the same spider sharing a queue file don't mix.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import json
+import time
+import socket
+import sqlite3
+from collections import namedtuple
+
+# 相关第三方库导入
+
+# 本地库导入
+# 美团等爬虫目录有各自的settings，缺少的配置使用默认值
+import settings
+from metrics import logger
+
+
+# 全局变量：
+FRONTIER_PATH = getattr(settings, 'FRONTIER_PATH',
+                        './SmartTripData/Frontier.sqlite')
+FRONTIER_VISIBILITY = getattr(settings, 'FRONTIER_VISIBILITY', 300)
+FRONTIER_ATTEMPTS = getattr(settings, 'FRONTIER_ATTEMPTS', 5)
+# 任务状态
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+# 租约任务
+Task = namedtuple('Task', ['queue', 'key', 'payload', 'attempts'])
+
+
+# 函数定义：
+
+# 默认工作者名称函数
+def worker_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+# 类定义：
+
+# 分布式爬取边界队列
+class Frontier(object):
+    # 文档字符串
+    '''
+    Frontier class is a work queue of crawl tasks backed by a SQLite file,
+    which stands in for a networked queue when all workers run on one box.
+
+    Tasks are deduplicated by (queue, key). A leased task becomes visible
+    again if it is not acknowledged within `visibility` seconds, e.g. its
+    worker died, and fails for good after `attempts` leases. Items crawled
+    by tasks are put into a sink deduplicated by (kind, key).
+
+    With a `scope`, queue names and item kinds are stored as `name@scope`,
+    while tasks and items are still pushed and read by plain names.
+
+    :Usage:
+        with Frontier(scope='sanya43') as frontier:
+            frontier.reset(['ctrip:page'], ['hotel'])
+            frontier.push([('ctrip:page', 'p1', {'page': 1})])
+            for task in frontier.lease(['ctrip:page']):
+                ...
+                frontier.complete(task, items=[('hotel', id, item)])
+
+    '''
+
+    # 类静态成员定义
+
+    # 初始化方法
+    def __init__(self, path=FRONTIER_PATH, visibility=FRONTIER_VISIBILITY,
+                 attempts=FRONTIER_ATTEMPTS, worker=None, scope=None):
+        # 文档字符串
+        '''
+        Initialize a new instance of the Frontier, opens or creates the queue
+        file of `path`.
+
+        :Args:
+         - path : a str of SQLite queue file path shared by workers.
+         - visibility : a float of lease seconds before a task is visible to
+         other workers again.
+         - attempts : an int of maximum leases of a task.
+         - worker : a str of worker name, None for `host-pid`.
+         - scope : a str of job scope of queues and items, e.g. the output
+         name of a job, None for unscoped queues shared by all jobs.
+        '''
+        # 方法实现
+        self.visibility = visibility
+        self.attempts = attempts
+        self.worker = worker or worker_name()
+        self.scope = scope
+
+        queue_dir = os.path.dirname(path)
+        if queue_dir and not os.path.exists(queue_dir):
+            os.makedirs(queue_dir)
+        # 自动提交模式，写事务显式使用BEGIN IMMEDIATE加锁
+        self.connection = sqlite3.connect(path, timeout=60,
+                                          isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks(
+                queue TEXT, key TEXT, payload TEXT, state TEXT,
+                attempts INTEGER DEFAULT 0, worker TEXT, lease_until REAL,
+                PRIMARY KEY(queue, key));
+            CREATE INDEX IF NOT EXISTS idx_state ON tasks(queue, state);
+            CREATE TABLE IF NOT EXISTS items(
+                kind TEXT, key TEXT, payload TEXT, worker TEXT,
+                PRIMARY KEY(kind, key));
+        ''')
+
+    # 作用域名称方法
+    def scoped(self, name):
+        return f'{name}@{self.scope}' if self.scope else name
+
+    # 名称作用域判断方法
+    def in_scope(self, name):
+        if self.scope:
+            return name.endswith(f'@{self.scope}')
+        return '@' not in name
+
+    # 去除作用域名称方法
+    def unscoped(self, name):
+        return name[:-len(self.scope)-1] if self.scope else name
+
+    # 写事务执行方法
+    def transaction(self, func):
+        # 文档字符串
+        '''
+        Calls `func(connection)` in an immediate write transaction.
+        '''
+        # 方法实现
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(self.connection)
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+        return result
+
+    # 任务入队方法
+    def push(self, tasks, requeue=False):
+        # 文档字符串
+        '''
+        Pushes (queue, key, payload) tasks, tasks already seen are ignored.
+
+        :Args:
+         - tasks : an iterable of (queue, key, payload) tasks.
+         - requeue : a bool of whether to queue done or failed tasks again,
+         e.g. planned recrawls.
+
+        :Returns:
+         - an int of newly queued tasks.
+        '''
+        # 方法实现
+        rows = [(self.scoped(queue), str(key),
+                 json.dumps(payload, ensure_ascii=False), PENDING)
+                for queue, key, payload in tasks]
+        if not requeue:
+            return self.transaction(lambda conn: conn.executemany(
+                'INSERT OR IGNORE INTO tasks(queue, key, payload, state) '
+                'VALUES (?, ?, ?, ?)', rows).rowcount)
+        return self.transaction(lambda conn: conn.executemany(
+            'INSERT INTO tasks(queue, key, payload, state) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT(queue, key) DO UPDATE SET '
+            'state = excluded.state, payload = excluded.payload, '
+            f'attempts = 0 WHERE state IN ({DONE!r}, {FAILED!r})',
+            rows).rowcount)
+
+    # 任务租用方法
+    def lease(self, queues, count=1):
+        # 文档字符串
+        '''
+        Leases at most `count` pending or lease expired tasks of `queues`.
+
+        :Returns:
+         - a list of :class:`Task`.
+        '''
+        # 方法实现
+        marks = ','.join('?' * len(queues))
+        queues = [self.scoped(queue) for queue in queues]
+
+        def lease_tasks(conn):
+            now = time.time()
+            # 超过最大租用次数的过期任务标记为失败
+            conn.execute(
+                f'UPDATE tasks SET state = ? WHERE queue IN ({marks}) AND '
+                f'state = ? AND lease_until < ? AND attempts >= ?',
+                (FAILED, *queues, LEASED, now, self.attempts))
+            rows = conn.execute(
+                f'SELECT queue, key, payload, attempts FROM tasks '
+                f'WHERE queue IN ({marks}) AND (state = ? OR '
+                f'(state = ? AND lease_until < ?)) LIMIT ?',
+                (*queues, PENDING, LEASED, now, count)).fetchall()
+            conn.executemany(
+                'UPDATE tasks SET state = ?, attempts = attempts + 1, '
+                'worker = ?, lease_until = ? WHERE queue = ? AND key = ?',
+                [(LEASED, self.worker, now + self.visibility, queue, key)
+                 for queue, key, _, _ in rows])
+            return [Task(self.unscoped(queue), key, json.loads(payload),
+                         attempts + 1)
+                    for queue, key, payload, attempts in rows]
+        return self.transaction(lease_tasks)
+
+    # 任务完成方法
+    def complete(self, task, tasks=(), items=()):
+        # 文档字符串
+        '''
+        Acknowledges a leased task, pushes tasks it discovered and puts its
+        (kind, key, item) items into the sink in one transaction.
+        '''
+        # 方法实现
+        def complete_task(conn):
+            conn.executemany(
+                'INSERT OR IGNORE INTO tasks(queue, key, payload, state) '
+                'VALUES (?, ?, ?, ?)',
+                [(self.scoped(queue), str(key),
+                  json.dumps(payload, ensure_ascii=False), PENDING)
+                 for queue, key, payload in tasks])
+            conn.executemany(
+                'INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)',
+                [(self.scoped(kind), str(key),
+                  json.dumps(item, ensure_ascii=False), self.worker)
+                 for kind, key, item in items])
+            conn.execute(
+                'UPDATE tasks SET state = ?, lease_until = NULL '
+                'WHERE queue = ? AND key = ? AND worker = ?',
+                (DONE, self.scoped(task.queue), task.key, self.worker))
+        self.transaction(complete_task)
+
+    # 任务失败方法
+    def release(self, task, retry=True):
+        # 文档字符串
+        '''
+        Gives a leased task back to queue at once, or marks it failed if it
+        was leased `attempts` times or `retry` is False, e.g. its error is
+        not transient.
+        '''
+        # 方法实现
+        state = FAILED if not retry or task.attempts >= self.attempts \
+            else PENDING
+        if state == FAILED:
+            logger.warning('>> task %s %s failed after %s leases.',
+                           task.queue, task.key, task.attempts)
+        self.transaction(lambda conn: conn.execute(
+            'UPDATE tasks SET state = ?, lease_until = NULL '
+            'WHERE queue = ? AND key = ? AND worker = ?',
+            (state, self.scoped(task.queue), task.key, self.worker)))
+
+    # 任务退回方法
+    def defer(self, task):
+        # 文档字符串
+        '''
+        Gives a leased task back to queue without using up one of its
+        leases, e.g. the worker stops until a daily quota is renewed.
+        '''
+        # 方法实现
+        self.transaction(lambda conn: conn.execute(
+            'UPDATE tasks SET state = ?, lease_until = NULL, '
+            'attempts = attempts - 1 '
+            'WHERE queue = ? AND key = ? AND worker = ?',
+            (PENDING, self.scoped(task.queue), task.key, self.worker)))
+
+    # 任务续租方法
+    def extend(self, task):
+        self.transaction(lambda conn: conn.execute(
+            'UPDATE tasks SET lease_until = ? '
+            'WHERE queue = ? AND key = ? AND worker = ?',
+            (time.time() + self.visibility, self.scoped(task.queue),
+             task.key, self.worker)))
+
+    # 已完成爬取清空方法
+    def reset(self, queues, kinds=()):
+        # 文档字符串
+        '''
+        Clears tasks of `queues` and items of `kinds` if no task of `queues`
+        is pending or leased, i.e. their last crawl finished, so that a new
+        crawl starts over. An unfinished crawl is kept to be resumed.
+
+        :Returns:
+         - a bool of whether the frontier was cleared.
+        '''
+        # 方法实现
+        marks = ','.join('?' * len(queues))
+        queues = [self.scoped(queue) for queue in queues]
+        kinds = [self.scoped(kind) for kind in kinds]
+
+        def reset_tasks(conn):
+            active = conn.execute(
+                f'SELECT COUNT(*) FROM tasks WHERE queue IN ({marks}) AND '
+                f'state IN (?, ?)', (*queues, PENDING, LEASED)).fetchone()[0]
+            if active:
+                return False
+            conn.execute(f'DELETE FROM tasks WHERE queue IN ({marks})',
+                         queues)
+            conn.executemany('DELETE FROM items WHERE kind = ?',
+                             [(kind,) for kind in kinds])
+            return True
+        return self.transaction(reset_tasks)
+
+    # 未完成任务统计方法
+    def active(self, queues):
+        # 文档字符串
+        '''
+        Returns the number of pending and leased tasks of `queues`, the crawl
+        of `queues` is finished once it's 0.
+        '''
+        # 方法实现
+        marks = ','.join('?' * len(queues))
+        return self.connection.execute(
+            f'SELECT COUNT(*) FROM tasks WHERE queue IN ({marks}) AND '
+            f'state IN (?, ?)',
+            (*map(self.scoped, queues), PENDING, LEASED)).fetchone()[0]
+
+    # 队列状态统计方法
+    def stats(self):
+        # 文档字符串
+        '''
+        Returns a dict of queue name to a dict of task state counts of
+        queues in scope.
+        '''
+        # 方法实现
+        stats = dict()
+        for queue, state, count in self.connection.execute(
+                'SELECT queue, state, COUNT(*) FROM tasks '
+                'GROUP BY queue, state'):
+            if self.in_scope(queue):
+                stats.setdefault(self.unscoped(queue), dict())[state] = count
+        return stats
+
+    # 爬取结果读取方法
+    def items(self, kind):
+        # 文档字符串
+        '''
+        Yields crawled items of `kind` in the sink.
+        '''
+        # 方法实现
+        for (payload,) in self.connection.execute(
+                'SELECT payload FROM items WHERE kind = ?',
+                (self.scoped(kind),)):
+            yield json.loads(payload)
+
+    # 队列关闭方法
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a KeyPool class which spreads API requests across several keys,
+e.g. ak keys of Baidu Web Service API, under each key's QPS and daily
+quota. Usage and time slots of keys are kept in a locked state file, so
+crawl processes sharing the keys share their QPS and quota too.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import metrics, logger
+from settings import BAIDU_QPS, BAIDU_DAILY_QUOTA, BAIDU_QUOTA_PATH
+
+
+# 函数定义：
+
+# 文件锁函数
+@contextmanager
+def locked(path):
+    # 文档字符串
+    '''
+    Holds an exclusive lock of file `path` across processes, released by
+    the system if the holder dies. Without `fcntl`, e.g. on Windows, only
+    threads of this process are serialized.
+    '''
+    # 方法实现
+    with open(path, 'a') as file:
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+# 类定义：
+
+# 配额耗尽异常
+class QuotaExhausted(RuntimeError):
+    pass
+
+
+# API密钥池
+class KeyPool(object):
+    # 文档字符串
+    '''
+    KeyPool class hands out API keys to concurrent fetch workers. Every key
+    is rate limited to its QPS by reserving evenly spaced time slots, and
+    is skipped once its daily quota is used up, so a batch crawl is bounded
+    by total quota of all keys rather than by sleeping.
+
+    With a `state_path`, every reservation is merged into the state file
+    under a file lock, so pools of several processes never hand out the
+    same slot or more than the quota of a key.
+
+    :Usage:
+        pool = KeyPool(['ak1', {'ak': 'ak2', 'qps': 10, 'quota': 30000}])
+        ak = pool.acquire()
+        ...
+        pool.exhaust(ak)
+
+    '''
+
+    # 初始化方法
+    def __init__(self, keys, qps=BAIDU_QPS, quota=BAIDU_DAILY_QUOTA,
+                 state_path=BAIDU_QUOTA_PATH):
+        # 文档字符串
+        '''
+        Initialize a new instance of the KeyPool.
+
+        :Args:
+         - keys : a str of key, or a list of str keys or dicts of `ak` with
+         its own `qps` and `quota`.
+         - qps : an int of default requests per second of a key.
+         - quota : an int of default requests per day of a key.
+         - state_path : a str of json file path sharing today's usage and
+         next time slots of keys, None to count usage of this pool only.
+        '''
+        # 方法实现
+        if isinstance(keys, (str, dict)):
+            keys = [keys]
+        self.keys = dict()
+        for key in keys:
+            if isinstance(key, str):
+                key = {'ak': key}
+            self.keys[key['ak']] = {'interval': 1 / key.get('qps', qps),
+                                    'quota': key.get('quota', quota),
+                                    'used': 0, 'next': 0.0}
+        if not self.keys:
+            raise RuntimeError('请至少指定一个ak！')
+        self.state_path = state_path
+        self.today = datetime.date.today().isoformat()
+        self.lock = threading.Lock()
+        if state_path:
+            state_dir = os.path.dirname(state_path)
+            if state_dir and not os.path.exists(state_dir):
+                os.makedirs(state_dir)
+        self.load()
+
+    # 共享状态方法
+    @contextmanager
+    def shared(self):
+        # 文档字符串
+        '''
+        Holds the state file lock, merges today's state of keys in the file
+        into the pool, then writes the pool back after the block. Call it
+        with `self.lock` held.
+        '''
+        # 方法实现
+        if not self.state_path:
+            yield
+            return
+        with locked(self.state_path + '.lock'):
+            state = dict()
+            if os.path.exists(self.state_path):
+                with open(self.state_path, encoding='utf-8') as file:
+                    state = json.load(file)
+            for ak, shared in state.get(self.today, {}).items():
+                if ak not in self.keys:
+                    continue
+                if not isinstance(shared, dict):
+                    shared = {'used': shared}
+                key = self.keys[ak]
+                key['used'] = max(key['used'], shared.get('used', 0))
+                key['next'] = max(key['next'], shared.get('next', 0.0))
+            yield
+            # 只保留当天记录，其他进程使用的ak原样保留
+            today = state.get(self.today, {})
+            today.update({ak: {'used': key['used'], 'next': key['next']}
+                          for ak, key in self.keys.items()})
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({self.today: today}, file)
+            os.replace(temp_path, self.state_path)
+
+    # 配额使用记录读取方法
+    def load(self):
+        with self.lock, self.shared():
+            pass
+
+    # 配额使用记录保存方法
+    def save(self):
+        with self.lock, self.shared():
+            pass
+
+    # 剩余配额统计方法
+    def remaining(self):
+        with self.lock:
+            return sum(max(key['quota'] - key['used'], 0)
+                       for key in self.keys.values())
+
+    # 密钥获取方法
+    def acquire(self):
+        # 文档字符串
+        '''
+        Reserves one request of the key with the earliest free time slot,
+        and sleeps until that slot outside the locks. Every request sent
+        with the key, retries included, needs its own reservation.
+
+        :Returns:
+         - a str of key.
+
+        :Raises:
+         - QuotaExhausted : daily quota of all keys are used up.
+        '''
+        # 方法实现
+        with self.lock, self.shared():
+            usable = [(key['next'], ak) for ak, key in self.keys.items()
+                      if key['used'] < key['quota']]
+            if not usable:
+                raise QuotaExhausted('所有ak的每日配额均已用完！')
+            _, ak = min(usable)
+            key = self.keys[ak]
+            # 时间槽跨进程共享，使用墙上时间
+            now = time.time()
+            slot = max(now, key['next'])
+            key['next'] = slot + key['interval']
+            key['used'] += 1
+        metrics.inc('quota_used_total', key=ak[:8])
+        if slot > now:
+            time.sleep(slot - now)
+        return ak
+
+    # 密钥配额耗尽方法
+    def exhaust(self, ak, reason=''):
+        # 文档字符串
+        '''
+        Takes `ak` out of today's rotation, e.g. the API reported its quota
+        was used up or the key was invalid.
+        '''
+        # 方法实现
+        with self.lock, self.shared():
+            key = self.keys[ak]
+            key['used'] = max(key['used'], key['quota'])
+        logger.warning('>> key %s disabled for today: %s', ak[:8], reason)
+
+    # 密钥限流方法
+    def backoff(self, ak, seconds=1):
+        # 文档字符串
+        '''
+        Delays next request of `ak`, e.g. the API reported its concurrency
+        limit was exceeded.
+        '''
+        # 方法实现
+        with self.lock, self.shared():
+            key = self.keys[ak]
+            key['next'] = max(key['next'], time.time() + seconds)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a KeywordIndex class allows users to extract TF-IDF keywords of QA
+questions incrementally, with persistent term and document frequencies.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import json
+import math
+import heapq
+import hashlib
+import itertools
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+# 相关第三方库导入
+import jieba
+import jieba.analyse
+
+# 本地库导入
+from metrics import logger
+from settings import KEYWORD_INDEX, KEYWORD_CHUNK, KEYWORD_WORKERS
+
+
+# 全局变量：
+# jieba自带的停用词表
+STOP_WORDS = jieba.analyse.default_tfidf.stop_words
+
+
+# 函数定义：
+
+# 问题标识函数
+def question_key(question):
+    return hashlib.md5(question.encode('utf-8')).hexdigest()[:16]
+
+
+# 问题分块函数
+def iter_chunks(questions, size=KEYWORD_CHUNK, seen=None):
+    # 文档字符串
+    '''
+    Yields lists of at most `size` questions from a question iterable,
+    questions whose keys are in `seen` are skipped and new keys are added.
+    '''
+    # 方法实现
+    chunk = list()
+    for question in questions:
+        question = question.strip()
+        if not question:
+            continue
+        if seen is not None:
+            key = question_key(question)
+            if key in seen:
+                continue
+            seen.add(key)
+        chunk.append(question)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+# 问题分词函数
+def tokenize_chunk(questions):
+    # 文档字符串
+    '''
+    Tokenizes a chunk of questions with jieba, drops stop words and single
+    character words.
+
+    :Args:
+     - questions : a list of question strs.
+
+    :Returns:
+     - a tuple of term frequency Counter, document frequency Counter and the
+     number of questions.
+    '''
+    # 方法实现
+    tf = Counter()
+    df = Counter()
+    for question in questions:
+        words = [word for word in jieba.cut(question)
+                 if len(word.strip()) > 1 and word.lower() not in STOP_WORDS]
+        tf.update(words)
+        df.update(set(words))
+    return tf, df, len(questions)
+
+
+# 类定义：
+
+# 问答关键词索引
+class KeywordIndex(object):
+    # 文档字符串
+    '''
+    KeywordIndex class keeps term frequency and document frequency counters
+    of questions per area in a json file, so new questions only update the
+    counters instead of reprocessing the whole corpus. Keys of counted
+    questions are kept too, so a question crawled again is not counted
+    twice.
+
+    :Usage:
+        index = KeywordIndex()
+        index.update(questions, area='海南')
+        index.top_k('海南', 20)
+
+    '''
+
+    # 类静态成员定义
+
+    # 初始化方法
+    def __init__(self, index_path=KEYWORD_INDEX):
+        # 文档字符串
+        '''
+        Initialize a new instance of the KeywordIndex, loads persisted
+        counters from `index_path` if exists.
+
+        :Args:
+         - index_path : a str of json file path to persist counters.
+        '''
+        # 方法实现
+        self.index_path = index_path
+        self.areas = dict()
+        self.offsets = dict()
+        self.seen = dict()
+        if os.access(self.index_path, os.F_OK):
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            for area, counters in state['areas'].items():
+                self.areas[area] = {'docs': counters['docs'],
+                                    'tf': Counter(counters['tf']),
+                                    'df': Counter(counters['df'])}
+            self.offsets = state['offsets']
+            self.seen = {area: set(keys)
+                         for area, keys in state.get('seen', {}).items()}
+
+    # 计数器更新方法
+    def update(self, questions, area='海南', workers=KEYWORD_WORKERS,
+               persist=True):
+        # 文档字符串
+        '''
+        Tokenizes questions in streamed chunks of `KEYWORD_CHUNK` across a
+        process pool, merges counters of `area` and persists them. Questions
+        already counted in `area` are skipped.
+
+        At most two chunks per worker are in flight, so memory stays bounded
+        however many questions are streamed in.
+
+        :Args:
+         - questions : an iterable of question strs.
+         - area : a str of area name the questions belong to.
+         - workers : an int of maximum tokenizing processes.
+         - persist : a bool of whether to save counters after updating.
+
+        :Returns:
+         - an int of the number of questions added.
+        '''
+        # 方法实现
+        counters = self.areas.setdefault(
+            area, {'docs': 0, 'tf': Counter(), 'df': Counter()})
+        chunks = iter_chunks(questions, seen=self.seen.setdefault(area, set()))
+        first = next(chunks, None)
+        second = next(chunks, None)
+        if second is None:
+            # 单个数据块直接在本进程分词，省去进程池开销
+            results = [tokenize_chunk(first)] if first else list()
+        else:
+            results = self.pool_tokenize(
+                itertools.chain([first, second], chunks), workers)
+        added = 0
+        for tf, df, num in results:
+            counters['tf'].update(tf)
+            counters['df'].update(df)
+            counters['docs'] += num
+            added += num
+        if persist:
+            self.save()
+        logger.info('>>> %s questions added into %s keywords.', added, area)
+        return added
+
+    # 进程池分词方法
+    @staticmethod
+    def pool_tokenize(chunks, workers):
+        # 文档字符串
+        '''
+        Tokenizes chunks in a process pool, yields results in chunk order
+        while keeping at most `2 * workers` chunks in flight.
+        '''
+        # 方法实现
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = deque()
+            for chunk in chunks:
+                futures.append(pool.submit(tokenize_chunk, chunk))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    # 问题文件增量读取方法
+    def ingest_file(self, file_path, area='海南', workers=KEYWORD_WORKERS):
+        # 文档字符串
+        '''
+        Updates counters of `area` with questions appended to a one question
+        per line file since last ingestion. A file shorter than its recorded
+        offset is treated as rewritten and read from start. The offset only
+        moves over complete lines, a last line still being written is read
+        next time.
+
+        :Args:
+         - file_path : a str of question txt file path.
+         - area : a str of area name the questions belong to.
+         - workers : an int of maximum tokenizing processes.
+
+        :Returns:
+         - an int of the number of questions added.
+        '''
+        # 方法实现
+        key = os.path.abspath(file_path)
+        offset = self.offsets.get(key, 0)
+        if os.path.getsize(file_path) < offset:
+            offset = 0
+        read = [offset]
+
+        def lines(file):
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                read[0] += len(line)
+                yield line.decode('utf-8')
+
+        with open(file_path, 'rb') as file:
+            file.seek(offset)
+            added = self.update(lines(file), area, workers, persist=False)
+        self.offsets[key] = read[0]
+        self.save()
+        return added
+
+    # 关键词查询方法
+    def top_k(self, area='海南', k=20):
+        # 文档字符串
+        '''
+        Returns top k TF-IDF keywords of `area`.
+
+        Term frequency is normalized by total terms of `area`, inverse
+        document frequency is smoothed over questions of `area`.
+
+        :Args:
+         - area : a str of area name.
+         - k : an int of keyword number.
+
+        :Returns:
+         - a list of (keyword, weight) tuples, highest weight first.
+        '''
+        # 方法实现
+        counters = self.areas.get(area)
+        if not counters:
+            return list()
+        docs = counters['docs']
+        df = counters['df']
+        total = sum(counters['tf'].values()) or 1
+        weights = ((word, count / total
+                    * (math.log((docs + 1) / (df[word] + 1)) + 1))
+                   for word, count in counters['tf'].items())
+        return heapq.nlargest(k, weights, key=lambda x: x[1])
+
+    # 计数器持久化方法
+    def save(self):
+        # 文档字符串
+        '''
+        Writes counters and file offsets into `index_path` atomically.
+        '''
+        # 方法实现
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'areas': self.areas, 'offsets': self.offsets,
+                       'seen': {area: sorted(keys)
+                                for area, keys in self.seen.items()}},
+                      file, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a Metrics class which records crawl counters and stage latency
+histograms per host and per proxy, and a structured json logger shared by
+all spiders and savers.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import sys
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# 相关第三方库导入
+
+# 本地库导入
+# 美团等爬虫目录有各自的settings，缺少的配置使用默认值
+import settings
+
+
+# 全局变量：
+LOG_LEVEL = getattr(settings, 'LOG_LEVEL', 'INFO')
+LOG_FORMAT = getattr(settings, 'LOG_FORMAT', 'json')
+# 耗时直方图的分桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+           float('inf'))
+# 日志记录的标准属性，其余属性作为结构化字段输出
+RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+# 函数定义：
+
+# 标签格式化函数
+def label_str(labels):
+    # 文档字符串
+    '''
+    Formats a sorted labels tuple as `key="value",...`, backslashes,
+    double quotes and newlines in values are escaped as the Prometheus text
+    format requires, since tags and areas are free text.
+    '''
+    # 方法实现
+    return ','.join(f'{key}="{label_value(value)}"' for key, value in labels)
+
+
+# 标签值转义函数
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+# 日志器获取函数
+def get_logger(name='smarttrip'):
+    # 文档字符串
+    '''
+    Returns a logger writing one json object (or one text line if
+    `LOG_FORMAT` is `text`) per record to stderr, fields passed by `extra`
+    are kept as structured fields.
+
+    :Args:
+     - name : a str of logger name.
+    '''
+    # 方法实现
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        if LOG_FORMAT == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+# 类定义：
+
+# 结构化日志格式器
+class JsonFormatter(logging.Formatter):
+    # 文档字符串
+    '''
+    Formats a log record as a json line with time, level, logger, message
+    and extra fields.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S',
+                                  time.localtime(record.created)),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# 耗时直方图
+class Histogram(object):
+    # 文档字符串
+    '''
+    Histogram class counts observed seconds into fixed `BUCKETS`.
+    '''
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    # 分位数估算方法
+    def quantile(self, q):
+        # 文档字符串
+        '''
+        Estimates the `q` quantile as the upper bound of the bucket it falls
+        in, capped by the max observed value.
+        '''
+        # 方法实现
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# 爬虫运行指标
+class Metrics(object):
+    # 文档字符串
+    '''
+    Metrics class records counters and latency histograms keyed by name and
+    labels, e.g. stage, host and proxy. It is thread-safe so that concurrent
+    fetch workers share one instance.
+
+    Timers nested in the same thread record self time: a fetch inside a
+    parse timer is only counted as fetch, so stage times add up to the run.
+    If `track_cpu` is set, e.g. by the profiler, timers also record thread
+    CPU seconds into `<name>_cpu` and per worker thread wall/CPU counters.
+
+    :Usage:
+        with metrics.timer('stage_seconds', stage='parse', page='resort'):
+            ...
+        metrics.inc('requests_total', host='www.mafengwo.cn', status='ok')
+        print(metrics.summary())
+
+    '''
+
+    # 初始化方法
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.track_cpu = False
+        self.reset()
+
+    # 指标清空方法
+    def reset(self):
+        with self.lock:
+            self.counters = dict()
+            self.histograms = dict()
+            self.started = time.time()
+
+    # 计数器累加方法
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # 耗时记录方法
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.histograms.setdefault(key, Histogram()).observe(seconds)
+
+    # 计时上下文方法
+    @contextmanager
+    def timer(self, name='stage_seconds', **labels):
+        # 文档字符串
+        '''
+        Context manager observing elapsed wall seconds of its block, minus
+        seconds of timers nested in it.
+        '''
+        # 方法实现
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = list()
+        stack.append([0.0, 0.0])
+        # 只在性能分析时读取线程CPU时间
+        track_cpu = self.track_cpu
+        start = time.perf_counter()
+        cpu_start = time.thread_time() if track_cpu else 0.0
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start if track_cpu else 0.0
+            child, child_cpu = stack.pop()
+            self.observe(name, elapsed - child, **labels)
+            if track_cpu:
+                self.observe(f'{name}_cpu', cpu - child_cpu, **labels)
+            if stack:
+                stack[-1][0] += elapsed
+                stack[-1][1] += cpu
+            elif track_cpu:
+                worker = threading.current_thread().name
+                self.inc('worker_wall_seconds', elapsed, worker=worker)
+                self.inc('worker_cpu_seconds', cpu, worker=worker)
+
+    # 计时装饰器方法
+    def timed(self, stage, **labels):
+        # 文档字符串
+        '''
+        Decorator observing every call's seconds into `stage_seconds` with
+        `stage` label.
+        '''
+        # 方法实现
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer('stage_seconds', stage=stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # 指标快照方法
+    def snapshot(self):
+        # 文档字符串
+        '''
+        Returns a json serializable dict of all counters and histograms.
+        '''
+        # 方法实现
+        with self.lock:
+            return {
+                'elapsed': time.time() - self.started,
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels),
+                     'count': hist.count, 'sum': hist.sum, 'max': hist.max,
+                     'buckets': dict(zip(map(str, BUCKETS), hist.counts))}
+                    for (name, labels), hist in self.histograms.items()],
+            }
+
+    # JSON导出方法
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    # Prometheus文本导出方法
+    def to_prometheus(self):
+        # 文档字符串
+        '''
+        Returns all metrics in Prometheus text exposition format.
+        '''
+        # 方法实现
+        lines = list()
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'smarttrip_{name}{{{label_str(labels)}}} '
+                             f'{value}')
+            for (name, labels), hist in sorted(self.histograms.items()):
+                prefix = label_str(labels) + (',' if labels else '')
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else bound
+                    lines.append(f'smarttrip_{name}_bucket'
+                                 f'{{{prefix}le="{le}"}} {cumulative}')
+                lines.append(f'smarttrip_{name}_sum{{{label_str(labels)}}} '
+                             f'{hist.sum}')
+                lines.append(f'smarttrip_{name}_count{{{label_str(labels)}}} '
+                             f'{hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    # 指标导出方法
+    def export(self, file_path, fmt='json'):
+        # 文档字符串
+        '''
+        Writes a metrics snapshot into `file_path` as `json` or `prometheus`
+        text.
+        '''
+        # 方法实现
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(self.to_json() if fmt == 'json'
+                       else self.to_prometheus())
+
+    # 指标汇总表方法
+    def summary(self):
+        # 文档字符串
+        '''
+        Returns a text table of counters and latency histograms, which tells
+        whether a crawl is network, proxy, parse or database bound.
+        '''
+        # 方法实现
+        rows = [('metric', 'labels', 'count', 'total s', 'mean ms', 'p50 ms',
+                 'p95 ms', 'max ms')]
+        with self.lock:
+            for (name, labels), hist in sorted(self.histograms.items()):
+                rows.append((name, label_str(labels), str(hist.count),
+                             f'{hist.sum:.2f}',
+                             f'{hist.sum / hist.count * 1000:.1f}',
+                             f'{hist.quantile(0.5) * 1000:.1f}',
+                             f'{hist.quantile(0.95) * 1000:.1f}',
+                             f'{hist.max * 1000:.1f}'))
+            for (name, labels), value in sorted(self.counters.items()):
+                value = f'{value:.2f}' if isinstance(value, float) \
+                    else str(value)
+                rows.append((name, label_str(labels), value,
+                             '', '', '', '', ''))
+            elapsed = time.time() - self.started
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = ['  '.join(cell.ljust(width) for cell, width
+                           in zip(row, widths)) for row in rows]
+        lines.insert(1, '  '.join('-' * width for width in widths))
+        lines.append(f'elapsed {elapsed:.2f} s')
+        return '\n'.join(lines)
+
+
+# 全局共享的运行指标和日志器
+metrics = Metrics()
+logger = get_logger()
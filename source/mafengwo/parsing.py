@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines html parsing functions shared by all spiders, which hand raw
+response bytes with their charset straight to lxml, so pages are not
+decoded into str and encoded again by the parser. `stream_page` parses a
+body while it streams in and stops once the element a spider needs is
+complete.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import threading
+
+# 相关第三方库导入
+from lxml import etree
+
+# 本地库导入
+
+
+# 全局变量：
+# 每个线程按字符集缓存的解析器，lxml解析器不能跨线程共享
+local = threading.local()
+
+
+# 函数定义：
+
+# HTML解析器获取函数
+def html_parser(encoding):
+    # 文档字符串
+    '''
+    Returns the HTML parser of `encoding` of current thread.
+    '''
+    # 方法实现
+    parsers = getattr(local, 'parsers', None)
+    if parsers is None:
+        parsers = local.parsers = dict()
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = etree.HTMLParser(encoding=encoding)
+    return parser
+
+
+# HTML页面解析函数
+def html_tree(page, encoding=None):
+    # 文档字符串
+    '''
+    Parses a page into an lxml root element. Responses and bytes are parsed
+    from bytes with their charset, str is only built when a field is
+    extracted from the tree.
+
+    :Args:
+     - page : a :class:`Response`, bytes, str, a :class:`PartialPage`
+     whose tree is returned, or an element which is returned as is.
+     - encoding : a str of charset of bytes, None for the charset of the
+     response or utf-8.
+
+    :Returns:
+     - an lxml root element.
+    '''
+    # 方法实现
+    if isinstance(page, etree._Element):
+        return page
+    if isinstance(page, PartialPage):
+        return page.tree
+    if isinstance(page, str):
+        return etree.HTML(page)
+    if not isinstance(page, bytes):
+        encoding = encoding or page.encoding
+        page = page.content
+    return etree.HTML(page, html_parser(encoding or 'utf-8'))
+
+
+# 流式页面解析函数
+def stream_page(chunks, target, encoding='utf-8'):
+    # 文档字符串
+    '''
+    Feeds body chunks into an lxml pull parser as they arrive, and stops
+    reading once the end tag of `target` element is parsed. Unclosed
+    elements before it are closed by the parser, so the target subtree is
+    complete in the returned tree.
+
+    :Args:
+     - chunks : an iterable of body bytes, e.g. `iter_content` of a
+     streamed response.
+     - target : a (tag, attribute, value) tuple of the element needed,
+     e.g. ('div', 'id', 'hotel_info_comment').
+     - encoding : a str of charset of the body.
+
+    :Returns:
+     - a :class:`PartialPage` of bytes read and the tree parsed from them.
+    '''
+    # 方法实现
+    tag, attr, value = target
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+    content = list()
+    found = None
+    complete = False
+    for chunk in chunks:
+        content.append(chunk)
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if found is None and elem.tag == tag and \
+                        elem.get(attr) == value:
+                    found = elem
+            elif elem is found:
+                complete = True
+                break
+        if complete:
+            break
+    # 空响应体没有可解析的内容，返回空树
+    tree = parser.close() if any(content) else etree.Element('html')
+    return PartialPage(tree, b''.join(content), encoding, complete)
+
+
+# 类定义：
+
+# 部分读取的页面
+class PartialPage(object):
+    # 文档字符串
+    '''
+    PartialPage class holds a page read up to the end of its target
+    element: the lxml `tree` parsed while streaming, and the `content` bytes
+    read with their `encoding`, which other parser backends parse again.
+    `complete` is False if the body ended before the target was closed,
+    e.g. on a ban page without the target.
+    '''
+
+    # 初始化方法
+    def __init__(self, tree, content, encoding, complete):
+        self.tree = tree
+        self.content = content
+        self.encoding = encoding
+        self.complete = complete
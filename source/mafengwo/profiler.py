@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a Profiler class which wraps a spider or saver run in cProfile and a
+stack sampler, and an entry_point function adding `--profile` run mode to
+spider and saver scripts.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import threading
+from io import StringIO
+from collections import Counter
+
+# 相关第三方库导入
+
+# 本地库导入
+# 美团等爬虫目录有各自的settings，缺少的配置使用默认值
+import settings
+from metrics import metrics, logger
+
+
+# 全局变量：
+PROFILE_INTERVAL = getattr(settings, 'PROFILE_INTERVAL', 0.005)
+save_path = getattr(settings, 'save_path', './SmartTripData')
+# Python 3.12起cProfile基于sys.monitoring，同时只能启用一个，工作线程只采样调用栈
+THREAD_PROFILES = sys.version_info < (3, 12)
+# 叶子帧位于这些模块时认为线程处于空闲等待
+IDLE_MODULES = ('threading.py', 'queue.py')
+# 性能报告中列出的函数数量
+TOP_FUNCTIONS = 30
+
+
+# 函数定义：
+
+# 调用栈折叠函数
+def fold_stack(thread_name, frame):
+    # 文档字符串
+    '''
+    Folds a frame and its callers into a `thread;caller;...;callee` line of
+    collapsed stack format, which flamegraph.pl and speedscope read.
+    '''
+    # 方法实现
+    names = list()
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} '
+                     f'({os.path.basename(code.co_filename)}:'
+                     f'{code.co_firstlineno})')
+        frame = frame.f_back
+    names.append(thread_name)
+    return ';'.join(reversed(names))
+
+
+# 命令行入口函数
+def entry_point(name, main, argv=None):
+    # 文档字符串
+    '''
+    Parses `--profile` option of a spider or saver script, then calls `main`
+    directly or under a :class:`Profiler`.
+
+    :Args:
+     - name : a str of run name, used as prefix of profile artefacts, or
+     the default run of a script with several runs.
+     - main : a callable without arguments which runs the spider or saver,
+     or a dict of run name to such callable, the run is then chosen by an
+     optional positional argument.
+     - argv : a list of command line arguments, None to read `sys.argv`.
+    '''
+    # 方法实现
+    runs = main if isinstance(main, dict) else {name: main}
+    parser = argparse.ArgumentParser(description=f'Runs {"/".join(runs)}.')
+    if len(runs) > 1:
+        parser.add_argument('run', nargs='?', default=name, choices=runs,
+                            help=f'run name, defaults to {name}')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the run and write artefacts into '
+                             f'{save_path}')
+    args = parser.parse_args(argv)
+    name = getattr(args, 'run', name)
+    if not args.profile:
+        return runs[name]()
+    with Profiler(name):
+        return runs[name]()
+
+
+# 类定义：
+
+# 调用栈采样线程
+class StackSampler(threading.Thread):
+    # 文档字符串
+    '''
+    StackSampler class samples call stacks of all other threads every
+    `interval` seconds, so time of concurrent fetch workers is attributed
+    to each worker thread.
+    '''
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super(StackSampler, self).__init__(name='profiler', daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = Counter()
+        self.busy = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name
+                     for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                name = names.get(ident, str(ident))
+                self.stacks[fold_stack(name, frame)] += 1
+                self.samples[name] += 1
+                if not frame.f_code.co_filename.endswith(IDLE_MODULES):
+                    self.busy[name] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# 线程性能统计快照
+class ProfileSnapshot(object):
+    # 文档字符串
+    '''
+    ProfileSnapshot class lets :class:`pstats.Stats` read a worker thread's
+    profile without disabling the profiler of current thread.
+    '''
+
+    def __init__(self, profile):
+        profile.snapshot_stats()
+        self.stats = profile.stats
+
+    def create_stats(self):
+        pass
+
+
+# 爬虫运行性能分析器
+class Profiler(object):
+    # 文档字符串
+    '''
+    Profiler class profiles a run with cProfile in the calling thread and
+    in every thread started during the run, samples stacks of all threads,
+    and turns on CPU time tracking of metrics timers. From Python 3.12 only
+    one cProfile may be enabled at a time, so threads started during the
+    run are only sampled. On exit it writes into `out_dir`:
+
+     - `<name>.pstats` : merged cProfile stats of all threads.
+     - `<name>.folded` : collapsed stacks for flame graphs.
+     - `<name>.profile.txt` : wall vs CPU time of the run, of every stage
+       and of every worker thread, and the top functions.
+
+    Worker processes of parsing pools are not profiled.
+
+    :Usage:
+        with Profiler('MafengwoSpider'):
+            spider.run()
+
+    '''
+
+    # 初始化方法
+    def __init__(self, name, out_dir=save_path, interval=PROFILE_INTERVAL):
+        # 文档字符串
+        '''
+        Initialize a new instance of the Profiler.
+
+        :Args:
+         - name : a str of run name, used as prefix of artefact files.
+         - out_dir : a str of directory artefacts are written into.
+         - interval : a float of stack sampling interval in seconds.
+        '''
+        # 方法实现
+        self.name = name
+        self.out_dir = out_dir
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.thread_profiles = list()
+        self.lock = threading.Lock()
+
+    # 线程性能分析启动方法
+    def thread_hook(self, *args):
+        # 文档字符串
+        '''
+        Profile hook of new threads, replaces itself by a cProfile profiler
+        of that thread.
+        '''
+        # 方法实现
+        profile = cProfile.Profile()
+        with self.lock:
+            self.thread_profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self):
+        metrics.track_cpu = True
+        self.sampler.start()
+        if THREAD_PROFILES:
+            threading.setprofile(self.thread_hook)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+        if THREAD_PROFILES:
+            threading.setprofile(None)
+        self.sampler.stop()
+        metrics.track_cpu = False
+        self.dump()
+
+    # 性能分析结果导出方法
+    def dump(self):
+        # 文档字符串
+        '''
+        Writes profile artefacts into `out_dir`.
+        '''
+        # 方法实现
+        if not os.path.exists(self.out_dir):
+            os.makedirs(self.out_dir)
+        prefix = os.path.join(self.out_dir, self.name)
+
+        stats = pstats.Stats(self.profile, stream=StringIO())
+        with self.lock:
+            for profile in self.thread_profiles:
+                stats.add(ProfileSnapshot(profile))
+        stats.dump_stats(f'{prefix}.pstats')
+
+        with open(f'{prefix}.folded', 'w', encoding='utf-8') as file:
+            for stack, count in self.sampler.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+        with open(f'{prefix}.profile.txt', 'w', encoding='utf-8') as file:
+            file.write(f'wall {self.wall:.2f} s, cpu {self.cpu:.2f} s, '
+                       f'cpu/wall {self.cpu / max(self.wall, 1e-9):.0%}\n\n')
+            file.write('thread  samples  busy  busy%\n')
+            for thread, samples in sorted(self.sampler.samples.items()):
+                busy = self.sampler.busy[thread]
+                file.write(f'{thread}  {samples}  {busy}  '
+                           f'{busy / samples:.0%}\n')
+            file.write('\n' + metrics.summary() + '\n\n')
+            stats.stream = file
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        logger.info('>>> profile of %s written into %s.', self.name,
+                    self.out_dir)
@@ -16,6 +16,7 @@ import random
 import requests
 
 # 本地库导入
+from metrics import logger
 from settings import TIMEOUT, PROXY_COUNT, PROXY_MAX
 
 # 全局变量：
@@ -73,12 +74,12 @@ class SpiderProxy(object):
                 response.raise_for_status()
                 response.encoding = 'utf-8'
                 str_proxies = response.text
-                print('>> Request IPProxyPool API Success.')
+                logger.debug('>> Request IPProxyPool API Success.')
             except requests.exceptions.Timeout:
-                print(f'>> Timeout Occured: {num} times.')
+                logger.warning('>> Timeout Occured: %s times.', num)
                 num += 1
                 if num > 10:
-                    print('>> Exceed Timeout maximum retry times.')
+                    logger.warning('>> Exceed Timeout maximum retry times.')
                     # 日志记录
                     raise RuntimeError('Exceed Timeout maximum retry times.')
             finally:
@@ -93,26 +94,26 @@ class SpiderProxy(object):
         # 文档字符串
 
         # 方法实现
-        print('>>> getting proxies from IPProxyPool.')
+        logger.info('>>> getting proxies from IPProxyPool.')
         raw_proxies = list()
         ac_num = PROXY_COUNT
         for type_num in range(2):
             raw_proxies.extend(self.request_api(self.api_url, types=type_num,
                                                 count=ac_num, country='国内'))
-            print(f'>> acquired types = {type_num} '
-                  f'proxies number: {len(raw_proxies)}')
+            logger.info('>> acquired types = %s proxies number: %s',
+                        type_num, len(raw_proxies))
             if len(raw_proxies) == PROXY_COUNT:
                 break
             ac_num = PROXY_COUNT - len(raw_proxies)
-        print('>>> acquired proxy number:', len(raw_proxies))
+        logger.info('>>> acquired proxy number: %s', len(raw_proxies))
 
         for proxy in raw_proxies:
             url = '%s:%s' % (proxy[0], proxy[1])
             self.proxies.append(url)
             self.counter[url] = PROXY_MAX
-        print(self.proxies)
-        print(self.counter)
-        print('>>> success getting proxies.')
+        logger.debug('>>> proxies: %s', self.proxies)
+        logger.debug('>>> proxy scores: %s', self.counter)
+        logger.info('>>> success getting proxies.')
 
     def delete_proxy(self, url):
         # 文档字符串
@@ -124,16 +125,16 @@ class SpiderProxy(object):
          - url : a str of url composed of ip and port.
         '''
         # 方法实现
-        print('>>> delete proxy:', url)
+        logger.warning('>>> delete proxy: %s', url)
         ip = url.split(':')[0]
-        print('>>> delete ip:', ip)
+        logger.warning('>>> delete ip: %s', ip)
         self.request_api(''.join([self.api_url, 'delete']), ip=ip)
         for i in range(len(self.proxies)-1, -1, -1):
             if self.proxies[i] == url:
                 self.proxies.pop(i)
         self.counter.pop(url)
-        print(self.proxies)
-        print('>>> success deleting proxy:', url)
+        logger.debug('>>> proxies: %s', self.proxies)
+        logger.info('>>> success deleting proxy: %s', url)
 
     def pop_proxy(self):
         # 文档字符串
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines a RecrawlPlanner class which tracks last crawl time and observed
+change rate of every crawl task, and plans recrawls of stale or volatile
+tasks into the shared frontier within a fixed request budget per run.
+
+:Usage:
+    python recrawl.py ctrip:area=sanya43 mafengwo:area=海南 --budget 2000
+'''
+
+
+# 导入模块：
+# 标准库导入
+import os
+import sys
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import argparse
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import logger
+from settings import RECRAWL_INDEX, RECRAWL_POLICIES, RECRAWL_DAILY_BUDGET, \
+                     RECRAWL_RUNS_PER_DAY, FRONTIER_PATH
+
+
+# 全局变量：
+# 每天的秒数，刷新策略的时间间隔以天为单位
+DAY = 24 * 3600
+# 未配置刷新策略的任务队列使用的默认策略
+DEFAULT_POLICY = {'interval': 7, 'min': 1, 'max': 90, 'cost': 1,
+                  'fields': None}
+# 内容变化和未变化时刷新间隔的调整倍数
+SHRINK, GROW = 0.5, 1.5
+
+
+# 函数定义：
+
+# 任务内容摘要函数
+def digest(tasks, items, fields=None):
+    # 文档字符串
+    '''
+    Digests what a crawl task observed: `fields` of its items, or whole items
+    if `fields` is None, and keys of tasks it discovered.
+    '''
+    # 方法实现
+    observed = sorted(str(key) for _, key, _ in tasks)
+    for key, item in items:
+        if fields is not None:
+            item = {field: item.get(field) for field in fields}
+        observed.append(json.dumps([str(key), item], sort_keys=True,
+                                   ensure_ascii=False, default=str))
+    observed.sort()
+    return hashlib.md5('\n'.join(observed).encode('utf-8')).hexdigest()
+
+
+# 重爬任务入队函数
+def schedule(planner, frontier, queues, budget=None, now=None):
+    # 文档字符串
+    '''
+    Queues planned recrawls of `queues` into `frontier`, planned tasks are
+    queued again even if done. A job is seeded for a full crawl instead if
+    the planner has no history of it, or the frontier has no task of it,
+    e.g. a new frontier path, since then nothing may be due and the worker
+    would wait for tasks forever.
+
+    :Args:
+     - planner : a :class:`RecrawlPlanner` of the job.
+     - frontier : a :class:`Frontier` of the job.
+     - queues : a sequence of task queue names.
+     - budget : an int of requests of this run, see `RecrawlPlanner.plan`.
+     - now : a float of planning timestamp, None for current time.
+
+    :Returns:
+     - a bool of whether the job should be seeded.
+    '''
+    # 方法实现
+    stats = frontier.stats()
+    if not planner.known(queues) or \
+            not any(queue in stats for queue in queues):
+        return True
+    frontier.push(planner.plan(queues, budget, now), requeue=True)
+    return False
+
+
+# 类定义：
+
+# 增量重爬计划器
+class RecrawlPlanner(object):
+    # 文档字符串
+    '''
+    RecrawlPlanner class keeps one entity per frontier task in a SQLite
+    file, with its last crawl time, its recrawl interval and how often its
+    content changed. Intervals adapt to observed changes within the bounds
+    of the task queue's policy: halved when content changed, grown by half
+    when not. So hotel price pages converge to daily recrawls while resort
+    pages drift towards yearly ones. Like :class:`Frontier`, a planner may
+    be scoped to one job, its queue names are then stored as `name@scope`.
+
+    :Usage:
+        with RecrawlPlanner(scope='sanya43') as planner, \\
+                Frontier(scope='sanya43') as frontier:
+            frontier.push(planner.plan(spider.QUEUES), requeue=True)
+            spider.run_worker(frontier, planner=planner)
+
+    '''
+
+    # 初始化方法
+    def __init__(self, index_path=RECRAWL_INDEX, policies=RECRAWL_POLICIES,
+                 scope=None):
+        # 文档字符串
+        '''
+        Initialize a new instance of the RecrawlPlanner.
+
+        :Args:
+         - index_path : a str of SQLite file path of crawl history.
+         - policies : a dict of task queue name to freshness policy dict
+         with `interval`, `min`, `max` days, `cost` requests per task and
+         `fields` whose changes count.
+         - scope : a str of job scope of queues, None for unscoped queues.
+        '''
+        # 方法实现
+        self.policies = policies
+        self.scope = scope
+        index_dir = os.path.dirname(index_path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        self.connection = sqlite3.connect(index_path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS entities(
+                queue TEXT, key TEXT, payload TEXT, digest TEXT,
+                last_crawl REAL, next_crawl REAL, interval REAL,
+                crawls INTEGER, changes INTEGER,
+                PRIMARY KEY(queue, key));
+            CREATE INDEX IF NOT EXISTS idx_next ON entities(queue, next_crawl);
+        ''')
+
+    # 作用域名称方法
+    def scoped(self, name):
+        return f'{name}@{self.scope}' if self.scope else name
+
+    # 去除作用域名称方法
+    def unscoped(self, name):
+        return name[:-len(self.scope)-1] if self.scope else name
+
+    # 刷新策略获取方法
+    def policy(self, queue):
+        return dict(DEFAULT_POLICY, **self.policies.get(queue, {}))
+
+    # 爬取结果记录方法
+    def observe(self, task, tasks=(), items=()):
+        # 文档字符串
+        '''
+        Records a crawled task, and adapts its recrawl interval by whether
+        its content changed since last crawl.
+
+        :Args:
+         - task : a crawled frontier :class:`Task`.
+         - tasks : a list of (queue, key, payload) tasks it discovered.
+         - items : a list of (key, item) items it crawled.
+        '''
+        # 方法实现
+        policy = self.policy(task.queue)
+        now = time.time()
+        new_digest = digest(tasks, items, policy['fields'])
+        row = self.connection.execute(
+            'SELECT digest, interval, crawls, changes FROM entities '
+            'WHERE queue = ? AND key = ?',
+            (self.scoped(task.queue), task.key)).fetchone()
+        if row is None:
+            # 首次爬取的任务按键值错开下次爬取时间，避免同时到期
+            spread = zlib.crc32(task.key.encode('utf-8')) / 0xffffffff
+            interval = policy['interval'] * DAY
+            next_crawl = now + interval * (0.5 + spread)
+            crawls, changes = 1, 0
+        else:
+            old_digest, interval, crawls, changes = row
+            changed = old_digest != new_digest
+            interval *= SHRINK if changed else GROW
+            interval = min(max(interval, policy['min'] * DAY),
+                           policy['max'] * DAY)
+            next_crawl = now + interval
+            crawls, changes = crawls + 1, changes + changed
+        self.connection.execute(
+            'INSERT OR REPLACE INTO entities '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.scoped(task.queue), task.key,
+             json.dumps(task.payload, ensure_ascii=False),
+             new_digest, now, next_crawl, interval, crawls, changes))
+        self.connection.commit()
+
+    # 重爬计划方法
+    def plan(self, queues, budget=None, now=None):
+        # 文档字符串
+        '''
+        Picks due tasks of `queues` within a request budget, most overdue
+        relative to their interval first, and volatile tasks before stable
+        ones of the same staleness.
+
+        :Args:
+         - queues : a sequence of task queue names.
+         - budget : an int of requests of this run, None for
+         `RECRAWL_DAILY_BUDGET / RECRAWL_RUNS_PER_DAY`.
+         - now : a float of planning timestamp, None for current time.
+
+        :Returns:
+         - a list of (queue, key, payload) tasks.
+        '''
+        # 方法实现
+        if budget is None:
+            budget = RECRAWL_DAILY_BUDGET // RECRAWL_RUNS_PER_DAY
+        now = now or time.time()
+        marks = ','.join('?' * len(queues))
+        rows = self.connection.execute(
+            f'SELECT queue, key, payload, last_crawl, interval, crawls, '
+            f'changes FROM entities WHERE queue IN ({marks}) AND '
+            f'next_crawl <= ?', (*map(self.scoped, queues), now)).fetchall()
+        rows.sort(key=lambda row: ((now - row[3]) / row[4],
+                                   row[6] / row[5]), reverse=True)
+        planned = list()
+        for queue, key, payload, *_ in rows:
+            queue = self.unscoped(queue)
+            cost = self.policy(queue)['cost']
+            if cost > budget:
+                continue
+            budget -= cost
+            planned.append((queue, key, json.loads(payload)))
+        logger.info('>>> %s of %s due tasks planned.', len(planned),
+                    len(rows))
+        return planned
+
+    # 历史记录判断方法
+    def known(self, queues):
+        marks = ','.join('?' * len(queues))
+        return self.connection.execute(
+            f'SELECT COUNT(*) FROM entities WHERE queue IN ({marks})',
+            [self.scoped(queue) for queue in queues]).fetchone()[0] > 0
+
+    # 计划器关闭方法
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# 命令行入口函数
+def main(argv=None):
+    # 方法实现
+    from crawl import parse_job, build_spider, job_scope, close_spider
+    from fetcher import Fetcher
+    from frontier import Frontier
+    parser = argparse.ArgumentParser(
+        description='Recrawls stale and volatile tasks of spider jobs.')
+    parser.add_argument('jobs', nargs='+', type=parse_job,
+                        help='spider[:key=value,...] as in crawl.py')
+    parser.add_argument('--budget', type=int,
+                        help='requests of this run per job, defaults to '
+                             'RECRAWL_DAILY_BUDGET / RECRAWL_RUNS_PER_DAY')
+    parser.add_argument('--frontier', default=FRONTIER_PATH,
+                        help='shared frontier queue path')
+    args = parser.parse_args(argv)
+
+    # 所有任务共用一个下载引擎，结束时关闭
+    fetcher = Fetcher()
+    try:
+        for job in args.jobs:
+            spider, _ = build_spider(job, fetcher)
+            scope = job_scope(spider)
+            try:
+                with RecrawlPlanner(scope=scope) as planner, \
+                        Frontier(args.frontier, scope=scope) as frontier:
+                    # 没有爬取记录的任务先完整爬取一次，已完成的旧爬取被清空；
+                    # 计划重爬的任务即使已完成也重新入队
+                    seed = schedule(planner, frontier, spider.QUEUES,
+                                    args.budget)
+                    spider.run_worker(frontier, seed=seed, planner=planner,
+                                      dump=True)
+            finally:
+                close_spider(spider)
+    finally:
+        fetcher.close()
+    return 0
+
+
+# 测试代码：
+if __name__ == '__main__':
+    sys.exit(main())
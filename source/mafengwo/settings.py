@@ -11,6 +11,31 @@ save_path = "./SmartTripData"
 file_name = "HainTransportPOIs"
 # file_name = "HainanRestaurants"
 
+# 日志级别和日志格式（json为结构化日志，text为普通文本日志）
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "json"
+# 运行指标导出格式（json或prometheus），None为只打印汇总表
+METRICS_FORMAT = "json"
+# 性能分析模式下调用栈的采样间隔（秒）
+PROFILE_INTERVAL = 0.005
+
+# 列式存储（parquet、feather）每个行组的数据条数
+ROW_GROUP_SIZE = 10000
+# 分片存储（save_mode="shards"）每个分片的最大数据条数，以及分片压缩方式：gzip、zstd（需安装zstandard）或none
+SHARD_ITEMS = 50000
+SHARD_COMPRESSION = "gzip"
+
+# 问答关键词索引文件、分词数据块大小和分词进程数
+KEYWORD_INDEX = "./SmartTripData/QAKeywords.json"
+KEYWORD_CHUNK = 1000
+KEYWORD_WORKERS = 4
+
+# 问答近似重复过滤的索引文件、相似度阈值、MinHash哈希函数数量和字符分片长度
+DEDUP_INDEX = "./SmartTripData/QADedup.sqlite"
+DEDUP_THRESHOLD = 0.7
+DEDUP_PERM = 128
+DEDUP_SHINGLE = 2
+
 # Neo4j数据库配置：
 NEO_CONF = {
 
@@ -42,8 +67,18 @@ SQL_CONF = {
     "user": "test",
     "passwd": "Crz437991",
     "database": "test",
-    "charset": "utf8"
+    "charset": "utf8",
+    # LOAD DATA LOCAL INFILE批量导入需要开启
+    "local_infile": True
 }
+# MySQL连接池保留的空闲连接数量
+SQL_POOL_SIZE = 4
+# MySQL批量导入时每条多行INSERT语句的数据条数
+SQL_CHUNK_SIZE = 1000
+# 切换导入时保留的历史版本数量，用于快速回滚
+KEEP_VERSIONS = 2
+# 多文件并行导入的最大进程/线程数
+INGEST_WORKERS = 4
 
 
 # HTTP请求配置变量：
@@ -78,6 +113,77 @@ USER_AGENTS = [
 
 TIMEOUT = (4, 4)
 
+# 下载引擎的最大并发请求数和请求重试次数
+FETCH_WORKERS = 8
+FETCH_RETRIES = 10
+# 是否合并同时进行的相同GET请求（方法、URL和参数相同），共享一次请求的响应
+FETCH_COALESCE = True
+# 下载传输方式：requests（HTTP/1.1，默认）或http2（httpx异步客户端，需安装httpx[http2,brotli]），
+# 以及HTTP/2传输每个主机的最大连接数
+FETCH_TRANSPORT = "requests"
+HTTP2_CONNECTIONS = 2
+# 是否流式解析只需要页面中一个区块的页面（区块读完即断开），以及流式读取的块大小（字节）
+FETCH_STREAM = True
+STREAM_CHUNK_SIZE = 16384
+# 是否把下载的响应存档为WARC文件（修复解析后可离线重新提取），存档目录，以及单个存档文件的大小上限（字节）
+ARCHIVE_RESPONSES = False
+ARCHIVE_PATH = "./SmartTripData/Archive"
+ARCHIVE_ROLL_BYTES = 1 << 30
+# 各页面类型的解析后端：lxml（默认）或selectolax（需安装selectolax），未列出的页面类型使用lxml，
+# 以及benchmark.py parser --save选出的后端文件（存在时覆盖PARSER_BACKENDS）
+PARSER_BACKENDS = {}
+PARSER_BACKENDS_PATH = "./SmartTripData/ParserBackends.json"
+# 是否把解析的页面记录为解析后端一致性检查和基准测试的样本，以及样本目录
+RECORD_PAGES = False
+PAGE_SAMPLES_PATH = "./SmartTripData/PageSamples"
+# 问答异步分页失败页面的重试次数，覆盖分页列表默认的PAGE_RETRIES
+QA_PAGE_RETRIES = 5
+# 携程酒店快速刷新时，每家酒店每隔多少次刷新才重新获取一次详情页
+CTRIP_DETAIL_ROUNDS = 7
+
+# 命令行统一入口：并行任务进程数和所有任务共享的并发请求总数
+CRAWL_PROCESSES = 4
+CRAWL_FETCH_BUDGET = 16
+# 百度地图Web服务API的ak
+BAIDU_AK = "XGdhWf1K4iAPGjSrcLA81TsWb2OuUFn0"
+# 百度批量爬取：多个ak轮流使用（可写成{'ak':..., 'qps':..., 'quota':...}单独配置），
+# 默认每个ak的每秒请求数和每日配额，以及多进程共享的当天配额使用记录文件
+BAIDU_AKS = [BAIDU_AK]
+BAIDU_QPS = 3
+BAIDU_DAILY_QUOTA = 2000
+BAIDU_QUOTA_PATH = "./SmartTripData/BaiduQuota.json"
+# 百度API并发超限时，同一页面最多退避重试的次数
+BAIDU_RATE_RETRIES = 5
+
+# 分布式爬取：共享任务队列文件、租约可见性超时（秒）、任务最大租用次数和空闲轮询间隔（秒）
+FRONTIER_PATH = "./SmartTripData/Frontier.sqlite"
+FRONTIER_VISIBILITY = 300
+FRONTIER_ATTEMPTS = 5
+FRONTIER_POLL = 2
+
+# 增量重爬：爬取历史文件、每天请求预算和每天运行次数（预算平摊到每次运行）
+RECRAWL_INDEX = "./SmartTripData/Recrawl.sqlite"
+RECRAWL_DAILY_BUDGET = 20000
+RECRAWL_RUNS_PER_DAY = 6
+# 各任务队列的刷新策略：初始、最短、最长刷新间隔（天），每个任务的请求数，
+# 以及判断内容是否变化的字段（None为全部字段）
+RECRAWL_POLICIES = {
+    # 酒店列表页的价格和预订信息每天变化，每页还会请求酒店详情页
+    'ctrip:page': {'interval': 1, 'min': 0.25, 'max': 7, 'cost': 26,
+                   'fields': ('hotel_id', 'lowest_price', 'newbooking',
+                              'reserve_count', 'sale_amount')},
+    # 景点介绍和坐标基本以年为单位变化
+    'mafengwo:resort': {'interval': 30, 'min': 7, 'max': 365, 'cost': 2,
+                        'fields': ('introduction', 'lat', 'lng', 'openInfo',
+                                   'ticketsInfo', 'transInfo', 'tel')},
+    'mafengwo:search': {'interval': 7, 'min': 1, 'max': 60, 'cost': 1,
+                        'fields': None},
+    'mafengwo_qa:page': {'interval': 1, 'min': 0.25, 'max': 30, 'cost': 1,
+                         'fields': None},
+    'baidu:page': {'interval': 30, 'min': 7, 'max': 365, 'cost': 1,
+                   'fields': ('uid', 'name', 'location', 'address')},
+}
+
 
 # 代理配置变量
 PROXY_COUNT = 20
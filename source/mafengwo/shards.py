@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines sharded dataset files of spider items: items are streamed into
+compressed json lines shards of at most `SHARD_ITEMS` items per area, and
+a `manifest.json` lists every shard with its record count, size and
+sha256 checksum, so datasets move fast and loaders read shards in
+parallel.
+
+A dataset `<save_path>/<name>/` looks like:
+    manifest.json
+    part-海口-1f3a09c2-5e1b7d04-00000.jsonl.gz
+    part-海口-1f3a09c2-5e1b7d04-00001.jsonl.gz
+    part-三亚-7c44b2e9-a90d3f61-00000.jsonl.gz
+
+Shard names carry a hash of the key, so keys that sanitize alike never
+share files, and a token of the write, so a rewrite of a key never
+touches the shards listed in the live manifest.
+
+:Usage:
+    with ShardWriter('HainanPOIs', key='海口') as writer:
+        for item in items:
+            writer.write(item)
+    for shard, items in read_shards('HainanPOIs'):
+        ...
+'''
+
+
+# 导入模块：
+# 标准库导入
+import io
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import socket
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 相关第三方库导入
+
+# 本地库导入
+from metrics import logger
+from frontier import worker_name
+from settings import SHARD_ITEMS, SHARD_COMPRESSION, INGEST_WORKERS, \
+                     save_path
+
+
+# 全局变量：
+# 压缩方式对应的分片文件后缀
+SUFFIXES = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst', 'none': '.jsonl'}
+# 分片文件名中不能出现的字符
+UNSAFE_PATTERN = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+# 函数定义：
+
+# 数据集目录函数
+def dataset_path(name, directory=None):
+    return os.path.join(directory or save_path, name)
+
+
+# 数据集判断函数
+def is_dataset(name, directory=None):
+    return os.path.exists(os.path.join(dataset_path(name, directory),
+                                       'manifest.json'))
+
+
+# 清单读取函数
+def read_manifest(name, directory=None):
+    # 文档字符串
+    '''
+    Reads the manifest of dataset `name`.
+
+    :Returns:
+     - a dict of `shards`, a list of shard dicts of `file`, `key`,
+       `records`, `bytes` and `sha256`, and `records` of all shards.
+    '''
+    # 方法实现
+    path = os.path.join(dataset_path(name, directory), 'manifest.json')
+    if not os.path.exists(path):
+        return {'shards': [], 'records': 0}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+# 分片打开函数
+def open_shard(path):
+    # 文档字符串
+    '''
+    Opens a shard file for reading decompressed lines by its suffix, zstd
+    shards need `zstandard` installed.
+    '''
+    # 方法实现
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        # 按需导入zstandard，默认的gzip压缩不依赖它
+        import zstandard
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(path, 'rb'), closefd=True))
+    return open(path, 'rb')
+
+
+# 进程存活判断函数
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 锁持有者读取函数
+def lock_owner(lock_path):
+    try:
+        with open(lock_path, encoding='utf-8') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+# 过期锁判断函数
+def stale_lock(lock_path, owner, grace=5):
+    # 文档字符串
+    '''
+    Returns whether the lock file `lock_path` written by `owner`, a str of
+    `<host>-<pid>` or '' if its holder was killed before writing it, was
+    left by a process which is no longer running on this host.
+    '''
+    # 方法实现
+    host, _, pid = owner.rpartition('-')
+    if not pid.isdigit():
+        try:
+            return time.time() - os.path.getmtime(lock_path) > grace
+        except FileNotFoundError:
+            return False
+    return host == socket.gethostname() and not process_alive(int(pid))
+
+
+# 过期锁清除函数
+def break_lock(lock_path, owner):
+    # 文档字符串
+    '''
+    Removes the stale lock file of `owner`: the lock is first moved aside,
+    so a fresh lock taken meanwhile by another process is put back rather
+    than removed.
+    '''
+    # 方法实现
+    aside = f'{lock_path}.{worker_name()}'
+    try:
+        os.replace(lock_path, aside)
+    except FileNotFoundError:
+        return
+    if lock_owner(aside) != owner:
+        try:
+            os.link(aside, lock_path)
+        except FileExistsError:
+            pass
+    else:
+        logger.warning('>>> Broke stale lock %s of %s.', lock_path, owner)
+    os.remove(aside)
+
+
+# 清单锁函数
+@contextmanager
+def manifest_lock(path, timeout=60):
+    # 文档字符串
+    '''
+    Holds the lock file of dataset directory `path`, so crawl processes
+    of different areas update one manifest in turn. The lock file holds
+    `<host>-<pid>` of its holder, a lock left by a killed process on this
+    host is broken instead of waited for.
+    '''
+    # 方法实现
+    lock_path = os.path.join(path, 'manifest.lock')
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, worker_name().encode('utf-8'))
+            break
+        except FileExistsError:
+            owner = lock_owner(lock_path)
+            if owner is not None and stale_lock(lock_path, owner):
+                break_lock(lock_path, owner)
+                continue
+            if time.time() > deadline:
+                raise RuntimeError(f'数据集清单{lock_path}被进程{owner}长时间'
+                                   f'锁定，请确认没有其他进程在写入后删除锁文件！')
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+# 文件校验和函数
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 分片读取函数
+def read_shard(path, sha256=None):
+    # 文档字符串
+    '''
+    Reads all items of a shard file, defined at module level so that it
+    can run in worker processes.
+
+    :Args:
+     - path : a str of shard file path.
+     - sha256 : a str of checksum in manifest to verify, None to skip.
+
+    :Returns:
+     - a list of dict formatted data items.
+    '''
+    # 方法实现
+    if sha256 and file_sha256(path) != sha256:
+        raise RuntimeError(f'数据分片{path}校验和不一致，请重新导出数据！')
+    with open_shard(path) as file:
+        return [json.loads(line) for line in file]
+
+
+# 数据集并行读取函数
+def read_shards(name, directory=None, workers=INGEST_WORKERS, verify=True):
+    # 文档字符串
+    '''
+    Reads shards of dataset `name` in a pool of worker processes, yields
+    (shard, items) pairs as soon as each shard is read.
+
+    :Args:
+     - name : a str of dataset name.
+     - directory : a str of directory of datasets, None for `save_path`.
+     - workers : an int of maximum reading processes.
+     - verify : a bool of whether to verify checksums of shards.
+    '''
+    # 方法实现
+    path = dataset_path(name, directory)
+    shards = read_manifest(name, directory)['shards']
+    if not shards:
+        return
+    workers = max(min(workers, len(shards)), 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(read_shard, os.path.join(path, shard['file']),
+                               shard['sha256'] if verify else None): shard
+                   for shard in shards}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+# 数据集读取函数
+def read_dataset(name, directory=None, workers=INGEST_WORKERS):
+    # 文档字符串
+    '''
+    Returns all items of dataset `name` in manifest order.
+    '''
+    # 方法实现
+    parts = {shard['file']: items for shard, items
+             in read_shards(name, directory, workers)}
+    return [item for shard in read_manifest(name, directory)['shards']
+            for item in parts[shard['file']]]
+
+
+# 数据集写入函数
+def write_dataset(items, name, key='all', directory=None, **kwargs):
+    # 文档字符串
+    '''
+    Writes `items` as the `key` shards of dataset `name`, see
+    :class:`ShardWriter`.
+
+    :Returns:
+     - a str of dataset directory path.
+    '''
+    # 方法实现
+    with ShardWriter(name, key, directory, **kwargs) as writer:
+        for item in items:
+            writer.write(item)
+    return writer.path
+
+
+# 分片存储后端写入函数
+def dump_shards(items, path, kind=None, key=None):
+    # 文档字符串
+    '''
+    Dumps items as the `shards` save backend into the `key` shards of
+    dataset directory `path`, see :mod:`backends`.
+    '''
+    # 方法实现
+    return write_dataset(items, os.path.basename(path), key or 'all',
+                         os.path.dirname(path))
+
+
+# 分片存储后端读取函数
+def load_shards(path, key=None):
+    # 文档字符串
+    '''
+    Loads items of the `key` shards of dataset directory `path`, None for
+    all shards.
+    '''
+    # 方法实现
+    name, directory = os.path.basename(path), os.path.dirname(path)
+    return [item for shard in read_manifest(name, directory)['shards']
+            if key is None or shard['key'] == str(key)
+            for item in read_shard(os.path.join(path, shard['file']))]
+
+
+# 类定义：
+
+# 校验和计算文件
+class HashingFile(object):
+    # 文档字符串
+    '''
+    HashingFile class wraps a binary file being written, and counts bytes
+    and sha256 of what is written through it, so compressed shards are
+    checksummed while streaming without reading them back.
+    '''
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+# 分片写入器
+class ShardWriter(object):
+    # 文档字符串
+    '''
+    ShardWriter class streams items of one shard key, e.g. an area, into
+    compressed json lines shards, starting a new shard every `shard_items`
+    items. Shards are written under names of their own write and listed
+    in the manifest on close: shards of the same key written before are
+    dropped from the manifest and only then removed, shards of other keys
+    are kept, so crawls of several areas fill one dataset and readers of
+    the manifest never see a half replaced key.
+
+    :Usage:
+        with ShardWriter('HainanPOIs', key='海口') as writer:
+            writer.write(item)
+
+    '''
+
+    # 初始化方法
+    def __init__(self, name, key='all', directory=None,
+                 shard_items=SHARD_ITEMS, compression=SHARD_COMPRESSION):
+        # 文档字符串
+        '''
+        Initialize a new instance of the ShardWriter.
+
+        :Args:
+         - name : a str of dataset name, i.e. its directory name.
+         - key : a str of shard key, e.g. area name of items.
+         - directory : a str of directory of datasets, None for `save_path`.
+         - shard_items : an int of maximum items per shard.
+         - compression : a str of `gzip`, `zstd` or `none`.
+        '''
+        # 方法实现
+        if compression not in SUFFIXES:
+            raise RuntimeError(f'压缩方式{compression}不存在，请输入'
+                               f'{"、".join(SUFFIXES)}！')
+        self.name = name
+        self.directory = directory
+        self.path = dataset_path(name, directory)
+        self.key = str(key)
+        self.shard_items = shard_items
+        self.suffix = SUFFIXES[compression]
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.shards = list()
+        self.raw = self.file = None
+        self.records = 0
+        # 分片名带上键的哈希和本次写入的标记，清理后同名的键和重写都不冲突
+        key_hash = hashlib.md5(self.key.encode('utf-8')).hexdigest()[:8]
+        self.prefix = f'part-{UNSAFE_PATTERN.sub("_", self.key)}-{key_hash}-' \
+                      f'{uuid.uuid4().hex[:8]}'
+
+    # 分片文件名方法
+    def shard_name(self, num):
+        return f'{self.prefix}-{num:05d}{self.suffix}'
+
+    # 分片开始方法
+    def start_shard(self):
+        name = self.shard_name(len(self.shards))
+        self.raw = open(os.path.join(self.path, name + '.tmp'), 'wb')
+        self.hashing = HashingFile(self.raw)
+        self.file = self.hashing if self.suffix == '.jsonl' \
+            else self.wrap(self.hashing)
+        self.shards.append({'file': name, 'key': self.key, 'records': 0})
+
+    # 压缩流包装方法
+    def wrap(self, file):
+        if self.suffix == '.jsonl.gz':
+            return gzip.GzipFile(fileobj=file, mode='wb')
+        import zstandard
+        return zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+
+    # 分片结束方法
+    def finish_shard(self):
+        if self.file is not self.hashing:
+            self.file.close()
+        self.raw.close()
+        shard = self.shards[-1]
+        shard.update(bytes=self.hashing.size,
+                     sha256=self.hashing.digest.hexdigest())
+        self.raw = self.file = None
+
+    # 数据写入方法
+    def write(self, item):
+        # 文档字符串
+        '''
+        Appends an item to current shard.
+        '''
+        # 方法实现
+        if self.file is None:
+            self.start_shard()
+        self.file.write(json.dumps(item, ensure_ascii=False)
+                        .encode('utf-8') + b'\n')
+        shard = self.shards[-1]
+        shard['records'] += 1
+        self.records += 1
+        if shard['records'] >= self.shard_items:
+            self.finish_shard()
+
+    # 清单更新方法
+    def commit(self):
+        # 文档字符串
+        '''
+        Moves finished shards into place and rewrites the manifest, old
+        shards of this key are removed once the manifest no longer lists
+        them.
+        '''
+        # 方法实现
+        if self.file is not None:
+            self.finish_shard()
+        with manifest_lock(self.path):
+            self.replace_shards()
+        logger.info('>>> %s: %s records of %s in %s shards.', self.name,
+                    self.records, self.key, len(self.shards))
+
+    # 分片替换方法
+    def replace_shards(self):
+        manifest = read_manifest(self.name, self.directory)
+        for shard in self.shards:
+            os.replace(os.path.join(self.path, shard['file'] + '.tmp'),
+                       os.path.join(self.path, shard['file']))
+        kept = [shard for shard in manifest['shards']
+                if shard['key'] != self.key]
+        stale = [shard['file'] for shard in manifest['shards']
+                 if shard['key'] == self.key]
+        shards = kept + self.shards
+        manifest = {
+            'name': self.name,
+            'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'records': sum(shard['records'] for shard in shards),
+            'bytes': sum(shard['bytes'] for shard in shards),
+            'shards': shards,
+        }
+        temp_path = os.path.join(self.path, 'manifest.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, os.path.join(self.path, 'manifest.json'))
+        for name in stale:
+            path = os.path.join(self.path, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    # 写入中止方法
+    def abort(self):
+        if self.file is not None:
+            self.finish_shard()
+        for shard in self.shards:
+            os.remove(os.path.join(self.path, shard['file'] + '.tmp'))
+        self.shards = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
@@ -7,19 +7,22 @@ given province.
 '''
 
 import os
-import re
 import json
 import time
 import random
 import datetime
 
-import requests
-from lxml import etree
 from proxy import SpiderProxy
-from requests.exceptions import ProxyError, HTTPError, RequestException, \
-                                Timeout, ReadTimeout, TooManyRedirects
 
-from settings import PROXY_PUNISH, USER_AGENTS, TIMEOUT, save_path, file_name
+from fetcher import Fetcher, WorkQueue
+from parsing import html_tree
+from extractors import extract
+from backends import get_backend
+from keypool import KeyPool, QuotaExhausted
+from metrics import metrics, logger
+from settings import PROXY_PUNISH, USER_AGENTS, TIMEOUT, QA_PAGE_RETRIES, \
+                     METRICS_FORMAT, FRONTIER_POLL, CTRIP_DETAIL_ROUNDS, \
+                     FETCH_RETRIES, BAIDU_RATE_RETRIES, save_path, file_name
 # 全局变量定义
 
 
@@ -35,10 +38,20 @@ class BaseSpider(object):
 
     '''
     # 类静态成员定义
-    SAVE_MODES = ('json', 'txt')
+    # 爬虫数据类型，对应列式存储的表结构
+    ITEM_KIND = None
+    # 分布式爬取的任务队列
+    QUEUES = ()
+    # 分布式任务不再重试的异常，以及使工作者停止并退回任务的异常
+    FATAL_ERRORS = ()
+    STOP_ERRORS = ()
+    # 分页列表的首页页码，以及列表页失败或被封禁时的重试次数
+    FIRST_PAGE = 1
+    PAGE_RETRIES = 3
 
     # 初始化方法
-    def __init__(self, area_name='海南'):
+    def __init__(self, area_name='海南', output=None, save_mode='json',
+                 max_pages=None, fetcher=None):
         # 文档字符串
         '''
         Initialize a new instance of the BaseSpider.
@@ -46,11 +59,22 @@ class BaseSpider(object):
         :Args:
          - area_name : a str of Chinese area name which data are located
          in.
+         - output : a str of data file name without suffix, None to use
+         `file_name` of settings.
+         - save_mode : a str of default file type of `dump_data`.
+         - max_pages : an int of maximum list pages to fetch, None for all
+         pages, or for the first 50 search pages of MafengwoSpider.
+         - fetcher : a :class:`Fetcher` to send requests, None to create one.
 
         '''
         # 方法实现
         self.area_name = area_name
+        self.output = output or file_name
+        self.save_mode = save_mode
+        self.max_pages = max_pages
         self.data = list()
+        # 共享的下载引擎
+        self.fetcher = fetcher or Fetcher()
 
         # 初始化爬虫代理
         # self.proxyer = SpiderProxy()
@@ -69,33 +93,258 @@ class BaseSpider(object):
          }
 
     # 数据存储方法
-    def dump_data(self, save_mode='json'):
+    @metrics.timed('save', target='file')
+    def dump_data(self, save_mode=None, items=None):
         # 文档字符串
         '''
         Dump spider fetched data into a file specified by `save_mode` para.
 
+        `save_mode` is a file backend of :mod:`backends`, whose packages are
+        only imported when it is selected. `shards` streams data into
+        compressed shards of the `output` dataset directory keyed by
+        `area_name`, so crawls of several areas fill one dataset, see
+        :mod:`shards`.
+
         :Args:
-         - save_mode : file type to save spider fectched data.
+         - save_mode : file type to save spider fectched data, None to use
+         `save_mode` of the spider.
+         - items : an iterable of items to dump instead of `data`, streamed
+         into the file if the backend supports `stream`.
 
+        :Returns:
+         - a str of data file path, or dataset directory path of shards.
         '''
         # 方法实现
-        if save_mode not in self.SAVE_MODES:
-            raise RuntimeError('存储模式指定有误，请输入txt、json')
+        backend = get_backend(save_mode or self.save_mode, kind='file')
         # create json file object:
         if not os.path.exists(save_path):
             os.makedirs(save_path)
-        file_path = os.path.join(save_path, file_name+'.'+save_mode)
-        with open(file_path, 'w', encoding='utf-8') as file:
-            if save_mode == 'json':
-                json.dump(self.data, file, ensure_ascii=False)
-            elif save_mode == 'txt':
-                # 只是初步用于QA问题爬取
-                # 对于txt模式存储，还需进一步思考和修改
-                for data in self.data:
-                    file.write(''.join([data, '\n']))
-            else:
-                # 此处可以拓展其他文件存储类型
-                pass
+        file_path = backend.path(self.output)
+        backend.dump(self.data if items is None else items, file_path,
+                     self.ITEM_KIND, self.area_name)
+        return file_path
+
+    # 已有数据读取方法
+    def load_data(self, save_mode=None):
+        # 文档字符串
+        '''
+        Loads data dumped by a previous run from `output` file, only data of
+        `area_name` are read from a sharded dataset.
+
+        :Args:
+         - save_mode : file type of the data file, None to use `save_mode`
+         of the spider.
+
+        :Returns:
+         - a list of data items, empty if the file does not exist.
+        '''
+        # 方法实现
+        backend = get_backend(save_mode or self.save_mode, kind='file')
+        file_path = backend.path(self.output)
+        if not os.path.exists(file_path):
+            return list()
+        return backend.load(file_path, self.area_name)
+
+    # 运行指标报告方法
+    def report(self):
+        # 文档字符串
+        '''
+        Prints the per-stage latency summary of this run, and exports the
+        metrics snapshot next to data file in `METRICS_FORMAT`.
+        '''
+        # 方法实现
+        print(metrics.summary())
+        if METRICS_FORMAT:
+            if not os.path.exists(save_path):
+                os.makedirs(save_path)
+            suffix = 'json' if METRICS_FORMAT == 'json' else 'prom'
+            metrics.export(os.path.join(save_path,
+                                        f'{self.output}.metrics.{suffix}'),
+                           METRICS_FORMAT)
+
+    # 分布式初始任务生成方法
+    def seed_tasks(self):
+        # 文档字符串
+        '''
+        Yields (queue, key, payload) tasks which start a distributed crawl.
+        '''
+        # 方法实现
+        raise RuntimeError(f'{type(self).__name__}不支持分布式爬取！')
+
+    # 分布式任务处理方法
+    def handle_task(self, task):
+        # 文档字符串
+        '''
+        Crawls one leased task in a fetch thread.
+
+        :Returns:
+         - a tuple of (new tasks, (key, item) items), or None if the task
+           failed and should be retried.
+        '''
+        # 方法实现
+        raise RuntimeError(f'{type(self).__name__}不支持分布式爬取！')
+
+    # 分布式结果过滤方法
+    def filter_items(self, items):
+        # 文档字符串
+        '''
+        Filters (key, item) items of a task in the main thread before they
+        are put into sink.
+        '''
+        # 方法实现
+        return items
+
+    # 分页列表页下载方法
+    def fetch_list(self, scope, page):
+        # 文档字符串
+        '''
+        Requests one page of a paginated list in a fetch thread.
+
+        :Args:
+         - scope : a json serializable scope of the list, e.g. an area, or
+         a tag in a map tile.
+         - page : an int of page number.
+
+        :Returns:
+         - a result of the page which `page_count` reads, or None if the
+           request failed.
+        '''
+        # 方法实现
+        raise RuntimeError(f'{type(self).__name__}不支持分页爬取！')
+
+    # 分页列表页数方法
+    def page_count(self, scope, result):
+        # 文档字符串
+        '''
+        Returns total page number of a list read from its first page result.
+        '''
+        # 方法实现
+        raise RuntimeError(f'{type(self).__name__}不支持分页爬取！')
+
+    # 分页列表剩余页码方法
+    def rest_pages(self, scope, result):
+        # 文档字符串
+        '''
+        Returns page numbers after the first page of a list, as told by its
+        first page result and capped by `max_pages`.
+        '''
+        # 方法实现
+        count = self.page_count(scope, result)
+        if self.max_pages:
+            count = min(count, self.max_pages)
+        return range(self.FIRST_PAGE + 1, self.FIRST_PAGE + count)
+
+    # 分页列表爬取方法
+    def paginate(self, scopes):
+        # 文档字符串
+        '''
+        Fetches all pages of lists of `scopes` concurrently through the
+        fetcher.
+
+        The first page of a list doubles as its page number probe: once it
+        is fetched, only the remaining pages are scheduled, so no page is
+        requested twice. A page that failed, e.g. came back blocked or
+        empty, is queued again up to `PAGE_RETRIES` times; without its first
+        page the other pages of a list are unknown.
+
+        :Args:
+         - scopes : an iterable of list scopes passed to `fetch_list`.
+
+        :Returns:
+         - an iterator of (scope, page, result) of fetched pages, result is
+           None if the page failed.
+        '''
+        # 方法实现
+        queue = WorkQueue((scope, self.FIRST_PAGE, 0) for scope in scopes)
+
+        def fetch(work):
+            scope, page, _ = work
+            return self.fetch_list(scope, page)
+
+        for (scope, page, tries), result in self.fetcher.map_unordered(
+                fetch, queue):
+            if result is None and tries < self.PAGE_RETRIES:
+                queue.append((scope, page, tries + 1))
+                continue
+            if page == self.FIRST_PAGE:
+                if result is not None:
+                    queue.extend((scope, num, 0)
+                                 for num in self.rest_pages(scope, result))
+                else:
+                    logger.warning('>> first page of %s failed, other pages '
+                                   'are unknown.', scope)
+            yield scope, page, result
+
+    # 分布式爬取方法
+    def run_worker(self, frontier, seed=False, planner=None, dump=None):
+        # 文档字符串
+        '''
+        Crawls tasks of `QUEUES` leased from a shared :class:`Frontier`
+        concurrently until no task is pending or leased. Several processes
+        or nodes may run workers on the same frontier.
+
+        :Args:
+         - frontier : a :class:`Frontier` shared by workers.
+         - seed : a bool of whether to push `seed_tasks` first, a finished
+         crawl left in the frontier is cleared first, an unfinished one is
+         resumed.
+         - planner : a :class:`RecrawlPlanner` recording crawled tasks, None
+         to skip recording.
+         - dump : a bool of whether to dump all items in sink into data file
+         at the end, None to dump in the seeding worker.
+        '''
+        # 方法实现
+        if seed:
+            if frontier.reset(self.QUEUES, [self.ITEM_KIND]):
+                logger.info('>>> finished crawl cleared from frontier.')
+            logger.info('>>> %s tasks seeded.',
+                        frontier.push(self.seed_tasks()))
+
+        def try_task(task):
+            try:
+                return self.handle_task(task)
+            except self.STOP_ERRORS + self.FATAL_ERRORS as e:
+                return e
+            except Exception as e:
+                logger.warning('>>> task %s %s failed: %s', task.queue,
+                               task.key, e)
+                return None
+
+        stopped = False
+        while not stopped:
+            tasks = frontier.lease(self.QUEUES, 2 * self.fetcher.workers)
+            if not tasks:
+                # 等待其他工作者的租约完成或过期
+                if not frontier.active(self.QUEUES) and any(
+                        queue in frontier.stats() for queue in self.QUEUES):
+                    break
+                time.sleep(FRONTIER_POLL)
+                continue
+            for task, result in self.fetcher.map_unordered(try_task, tasks):
+                if isinstance(result, self.STOP_ERRORS):
+                    logger.warning('>>> worker stopped at task %s %s: %s',
+                                   task.queue, task.key, result)
+                    frontier.defer(task)
+                    stopped = True
+                    continue
+                if isinstance(result, self.FATAL_ERRORS):
+                    logger.warning('>>> task %s %s failed: %s', task.queue,
+                                   task.key, result)
+                    frontier.release(task, retry=False)
+                    continue
+                if result is None:
+                    frontier.release(task)
+                    continue
+                new_tasks, items = result
+                frontier.complete(task, new_tasks, [
+                    (self.ITEM_KIND, key, item)
+                    for key, item in self.filter_items(items)])
+                if planner:
+                    planner.observe(task, new_tasks, items)
+        logger.info('>>> frontier: %s', frontier.stats())
+        if seed if dump is None else dump:
+            self.dump_data(items=frontier.items(self.ITEM_KIND))
+        self.report()
 
     # HTTP请求页面方法
     def request_html(self, method, url, **kwargs):
@@ -103,9 +352,10 @@ class BaseSpider(object):
         '''
         Requests website's HTML source code.
 
+        Sends request through the shared `Fetcher` with keep-alive sessions.
         If Timeout, ProxyError, HTTPError, ReadTimeout, TooManyRedirects
-        exception occured, retries HTTP Request 10 times; If retry exceeded 10
-        times or other exceptions occured, return None.
+        exception occured, retries HTTP Request `FETCH_RETRIES` times; If retry
+        exceeded or other exceptions occured, return None.
 
         :Args:
          - method : method for new HTTP Requests supported by the :class
@@ -121,44 +371,22 @@ class BaseSpider(object):
 
         '''
         # 方法实现
-        # html = None
-        error = False
-        num = 1
-        while True:
-            try:
-                response = requests.request(method, url,
-                                            # proxies=self.config_proxy(),
-                                            **kwargs)
-                # print(response.encoding)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                # html = response
-                print('2>> Request Webpage Success.')
-            except (Timeout, ProxyError, HTTPError,
-                    ReadTimeout, TooManyRedirects) as e:
-
-                print('2>> Exceptions Occured:', e)
-                print(f'2>> Retries {num} times.')
-                response = None
-                # self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                num += 1
-                if num > 10:
-                    print('2>> Exceed maximum retry times.')
-                    # 日志记录
-                    error = True
-            except RequestException as e:
-                print('2>> Exception Occured:', e)
-                # 日志记录
-                response = None
-                # self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                error = True
-            finally:
-                if response or error:   # 原来的response是html
-                    break
-                # timeout retry pause.
-                # time.sleep(1)
-                # time.sleep(random.randint(1,3))
-        return response
+        return self.fetcher.request(method, url, **kwargs)
+
+    # 流式请求页面区块方法
+    def request_until(self, method, url, target, **kwargs):
+        # 文档字符串
+        '''
+        Requests a page of which only the `target` element is needed, its
+        body is parsed while streaming and the rest is skipped, see
+        :meth:`Fetcher.request_until`.
+
+        :Returns:
+         - a :class:`PartialPage` or :class:`Response` if request suceeded,
+           or None if exceptions occured.
+        '''
+        # 方法实现
+        return self.fetcher.request_until(method, url, target, **kwargs)
 
 
 # 马蜂窝旅游景点爬虫子类：
@@ -172,7 +400,11 @@ class MafengwoSpider(BaseSpider):
 
     '''
     # 类静态成员定义
+    ITEM_KIND = 'resort'
+    QUEUES = ('mafengwo:search', 'mafengwo:resort')
     base_url = "http://www.mafengwo.cn/search/s.php?t=poi&kt=1"
+    # 搜索页只需要景点列表区块
+    LIST_TARGET = ('div', 'class', 'att-list')
     location_api = "http://pagelet.mafengwo.cn/poi/pagelet/poiLocationApi"
     # tickets_api = "http://pagelet.mafengwo.cn/poi/pagelet/poiTicketsApi"
     req_host = {"www": "www.mafengwo.cn", "pagelet": "pagelet.mafengwo.cn"}
@@ -181,7 +413,7 @@ class MafengwoSpider(BaseSpider):
      }
 
     # 初始化方法
-    def __init__(self, area_name='海南'):
+    def __init__(self, area_name='海南', **kwargs):
         # 文档字符串
         '''
         Initialize a new instance of the MafengwoSpider.
@@ -189,10 +421,11 @@ class MafengwoSpider(BaseSpider):
         :Args:
          - area_name : a str of Chinese area name which data are located
          in.
+         - **kwargs : key words arguments of :class:`BaseSpider`.
 
         '''
         # 方法实现
-        super(MafengwoSpider, self).__init__(area_name)
+        super(MafengwoSpider, self).__init__(area_name, **kwargs)
         self.links = list()
 
     # 爬虫主程序
@@ -206,33 +439,31 @@ class MafengwoSpider(BaseSpider):
         into a data list.
         '''
         # error counter variable
-        start = time.time()
         num = 1
         # 方法实现
-        self.get_links()
+        self.get_links(pEnd=self.max_pages or 50)
         for link in self.links:
-            print(f'>>>> getting resorts webpage:', link)
+            logger.debug('>>>> getting resorts webpage: %s', link)
             html = self.request_html('GET', link, timeout=TIMEOUT,
                                      headers=self.config_header('www'))
             # time.sleep(1)
             # time.sleep(random.randint(1,3))
             if html:
                 while True:
-                    test = etree.HTML(html.text).xpath(
-                            '//div[@class="row row-top" '
-                            'or @data-anchor="overview"]')
-                    if len(test) == 2:
-                        print(f'>>>> Success getting resort {link}.')
-                        self.data.append(self.parse_resort(html.text))
+                    item = self.parse_resort(html)
+                    if item is not None:
+                        logger.debug('>>>> Success getting resort %s.', link)
+                        self.data.append(item)
                         break
                     # 走到这里的时候说明代理ip被禁了，换新ip重新请求一次
                     # 相信代理ip池中一定有可靠ip，因此不会出现死循环
                     self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                    print('>>>> getting wrong resort content. Retries again!')
+                    logger.warning('>>>> getting wrong resort content. '
+                                   'Retries again!')
                     html = self.request_html('GET', link, timeout=TIMEOUT,
                                              headers=self.config_header('www'))
             else:
-                print(f'>>>> Failure getting resort {link}.')
+                logger.warning('>>>> Failure getting resort %s.', link)
                 # 防止网络不可靠情况下，爬虫一直运行下去：
                 if num == 1:
                     num += 1
@@ -245,16 +476,55 @@ class MafengwoSpider(BaseSpider):
                         lastLink = self.links.index(link)
                     else:
                         raise ValueError('NetWork Unavailable!')
-        print(len(self.links))
-        print(len(self.data))
-        end = time.time()
-        print(end-start)
+        logger.info('>>>> %s resorts of %s links fetched.', len(self.data),
+                    len(self.links))
 
-        self.dump_data('json')
+        self.dump_data()
+        self.report()
         # print(self.data)
         # print(len(self.links))
         # print(len(self.data))
 
+    # 分布式初始任务生成方法
+    def seed_tasks(self, pStart=1, pEnd=None):
+        for page in range(pStart, (pEnd or self.max_pages or 50)+1):
+            yield 'mafengwo:search', f'{self.area_name}|{page}', \
+                {'page': page}
+
+    # 分布式任务处理方法
+    def handle_task(self, task):
+        # 文档字符串
+        '''
+        Crawls a search page into resort link tasks, or a resort page into a
+        resort item.
+        '''
+        # 方法实现
+        if task.queue == 'mafengwo:search':
+            html = self.request_until('GET', self.base_url, self.LIST_TARGET,
+                                      timeout=TIMEOUT,
+                                      params={'p': task.payload['page'],
+                                              'q': self.area_name},
+                                      headers=self.config_header('www'))
+            if not html:
+                return None
+            elements = html_tree(html).xpath('//div[@class="att-list"]'
+                                             '/ul/li/div/div[2]/h3/a')
+            # 代理ip被禁时返回的页面没有景点列表，交给其他租约重试
+            if not elements:
+                return None
+            return [('mafengwo:resort', e.get('href'), {'link': e.get('href')})
+                    for e in elements if '景点' in e.text], []
+
+        link = task.payload['link']
+        html = self.request_html('GET', link, timeout=TIMEOUT,
+                                 headers=self.config_header('www'))
+        if not html:
+            return None
+        item = self.parse_resort(html)
+        if item is None:
+            return None
+        return [], [(item['poi_id'] or link, item)]
+
     # HTTP请求头配置方法
     def config_header(self, host_key):
         # 文档字符串
@@ -270,7 +540,7 @@ class MafengwoSpider(BaseSpider):
         # 方法实现
         # 可以使用python第三方库fake-useragent实现随机user-agent
         useragent = random.choice(USER_AGENTS)
-        print('> user agent:', useragent)
+        logger.debug('> user agent: %s', useragent)
         return {
             'Accept': ('text/html,application/xhtml+xml,application/xml;'
                        'q=0.9,image/webp,image/apng,*/*;q=0.8'),
@@ -299,35 +569,39 @@ class MafengwoSpider(BaseSpider):
         num = 1
         # 方法实现
         for page in range(pStart, pEnd+1):
-            print(f'>>> Getting page {page}')
+            logger.debug('>>> Getting page %s', page)
             req_param = {'p': page, 'q': self.area_name}
-            html = self.request_html('GET', self.base_url,
-                                     params=req_param, timeout=TIMEOUT,
-                                     # proxies=self.config_proxy(),
-                                     headers=self.config_header('www'))
+            html = self.request_until('GET', self.base_url, self.LIST_TARGET,
+                                      params=req_param, timeout=TIMEOUT,
+                                      # proxies=self.config_proxy(),
+                                      headers=self.config_header('www'))
             # time.sleep(random.randint(1,3))
             # time.sleep(1)
             if html:
                 while True:
-                    selector = etree.HTML(html.text)
+                    selector = html_tree(html)
                     elements = selector.xpath('//div[@class="att-list"]/ul'
                                               '/li/div/div[2]/h3/a')
-                    print('>>> links count:', len(elements))
+                    logger.debug('>>> links count: %s', len(elements))
                     if len(elements) == 15:
-                        print(f'>>> Success getting page {page}.')
+                        logger.debug('>>> Success getting page %s.', page)
                         self.links.extend([e.get('href') for e
                                            in elements if '景点' in e.text])
                         break
                     # 走到这里的时候说明代理ip被禁了，换新ip重新请求一次
                     # 相信代理ip池中一定有可靠ip，因此不会出现死循环
                     self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                    print('>>> getting wrong page content. Retrise again!')
-                    html = self.request_html('GET', self.base_url,
-                                             params=req_param, timeout=TIMEOUT,
-                                             # proxies=self.config_proxy(),
-                                             headers=self.config_header('www'))
+                    logger.warning('>>> getting wrong page content. '
+                                   'Retrise again!')
+                    html = self.request_until('GET', self.base_url,
+                                              self.LIST_TARGET,
+                                              params=req_param,
+                                              timeout=TIMEOUT,
+                                              # proxies=self.config_proxy(),
+                                              headers=self.config_header(
+                                                                   'www'))
             else:
-                print(f'>>> Failure getting page {page}.')
+                logger.warning('>>> Failure getting page %s.', page)
                 # 防止网络不可靠情况下，爬虫一直运行下去：
                 if num == 1:
                     num += 1
@@ -350,13 +624,14 @@ class MafengwoSpider(BaseSpider):
         dictionary formatted data.
 
         :Args:
-         - html : a str of html source code of given resort.
+         - html : a response, bytes or str of given resort page.
 
         :Returns:
-         - item : a dict of parsed resort's info data.
+         - item : a dict of parsed resort's info data, or None if the page
+           is not a resort page, e.g. the proxy ip was banned.
         '''
         # 方法实现
-        print('>>> start parsing resort.')
+        logger.debug('>>> start parsing resort.')
         item = {
             'resortName': None,
             'poi_id': None,
@@ -378,39 +653,17 @@ class MafengwoSpider(BaseSpider):
             'timeStamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         }
 
-        row_top, overview = etree.HTML(html).xpath(
-                                    '//div[@class="row row-top" '
-                                    'or @data-anchor="overview"]')
-
-        mod_detail = overview.xpath('//div[@class="mod mod-detail"]')
-        if len(mod_detail) == 1:
-            for dl in mod_detail[0].xpath('dl'):
-                dt, dd = dl
-                # transform keys and insert key-value pair into dict.
-                item[self.key_convert.get(dt.text)] = dd.xpath(
-                                                          'string()').strip()
-
-            intro = mod_detail[0].xpath('div[@class="summary"]')
-            if len(intro) == 1:
-                item['introduction'] = intro[0].xpath('string()').strip()
-
-            base_info = mod_detail[0].xpath('ul[@class="baseinfo clearfix"]')
-            if len(base_info) == 1:
-                for li in base_info[0].xpath('li'):
-                    # print(li.get('class'))
-                    content = li.xpath('div[@class="content"]').pop()
-                    item[li.get('class').replace('-', '_')] = content.xpath(
-                                                            'string()').strip()
-        # 后面可以改改
-        a = row_top.xpath('//div[@class="drop"]/span/a').pop()
-        item['resortName'] = row_top.xpath('//div[@class="title"]'
-                                           '/h1/text()').pop()
-        item['areaName'] = a.text
-        item['areaId'] = int(re.search('(\d+)\.html', a.get('href'))[1])
-
-        mod_location = overview.xpath('div[@class="mod mod-location"]').pop()
-        poi = mod_location.xpath(('//div[contains(@data-api,"poiLocationApi")'
-                                  ']/@data-params')).pop()
+        page = extract('resort', html)
+        if page is None:
+            return None
+        for key, value in page['details'].items():
+            # transform keys and insert key-value pair into dict.
+            item[self.key_convert.get(key)] = value
+        item.update(page['baseinfo'])
+        for key in ('introduction', 'resortName', 'areaName', 'areaId',
+                    'address'):
+            item[key] = page[key]
+        poi = page['poi']
         while True:
             try:
                 response = self.request_html('GET', self.location_api,
@@ -421,15 +674,15 @@ class MafengwoSpider(BaseSpider):
                                                                    'pagelet'))
                 apiData = response.json()['data']
             except:
-                print('>> acquired location fail! Retries Again.')
+                logger.warning('>> acquired location fail! Retries Again.')
+                metrics.inc('retries_total', stage='location')
             else:
                 break
-        item['address'] = mod_location.xpath('//p[@class="sub"]/text()').pop()
         item['poi_id'] = int(json.loads(poi)['poi_id'])
         item['lat'] = apiData['controller_data']['poi']['lat']
         item['lng'] = apiData['controller_data']['poi']['lng']
 
-        print('>>> end parsing resort.')
+        logger.debug('>>> end parsing resort.')
         return item
 
 
@@ -443,10 +696,14 @@ class CtripSpider(BaseSpider):
 
     '''
     # 类静态成员定义
+    ITEM_KIND = 'hotel'
+    QUEUES = ('ctrip:page',)
     base_url = "https://hotels.ctrip.com/hotel/{}"
+    # 酒店详情页只需要酒店信息区块
+    DETAIL_TARGET = ('div', 'id', 'hotel_info_comment')
 
     # 初始化方法
-    def __init__(self, area_name="sanya43"):
+    def __init__(self, area_name="sanya43", **kwargs):
         # 文档字符串
         '''
         Initialize a new instance of the CtripSpider.
@@ -454,67 +711,166 @@ class CtripSpider(BaseSpider):
         :Args:
          - area_name : a str of Chinese area name which data are located
          in.
+         - **kwargs : key words arguments of :class:`BaseSpider`.
 
         '''
         # 方法实现
         # 设想：先翻译成英文-sanya，然后请求城市id-43
-        super(CtripSpider, self).__init__(area_name)
+        super(CtripSpider, self).__init__(area_name, **kwargs)
         self.page_url = self.base_url.format(self.area_name)
         # print('1> page_url =', self.page_url)
 
     # 爬虫主程序
-    def run(self):
+    def run(self, refresh=False):
         # 文档字符串
+        '''
+        Main spider method of CtripSpider.
 
+        :Args:
+         - refresh : a bool of whether to run the list-only price `refresh`
+         instead of a full crawl.
+        '''
         # 方法实现
-        # 准备请求参数
-        num = 1
-        start = time.time()
-        for page in range(1, self.get_page_num()):
-            # print(f'4>>>> parsing hotels list page {page}')
-            elements = None
-            html = self.request_html('GET',
-                                     '/'.join([self.page_url, f'p{page}']),
-                                     headers=self.config_header(),
-                                     timeout=TIMEOUT)
-            if html:
-                while True:
-                    selector = etree.HTML(html.text)
-                    elements = selector.xpath("//div[contains(@class"
-                                              ",'hotel_new_list')]")
-                    if len(elements):
-                        # print(f'4>>>> Success parsing hotel list page{page}')
-                        break
-                    # 走到这里的时候说明代理ip被禁了，换新ip重新请求一次
-                    # 相信代理ip池中一定有可靠ip，因此不会出现死循环
-                    # self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                    print('4>>>> getting wrong page content. Retrise again!')
-                    html = self.request_html('GET',
-                                             '/'.join(self.page_url,
-                                                      f'p{page}'),
-                                             timeout=TIMEOUT,
-                                             headers=self.config_header())
-                for elem in elements:
-                    self.data.append(self.parse_hotel(elem))
-            else:
-                print(f'4>>>> Failure getting page {page}.')
-                # 防止网络不可靠情况下，爬虫一直运行下去：
-                if num == 1:
-                    num += 1
-                    lastPage = page
-                else:
-                    if page != lastPage + 1:
-                        num = 1
-                    elif num <= 10:
-                        num += 1
-                        lastPage = page
-                    else:
-                        raise ValueError('NetWork Unavailable!')
+        if refresh:
+            return self.refresh()
+        # 首页同时用于获取页数，只补充请求其余列表页
+        for _, page, result in self.paginate([self.area_name]):
+            if result is None:
+                logger.warning('4>>>> Failure getting page %s.', page)
+                continue
+            for hotel in result['hotels']:
+                self.data.append(self.parse_hotel(hotel))
+
+        logger.info('4>>>> %s hotels fetched.', len(self.data))
+        self.dump_data()
+        self.report()
+
+    # 酒店价格快速刷新方法
+    def refresh(self, detail_rounds=CTRIP_DETAIL_ROUNDS):
+        # 文档字符串
+        '''
+        Refreshes prices, scores, judge counts and bookings of all hotels
+        from list pages alone, and merges them into the existing `output`
+        dataset by `hotel_id`.
+
+        Detail pages are only fetched for new hotels, and for the hotels
+        whose turn it is today, so every hotel's details are refreshed once
+        per `detail_rounds` daily refreshes. A city refresh costs about N/25
+        requests plus N/`detail_rounds` detail requests instead of N+N/25.
+
+        Hotels no longer listed are dropped, unless some list pages failed
+        and they may be listed on those pages. The `save_mode` must load
+        items back with their types, i.e. support `records`.
+
+        :Args:
+         - detail_rounds : an int of refreshes per detail refresh of a hotel.
+        '''
+        # 方法实现
+        if not get_backend(self.save_mode, kind='file').supports('records'):
+            raise RuntimeError(f'{self.save_mode}格式不能原样读回酒店数据，'
+                               f'无法刷新，请使用json、jsonl、csv、parquet等格式')
+        hotels = {int(item['hotel_id']): dict(item,
+                                              hotel_id=int(item['hotel_id']))
+                  for item in self.load_data()}
+        turn = datetime.date.today().toordinal() % detail_rounds
+
+        # 并发下载列表页，只解析列表页字段
+        details = list()
+        listed = set()
+        failed = 0
+        for _, page, result in self.paginate([self.area_name]):
+            if result is None:
+                failed += 1
+                logger.warning('4>>>> Failure getting page %s.', page)
+                continue
+            for hotel in result['hotels']:
+                item = self.parse_hotel(hotel, detail=False)
+                hotel_id = item['hotel_id']
+                listed.add(hotel_id)
+                if hotel_id not in hotels or hotel_id % detail_rounds == turn:
+                    details.append(item)
+                hotels[hotel_id] = dict(hotels.get(hotel_id, {}), **item)
+        delisted = set(hotels) - listed
+        if failed:
+            logger.warning('4>>>> %s pages failed, keeping %s unlisted '
+                           'hotels.', failed, len(delisted))
+        else:
+            for hotel_id in delisted:
+                del hotels[hotel_id]
+        logger.info('4>>>> %s hotels refreshed, %s delisted, fetching %s '
+                    'details.', len(hotels), 0 if failed else len(delisted),
+                    len(details))
+
+        # 新酒店和轮到的酒店补充详情字段
+        for item, detail in self.fetcher.map_unordered(
+                self.fetch_hotel_detail, details):
+            hotels[item['hotel_id']].update(detail)
+        self.data = list(hotels.values())
+        self.dump_data()
+        self.report()
+
+    # 酒店列表页下载方法
+    def fetch_list_page(self, page):
+        # 文档字符串
+        '''
+        Requests a hotel list page.
 
-        print(len(self.data))
-        end = time.time()
-        print(end-start)
-        self.dump_data('json')
+        :Returns:
+         - a dict of `hotels`, a list of hotels' list page fields, and
+           `pages`, an int of total list pages, or None if request failed or
+           the page has no hotel.
+        '''
+        # 方法实现
+        html = self.request_html('GET', '/'.join([self.page_url, f'p{page}']),
+                                 headers=self.config_header(),
+                                 timeout=TIMEOUT)
+        if not html:
+            return None
+        result = extract('hotel_list', html)
+        return result if result['hotels'] else None
+
+    # 分页列表页下载方法
+    def fetch_list(self, scope, page):
+        return self.fetch_list_page(page)
+
+    # 酒店列表页数方法
+    def page_count(self, scope, result):
+        # 文档字符串
+        '''
+        Returns Ctrip's total hotel page number read from the pager of a list
+        page, 1 if the list has no pager.
+        '''
+        # 方法实现
+        return result['pages']
+
+    # 酒店详情页下载方法
+    def fetch_hotel_detail(self, item):
+        hotel_url = self.base_url.format(f"{str(item['hotel_id'])}.html")
+        return self.parse_hotel_detail(hotel_url)
+
+    # 分布式初始任务生成方法
+    def seed_tasks(self):
+        yield 'ctrip:page', f'{self.area_name}|{self.FIRST_PAGE}', \
+            {'page': self.FIRST_PAGE}
+
+    # 分布式任务处理方法
+    def handle_task(self, task):
+        # 文档字符串
+        '''
+        Crawls a hotel list page into hotel items keyed by `hotel_id`, the
+        first page also pushes tasks of the other pages.
+        '''
+        # 方法实现
+        page = task.payload['page']
+        result = self.fetch_list_page(page)
+        if result is None:
+            return None
+        tasks = list()
+        if page == self.FIRST_PAGE:
+            tasks = [('ctrip:page', f'{self.area_name}|{num}', {'page': num})
+                     for num in self.rest_pages(self.area_name, result)]
+        items = [self.parse_hotel(hotel) for hotel in result['hotels']]
+        return tasks, [(item['hotel_id'], item) for item in items]
 
     # HTTP请求头配置方法
     def config_header(self):
@@ -558,124 +914,28 @@ class CtripSpider(BaseSpider):
         delta_day = datetime.timedelta(days=n)
         return str(today+delta_day)
 
-    # 获取酒店页面数方法
-    def get_page_num(self):
-        # 文档字符串
-        '''
-        Get Ctrip's total hotel page number of given area_name.
-
-        :Returns:
-         - page_num : an int of Ctrip's total hotel page number.
-        '''
-        # 方法实现
-        # print('2>> Getting page num.')
-        html = None
-        page_str = None
-        while not (html and page_str):
-            html = self.request_html('GET', self.page_url, timeout=TIMEOUT,
-                                     headers=self.config_header())
-            if html:
-                selector = etree.HTML(html.text)
-                page_str = selector.xpath("string(//div[@class='page_box']"
-                                          "//a[@rel='nofollow'])")
-        # print('2>> Success getting page num.')
-        return int(page_str)
-
     # 获取酒店数据方法
-    def parse_hotel(self, elem):
+    def parse_hotel(self, hotel, detail=True):
         # 文档字符串
         '''
 
         Parses hotel's infos from ctrip's websites.
 
-        Parses hotel's brief infos in ctrips' hotels list page, then jump into
-        hotel's detail page and parse its detail infos.
+        Takes hotel's brief infos extracted from ctrips' hotels list page, then
+        jump into hotel's detail page and parse its detail infos.
 
         :Args:
-         -elem : a lxml element class of a hotel in Ctrip's website.
+         - hotel : a dict of a hotel's list page fields extracted from Ctrip's
+         hotel list page.
+         - detail : a bool of whether to fetch hotel's detail page, list
+         page fields only if False.
         :Returns:
          - item :
         '''
         # 方法实现
-        # print('3>>> start parsing hotel.')
-        item = {
-            'hotel_id': int(elem.xpath("@id").pop()),
-            'hotel_name': elem.xpath(".//h2[@class='hotel_name'"
-                                     "]/a/@title").pop(),
-            'address': elem.xpath((".//p[@class='hotel_item_htladdress"
-                                   "']/text()")).pop().strip('】 '),
-            'business_zone': elem.xpath((".//p[@class='hotel_item_htladdress"
-                                         "']/a[1]/text()")).pop(),
-            'lowest_price': int(elem.xpath(("string(.//div[contains(@class,"
-                                            "'hotel_price')]/a)"))),
-            'hotel_label': list(),
-            'newbooking': None,
-            'hotel_level': None,
-            'hotel_score': 0,
-            'hotel_proposition': 0,
-            'judge_count': 0,
-            'recommend': None,
-            'ctrip_qualified': False,
-            'ctrip_star': 0,
-            'country_star': 0,
-            'ctrip_corporate': None,
-            'sale_amount': 0,
-            'reserve_count': 0
-        }
-        ico, label, judge = elem.xpath(".//span[@class='hotel_ico']"
-                                       "|.//span[@class='special_label']"
-                                       "|.//div[@class='hotelitem_judge_box']")
-        # print(etree.tostring(ico, encoding='utf-8').decode('utf-8'))
-        # 更新携程质量担保字段
-        if len(ico.xpath('./span[@class="ico_quality_gold"]')) == 1:
-            # print('a')
-            item['ctrip_qualified'] = True
-        # 更新携程合作等级字段
-        corporate = ico.xpath('./span[@data-role="title"]')
-        if len(corporate) == 1:
-            item['ctrip_corporate'] = corporate.pop().get("class")
-        # 更新携程酒店星级字段
-        ctrip_star = ico.xpath("./span[contains(@class,'hotel_diamond')]"
-                               "/@class")
-        if len(ctrip_star) == 1:
-            item['ctrip_star'] = int(ctrip_star[0].strip('hotel_diamond'))
-        # 更新国家酒店星级字段
-        country_star = ico.xpath("./span[contains(@class,'hotel_stars')]"
-                                 "/@class")
-        if len(country_star) == 1:
-            item['country_star'] = int(country_star[0].strip('hotel_stars'))
-        # 更新酒店标签字段
-        item['hotel_label'].extend(label.xpath('.//text()'))
-        # 更新酒店评价等级字段
-        hotel_level = judge.xpath('string(.//span[@class="hotel_level"])')
-        if len(hotel_level) > 0:
-            item['hotel_level'] = hotel_level
-        # 更新酒店评分字段
-        hotel_score = judge.xpath('string(.//span[@class="hotel_value"])')
-        if len(hotel_score) > 0:
-            item['hotel_score'] = float(hotel_score)
-        # 更新酒店推荐率字段
-        hotel_propo = judge.xpath('string(.//span[@class='
-                                  '"total_judgement_score"]/span)')
-        if len(hotel_propo) > 0:
-            item['hotel_proposition'] = int(hotel_propo.strip('%')) / 100
-        # 更新酒店评价人数字段
-        judge_count = judge.xpath('string(.//span[@class='
-                                  '"hotel_judgement"]/span)')
-        if len(judge_count) > 0:
-            item['judge_count'] = int(judge_count)
-            item['sale_amount'] = item['lowest_price'] * item['judge_count']
-            item['reserve_count'] = (item['hotel_proposition']
-                                     * item['judge_count'])
-        # 更新酒店总评字段
-        recommend = judge.xpath('string(.//span[@class="recommend"])')
-        if len(recommend) > 0:
-            item['recommend'] = recommend
-        # 更新最新预订字段
-        newbook = elem.xpath('string(.//p[@class="hotel_item_last_book"])')
-        if len(newbook) > 0:
-            item['newbooking'] = newbook
-
+        item = dict(hotel)
+        if not detail:
+            return item
         # 准备酒店url
         hotel_url = self.base_url.format(f"{str(item['hotel_id'])}.html")
         # print(hotel_url)
@@ -707,65 +967,25 @@ class CtripSpider(BaseSpider):
         }
         params = dict(isFull='F', checkin=self.get_recent_date(1),
                       checkout=self.get_recent_date(2))
-        # print('2> params:', params)
-        # print('3>>> getting hotel detail:', url)
-        hotel_info = None
-        html = self.request_html('GET', url, timeout=TIMEOUT, params=params,
-                                 headers=self.config_header())
+        html = self.request_until('GET', url, self.DETAIL_TARGET,
+                                  timeout=TIMEOUT, params=params,
+                                  headers=self.config_header())
         if html:
             while True:
-                hotel_info = etree.HTML(html.text).xpath('//div[@id="hotel_'
-                                                         'info_comment"]')
-                if len(hotel_info) == 1:
-                    # print('3>>> success getting detail:', url)
+                detail = extract('hotel_detail', html)
+                if detail is not None:
+                    item.update(detail)
                     break
                 # 走到这里的时候说明代理ip被禁了，换新ip重新请求一次
                 # 相信代理ip池中一定有可靠ip，因此不会出现死循环
                 # self.proxyer.counter[self.proxy_url] -= PROXY_PUNISH
-                print('3>>> getting wrong hotel detail. Retries again!')
-                html = self.request_html('GET', url,
-                                         timeout=TIMEOUT, params=params,
-                                         headers=self.config_header())
-
-            # 解析详情
-            hotel_intro = hotel_info[0].xpath('.//div[@id="htlDes"]')
-            if len(hotel_intro) == 1:
-                phone = hotel_intro[0].xpath('string(.//span[@data-real]'
-                                             '/@data-real)')
-                if len(phone) > 0:
-                    pattern = '(\(\d{3,4}\)|\d{3,4}-|\s)?\d{8}'
-                    item.update(contact=re.search(pattern,
-                                                  phone.strip()).group(0))
-                intro = hotel_intro[0].xpath('string(.//span[@itemprop='
-                                             '"description"])')
-                if len(intro) > 0:
-                    item.update(introduction=intro.strip())
-            hotel_facility = hotel_info[0].xpath(".//div[@id="
-                                                 "'J_htl_facilities']")
-            if len(hotel_facility) == 1:
-                for tr in hotel_facility[0].xpath('.//tr[@data-init]'):
-                    key = tr.xpath('string(./th)')
-                    value = tr.xpath('.//li[@title]/@title')
-                    item['hotel_facilities'].setdefault(key, value)
-            hotel_policy = hotel_info[0].xpath('.//h2[text()="酒店政策"]')
-            if len(hotel_policy) == 1:
-                for tr in hotel_policy[0].getnext().xpath('.//tr'):
-                    key = tr.xpath('string(./th)')
-                    if key == "儿童政策" or "可用支付方式":
-                        continue
-                    value = tr.xpath('string(./td)')
-                    item['hotel_policy'].setdefault(key, value)
-            surround = hotel_info[0].xpath('.//h2[text()="周边设施"]')
-            if len(surround) == 1:
-                for tr in surround[0].getnext().xpath('.//tr'):
-                    key = tr.xpath('string(./th)')
-                    value = tr.xpath('.//li/text()')
-                    item['surround_facilities'].setdefault(key, value)
-
+                logger.warning('3>>> getting wrong hotel detail. Retries again!')
+                html = self.request_until('GET', url, self.DETAIL_TARGET,
+                                          timeout=TIMEOUT, params=params,
+                                          headers=self.config_header())
         else:
-            print(f'3>>> Failure getting hotel {url}.')
+            logger.warning('3>>> Failure getting hotel %s.', url)
 
-        # print(item)
         return item
 
 
@@ -780,16 +1000,20 @@ class MafengwoQASpider(BaseSpider):
 
     '''
     # 类静态成员定义
+    ITEM_KIND = 'question'
     accept_dict = {
         'normal': ('text/html,application/xhtml+xml,application'
                    '/xml;q=0.9,image/webp,image/apng,*/*;q=0.8'),
         'ajax': 'application/json, text/javascript, */*; q=0.01'
     }
     base_url = 'http://www.mafengwo.cn/wenda'
+    QUEUES = ('mafengwo_qa:page',)
+    FIRST_PAGE = 0
+    PAGE_RETRIES = QA_PAGE_RETRIES
     ajax_url = 'http://www.mafengwo.cn/qa/ajax_qa/more'
 
     # 初始化方法
-    def __init__(self, area_name='area-12938'):
+    def __init__(self, area_name='area-12938', deduper=None, **kwargs):
         # 文档字符串
         '''
         Initialize a new instance of the MafengwoQASpider.
@@ -797,37 +1021,143 @@ class MafengwoQASpider(BaseSpider):
         :Args:
          - area_name : a str of Chinese area name which data are located
          in.
+         - deduper : a :class:`QuestionDeduper` to drop near-duplicate
+         questions, None to keep all questions.
+         - **kwargs : key words arguments of :class:`BaseSpider`.
 
         '''
         # 方法实现
-        super(MafengwoQASpider, self).__init__(area_name)
+        super(MafengwoQASpider, self).__init__(area_name, **kwargs)
+        self.deduper = deduper
+        self.count = 0
         self.area_id = int(self.area_name.strip('area-'))
-        print(self.area_id)
+        logger.debug('1> area id: %s', self.area_id)
 
     # 爬虫主程序
-    def run(self, ):
+    def run(self, keywords=False):
         # 文档字符串
+        '''
+        Main spider method of MafengwoQASpider.
 
+        Fetches ajax question pages concurrently through the shared fetcher,
+        streams parsed questions into `output`.txt. Failed pages are retried
+        by `paginate` up to `PAGE_RETRIES` times, so the other pages are
+        still queued when the first page only succeeds on a retry.
+
+        :Args:
+         - keywords : a bool of whether to add fetched questions into the
+         persistent QA keyword index of `area_name`.
+        '''
+        # 方法实现
+        index = None
+        if keywords:
+            # 关键词索引按需导入jieba
+            from keywords import KeywordIndex
+            index = KeywordIndex()
+        if not os.path.exists(save_path):
+            os.makedirs(save_path)
+        file_path = os.path.join(save_path, self.output+'.txt')
+        with open(file_path, 'w', encoding='utf-8') as file:
+            url = '/'.join([self.base_url, f'{self.area_name}.html'])
+            response = self.request_html('GET', url, timeout=TIMEOUT,
+                                         headers=self.config_header('normal'))
+            if response:
+                self.save_questions(file, self.parse_question(response),
+                                    index)
+            # 首页同时用于获取页数，失败页面由paginate重新排队
+            failed = list()
+            for _, page, data in self.paginate([self.area_id]):
+                logger.debug('>> parsing %s questions.', page)
+                if data is None:
+                    failed.append(page)
+                elif data.get('html'):
+                    self.save_questions(
+                        file, self.parse_question(data['html']), index)
+            if failed:
+                logger.warning('>> pages still failed: %s', sorted(failed))
+        if index:
+            index.save()
+        logger.info('>> %s questions saved.', self.count)
+        self.report()
+
+    # 分布式初始任务生成方法
+    def seed_tasks(self):
+        yield 'mafengwo_qa:page', f'{self.area_id}|{self.FIRST_PAGE}', \
+            {'page': self.FIRST_PAGE}
+
+    # 分布式任务处理方法
+    def handle_task(self, task):
+        # 文档字符串
+        '''
+        Crawls an ajax question page into question items keyed by question,
+        the first page also pushes tasks of the other pages.
+        '''
         # 方法实现
-        # 没加入差错控制机制，待更新
-        url = '/'.join([self.base_url, f'{self.area_name}.html'])
-        params = {'type': 3, 'mddid': self.area_id, 'sort': 8,
+        page = task.payload['page']
+        data = self.fetch_page(page)
+        if data is None:
+            return None
+        tasks = list()
+        if page == self.FIRST_PAGE:
+            tasks = [('mafengwo_qa:page', f'{self.area_id}|{num}',
+                      {'page': num})
+                     for num in self.rest_pages(self.area_id, data)]
+        questions = self.extract_questions(data['html']) \
+            if data.get('html') else []
+        return tasks, [(question, question) for question in questions]
+
+    # 分布式结果过滤方法
+    def filter_items(self, items):
+        # 去重索引只能在创建它的主线程中使用
+        if not self.deduper:
+            return items
+        unique = set(self.deduper.filter(key for key, _ in items))
+        return [(key, item) for key, item in items if key in unique]
+
+    # 问答异步页面下载方法
+    def fetch_page(self, page):
+        # 文档字符串
+        '''
+        Requests one ajax question page and decodes its json once.
+
+        :Args:
+         - page : an int of ajax page number.
+
+        :Returns:
+         - a dict of `data` field of the ajax response, or None if request
+           failed or response is not valid json data.
+        '''
+        # 方法实现
+        params = {'type': 3, 'mddid': self.area_id, 'sort': 8, 'page': page,
                   'tid': '', 'time': '', 'key': ''}
-        response = self.request_html('GET', url, timeout=TIMEOUT,
-                                     headers=self.config_header('normal'))
-        self.data.extend(self.parse_question(response.text))
-        for page in range(self.get_page_num()):
-            print(f'>> parsing {page} questions.')
-            params.update(page=page)
-            response = self.request_html('GET', self.ajax_url,
-                                         timeout=TIMEOUT, params=params,
-                                         headers=self.config_header('ajax'))
-            if response.json().get('data'):
-                html = response.json()['data'].get('html')
-                if html:
-                    self.data.extend(self.parse_question(html))
-        print(len(self.data))
-        self.dump_data(save_mode='txt')
+        response = self.request_html('GET', self.ajax_url, timeout=TIMEOUT,
+                                     params=params,
+                                     headers=self.config_header('ajax'))
+        if not response:
+            return None
+        try:
+            data = response.json().get('data')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    # 问答数据存储方法
+    def save_questions(self, file, questions, index=None):
+        # 文档字符串
+        '''
+        Appends parsed questions to data file, and adds them into keyword
+        index if given, the index only counts questions it has not counted
+        before, so questions crawled again on a rerun are not counted twice.
+        '''
+        # 方法实现
+        for question in questions:
+            file.write(''.join([question, '\n']))
+        file.flush()
+        self.count += len(questions)
+        metrics.inc('items_total', stage='save', page='question',
+                    value=len(questions))
+        if index:
+            index.update(questions, area=self.area_name, persist=False)
 
     # HTTP请求头配置方法
     def config_header(self, req_type):
@@ -843,7 +1173,7 @@ class MafengwoQASpider(BaseSpider):
         # 方法实现
         # 可以使用python第三方库fake-useragent实现随机user-agent
         useragent = random.choice(USER_AGENTS)
-        print('1> user agent:', useragent)
+        logger.debug('1> user agent: %s', useragent)
         header = {
             'Accept': self.accept_dict[req_type],
             'Accept-Encoding': 'gzip, deflate',
@@ -857,52 +1187,53 @@ class MafengwoQASpider(BaseSpider):
 
         return header
 
-    # 获取问答异步加载页面数方法
-    def get_page_num(self):
-        # 文档字符串
-        '''
-        Get mafengwo's total question page number of given area_name.
+    # 分页列表页下载方法
+    def fetch_list(self, scope, page):
+        return self.fetch_page(page)
 
-        :Returns:
-         - page_num : an int of mafengwo's total question page number.
-
-        '''
-        # 方法实现
-        # 参数准备
-        print('2>> Getting page num.')
-        params = {'type': 3, 'mddid': self.area_id, 'sort': 8, 'page': 1,
-                  'tid': '', 'time': '', 'key': ''}
-        response = None
-        total_num = None
-        while not (response and total_num):
-            response = self.request_html('GET', self.ajax_url,
-                                         params=params, timeout=TIMEOUT,
-                                         headers=self.config_header('ajax'))
-            if response:
-                if response.json().get('data'):
-                    total_num = response.json()['data'].get('total')
-        print('2>> Success getting page num.')
+    # 问答异步加载页面数方法
+    def page_count(self, scope, data):
         # 一次加载有20个数据
-        return (total_num//20)+1
+        return (data.get('total') or 0)//20 + 1
 
     # 解析问答数据方法
     def parse_question(self, html):
         # 文档字符串
         '''
         Parses given question page's info data, pack them into a list and
-        return them.
+        return them. Near-duplicate questions are dropped if `deduper` is set.
 
         :Args:
-         - html : a str of html source code of given question page.
+         - html : a response, bytes or str of given question page.
 
         :Returns:
          - a list of parsed question's info data.
         '''
         # 方法实现
-        return etree.HTML(html).xpath('//li[contains(@class, "item clearfix")]'
-                                      '/div[@class="title"]/a/text()')
+        questions = self.extract_questions(html)
+        if self.deduper:
+            questions = list(self.deduper.filter(questions))
+        return questions
+
+    # 问题提取方法
+    def extract_questions(self, html):
+        return extract('question', html)
+
 
+# 百度API错误状态异常
+class BaiduApiError(RuntimeError):
+    # 文档字符串
+    '''
+    BaiduApiError class is raised for Baidu API statuses other than rate
+    limit and key statuses, e.g. 1 of server error or 2 of bad params.
+    '''
+
+    def __init__(self, status, message=''):
+        super(BaiduApiError, self).__init__(f'百度API返回状态{status}：{message}')
+        self.status = status
 
+
+# 百度地图POI爬虫子类：
 class BaiduPoiSpider(BaseSpider):
     # 文档字符串
     '''
@@ -913,6 +1244,7 @@ class BaiduPoiSpider(BaseSpider):
 
     '''
     # 类静态成员定义
+    ITEM_KIND = 'poi'
     city_coord = {
         "海口": [(19.926987, 110.157237), (20.145149, 110.572326)],
     }
@@ -943,26 +1275,50 @@ class BaiduPoiSpider(BaseSpider):
 
     base_url = ("http://api.map.baidu.com/place/v2/search?"
                 "output=json&page_size=20&scope=2")
+    QUEUES = ('baidu:page',)
+    # 状态错误的任务重试也不会成功，配额用完时停止工作者，配额恢复后继续爬取
+    FATAL_ERRORS = (BaiduApiError,)
+    STOP_ERRORS = (QuotaExhausted,)
+    FIRST_PAGE = 0
+    # 并发超限时稍后重试的状态码，配额用完或ak无效时停用ak的状态码
+    RATE_STATUS = (401, 402)
+    # query_page已按key配额重试，分页列表不再重试，避免重试次数叠加
+    PAGE_RETRIES = 0
+    KEY_STATUS = (4, 5, 101, 102, 200, 201, 202, 203, 210, 211, 220, 230,
+                  240, 250, 251, 252, 260, 261, 301, 302)
 
     # 初始化方法
-    def __init__(self, baidu_ak, area_name="海口", tag="交通设施"):
+    def __init__(self, baidu_ak, area_name="海口", tag="交通设施", bounds=None,
+                 **kwargs):
         # 文档字符串
         '''
         Initialize a new instance of the BaiduPoiSpider.
 
         :Args:
-         - baidu_ak : an str of ak of Baidu Web Place API.
+         - baidu_ak : a str of ak of Baidu Web Place API, or a list of aks
+         (or dicts of `ak`, `qps` and `quota`) which requests are spread
+         across.
          - area_name : a str of Chinese area name which data are located in.
-         - tag : a str of type tag of baidu poi data. Please refer to Baidu API
-         WebSite for all defined type tags.
+         - tag : a str of type tag of baidu poi data, a list of tags, or
+         `all` for all `LEGAL_TAGS`. Please refer to Baidu API WebSite for
+         all defined type tags.
+         - bounds : a (southwest, northeast) pair of (lat, lng) coordinates
+         of the area, None to look up `city_coord`.
+         - **kwargs : key words arguments of :class:`BaseSpider`.
 
         '''
         # 方法实现
-        if tag not in self.LEGAL_TAGS:
+        tags = list(self.LEGAL_TAGS) if tag == 'all' else \
+            [tag] if isinstance(tag, str) else list(tag)
+        if not tags or any(tag not in self.LEGAL_TAGS for tag in tags):
             raise RuntimeError('请求类型TAG指定有误，请输入合法类型TAG')
-        super(BaiduPoiSpider, self).__init__(area_name)
-        self.tag = tag
-        self.ak = baidu_ak
+        if bounds is None and area_name not in self.city_coord:
+            raise RuntimeError(f'未配置{area_name}的坐标范围，请指定bounds！')
+        super(BaiduPoiSpider, self).__init__(area_name, **kwargs)
+        self.tags = tags
+        self.tag = tags[0]
+        self.bounds = bounds or self.city_coord[area_name]
+        self.keys = KeyPool(baidu_ak)
 
     # HTTP请求头配置方法
     def config_header(self):
@@ -976,7 +1332,7 @@ class BaiduPoiSpider(BaseSpider):
         # 方法实现
         # 可以使用python第三方库fake-useragent实现随机user-agent
         useragent = random.choice(USER_AGENTS)
-        print('1> user agent:', useragent)
+        logger.debug('1> user agent: %s', useragent)
         return {
             'Accept': ('text/html,application/xhtml+xml,application/xml;q=0.9,'
                        'image/webp,image/apng,*/*;q=0.8'),
@@ -999,11 +1355,11 @@ class BaiduPoiSpider(BaseSpider):
          - delta : a float of length of small rectangle.
         '''
         # 方法实现
-        coord_sw, coord_ne = self.city_coord[self.area_name]
-        print(coord_sw, coord_ne)
+        coord_sw, coord_ne = self.bounds
+        logger.debug('>> city rectangle: %s %s', coord_sw, coord_ne)
         lat_count = int((coord_ne[0]-coord_sw[0])/delta + 1)
         lng_count = int((coord_ne[1]-coord_sw[1])/delta + 1)
-        print(lat_count, lng_count)
+        logger.debug('>> rectangles: %s x %s', lat_count, lng_count)
 
         self.coord_list = list()
 
@@ -1014,80 +1370,172 @@ class BaiduPoiSpider(BaseSpider):
                 small_rect = ','.join([str(lat), str(lng), str(lat+delta), str(lng+delta)])
                 self.coord_list.append(small_rect)
 
-        print(self.coord_list)
+        logger.debug('>> bounds: %s', self.coord_list)
 
-    # 爬虫主程序
-    def run(self, ):
+    # POI分页查询方法
+    def query_page(self, tag, bound, page):
         # 文档字符串
         '''
-        Main spider method of BaiduPoiSpider.
+        Queries one poi page of `tag` in `bound` with a key of the key pool.
+        Every attempt hits the API, so every attempt reserves a key: failed
+        requests are retried up to `FETCH_RETRIES` times, and concurrency
+        limited ones up to `BAIDU_RATE_RETRIES` times, the only retries of a
+        page since `PAGE_RETRIES` is 0. Keys reported out of quota or invalid
+        are dropped for today and the query moves on to another key.
 
+        :Returns:
+         - result : a dict of Baidu API response, or None if request failed.
 
+        :Raises:
+         - QuotaExhausted : quota of all keys are used up.
+         - BaiduApiError : the API reported another error status.
         '''
-        self.coord_div(0.03)
+        # 方法实现
+        failures = limited = 0
+        while True:
+            ak = self.keys.acquire()
+            response = self.request_html("GET", self.base_url,
+                                         timeout=TIMEOUT, retries=1,
+                                         params={"bounds": bound, "ak": ak,
+                                                 "page_num": page,
+                                                 "query": tag},
+                                         headers=self.config_header())
+            if not response:
+                failures += 1
+                if failures >= FETCH_RETRIES:
+                    return None
+                continue
+            with metrics.timer(stage='parse', page='poi'):
+                result = response.json()
+            status = result['status']
+            if status == 0:
+                return result
+            if status in self.RATE_STATUS:
+                limited += 1
+                if limited > BAIDU_RATE_RETRIES:
+                    logger.warning('>> %s %s page %s still rate limited.',
+                                   tag, bound, page)
+                    return None
+                self.keys.backoff(ak, limited)
+            elif status in self.KEY_STATUS:
+                self.keys.exhaust(ak, result.get('message', status))
+            else:
+                raise BaiduApiError(status, result.get('message', ''))
 
-        for bound in self.coord_list:
-            print('>> start fetching:', bound)
-            num = 1
-            for page in range(0, self.get_page_num(bound)):
-                print(f'>> {bound} request page {page}')
-                para = {"bounds": bound, "ak": self.ak,
-                        "page_num": page, "query": self.tag}
-                response = self.request_html("GET", self.base_url,
-                                             params=para,
-                                             timeout=TIMEOUT,
-                                             headers=self.config_header())
-                time.sleep(1)
-                if response:
-                    if response.json()['status'] != 0:
-                        raise RuntimeError(response.json()['message'])
-                    self.data.extend(response.json()['results'])
+    # 分页列表页下载方法
+    def fetch_list(self, scope, page):
+        tag, bound = scope
+        return self.query_page(tag, bound, page)
 
-                else:
-                    print(f'>>> Failure getting page {page}.')
-                    # 防止网络不可靠情况下，爬虫一直运行下去：
-                    if num == 1:
-                        num += 1
-                        lastPage = page
-                    else:
-                        if page != lastPage + 1:
-                            num = 1
-                        elif num <= 10:
-                            num += 1
-                            lastPage = page
-                        else:
-                            raise ValueError('NetWork Unavailable!')
-            print('>> end fetching:', bound)
-
-        print(self.data, len(self.data))
-        self.dump_data()
+    # POI分页数方法
+    def page_count(self, scope, result):
+        return result['total']//20 + 1
 
-    def get_page_num(self, bound):
+    # 爬虫主程序
+    def run(self, delta=0.03):
         # 文档字符串
         '''
-        Get total page number of Baidu Poi given bound para.
+        Main spider method of BaiduPoiSpider.
 
-        :Returns:
-         - page_num : an int of Baidu POI Response total page num.
+        Tiles the area once and crawls tags one by one, see `crawl_tag`. A
+        tag the API reports an error for is skipped, and the crawl stops
+        early if quota of all keys are used up; pois got so far are always
+        dumped and quota usage is always saved.
+
+        :Args:
+         - delta : a float of length of small rectangle.
         '''
         # 方法实现
-        print('2>> Getting page num.')
-        para = {"bounds": bound, "ak": self.ak,
-                "page_num": 0, "query": self.tag}
-        response = self.request_html("GET", self.base_url,
-                                     params=para, timeout=TIMEOUT,
-                                     headers=self.config_header())
-
-        if not response:
-            raise RuntimeError("Request Error!")
-        elif response.json()['status'] != 0:
-            raise RuntimeError(response.json()['message'])
+        self.coord_div(delta)
+        logger.info('>>> %s tags x %s bounds, %s requests of quota left.',
+                    len(self.tags), len(self.coord_list),
+                    self.keys.remaining())
+        pois = dict()
+        failed = list()
+        try:
+            for tag in self.tags:
+                try:
+                    self.crawl_tag(tag, pois)
+                except BaiduApiError as e:
+                    # 单个TAG出错不影响其他TAG
+                    failed.append(tag)
+                    logger.warning('>>> tag %s failed: %s', tag, e)
+        except QuotaExhausted as e:
+            logger.warning('>>> %s crawl stopped early.', e)
+        finally:
+            # 无论是否中断，都记录配额使用并保存已获取的数据
+            self.keys.save()
+            self.data = list(pois.values())
+            logger.info('>> %s pois fetched, failed tags: %s.',
+                        len(self.data), failed)
+            self.dump_data()
+        self.report()
+
+    # 单个TAG爬取方法
+    def crawl_tag(self, tag, pois):
+        # 文档字符串
+        '''
+        Paginates all tiles of `tag` concurrently, the first page of a tile
+        tells its other pages. Pois are merged into `pois` by `uid` with all
+        tags they were found by.
+        '''
+        # 方法实现
+        for (tag, bound), page, result in self.paginate(
+                (tag, bound) for bound in self.coord_list):
+            if result is None:
+                logger.warning('>>> Failure getting %s %s page %s.',
+                               tag, bound, page)
+                continue
+            for poi in result['results']:
+                uid = poi.get('uid') or json.dumps(poi, sort_keys=True)
+                poi = pois.setdefault(uid, dict(poi, tags=list()))
+                if tag not in poi['tags']:
+                    poi['tags'].append(tag)
+            metrics.inc('items_total', stage='parse', page='poi',
+                        value=len(result['results']))
+
+    # 运行报告方法
+    def report(self):
+        # 记录当天配额使用，供当天后续运行扣除
+        self.keys.save()
+        super(BaiduPoiSpider, self).report()
+
+    # 分布式初始任务生成方法
+    def seed_tasks(self):
+        self.coord_div(0.03)
+        for tag in self.tags:
+            for bound in self.coord_list:
+                yield 'baidu:page', f'{tag}|{bound}|{self.FIRST_PAGE}', \
+                    {'tag': tag, 'bound': bound, 'page': self.FIRST_PAGE}
 
-        print('>> Success getting page num.')
-        return (response.json()['total']//20) + 1
+    # 分布式任务处理方法
+    def handle_task(self, task):
+        # 文档字符串
+        '''
+        Crawls a poi page of a tag in a bound into poi items keyed by `uid`,
+        the first page of a bound also pushes tasks of the other pages.
+        '''
+        # 方法实现
+        tag = task.payload.get('tag', self.tag)
+        bound, page = task.payload['bound'], task.payload['page']
+        result = self.query_page(tag, bound, page)
+        if result is None:
+            return None
+        tasks = list()
+        if page == self.FIRST_PAGE:
+            tasks = [('baidu:page', f'{tag}|{bound}|{num}',
+                      {'tag': tag, 'bound': bound, 'page': num})
+                     for num in self.rest_pages((tag, bound), result)]
+        return tasks, [(poi.get('uid') or json.dumps(poi, sort_keys=True),
+                        dict(poi, tags=[tag])) for poi in result['results']]
 
 
 if __name__ == '__main__':
-    ak = "XGdhWf1K4iAPGjSrcLA81TsWb2OuUFn0"
-    spider = BaiduPoiSpider(ak)
-    spider.run()
+    from profiler import entry_point
+    from settings import BAIDU_AKS
+    entry_point('BaiduPoiSpider', {
+        'MafengwoSpider': lambda: MafengwoSpider().run(),
+        'CtripSpider': lambda: CtripSpider().run(),
+        'MafengwoQASpider': lambda: MafengwoQASpider().run(),
+        'BaiduPoiSpider': lambda: BaiduPoiSpider(BAIDU_AKS).run(),
+    })
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# 模块字符串：
+'''
+Defines HTTP transports which the Fetcher sends requests through: the
+default HTTP/1.1 transport of `requests`, and an HTTP/2 transport of an
+`httpx` async client which multiplexes requests over a few connections.
+'''
+
+
+# 导入模块：
+# 标准库导入
+import asyncio
+import threading
+
+# 相关第三方库导入
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ProxyError, HTTPError, RequestException, \
+                                Timeout, ReadTimeout, TooManyRedirects
+
+# 本地库导入
+from settings import HTTP2_CONNECTIONS, TIMEOUT
+
+
+# 全局变量：
+# HTTP/2禁止的逐跳首部，以及旧版爬虫请求头中的伪首部
+HOP_HEADERS = ('connection', 'proxy-connection', 'keep-alive', 'upgrade',
+               'transfer-encoding', 'authority', 'host')
+
+
+# 函数定义：
+
+# 传输层创建函数
+def get_transport(transport, workers):
+    # 文档字符串
+    '''
+    Returns a transport instance.
+
+    :Args:
+     - transport : a str of transport name in `TRANSPORTS`, or a transport
+     instance which is returned as is.
+     - workers : an int of concurrent requests of the fetcher.
+    '''
+    # 方法实现
+    if not isinstance(transport, str):
+        return transport
+    if transport not in TRANSPORTS:
+        raise RuntimeError(f'传输方式{transport}不存在，请输入'
+                           f'{"、".join(TRANSPORTS)}！')
+    return TRANSPORTS[transport](workers)
+
+
+# 类定义：
+
+# requests传输层
+class RequestsTransport(object):
+    # 文档字符串
+    '''
+    RequestsTransport class sends HTTP/1.1 requests of `requests` with one
+    keep-alive session per fetch thread, so a connection serves one request
+    at a time.
+    '''
+
+    # 类静态成员定义
+    # 可重试的请求异常和其他请求异常
+    RETRY_ERRORS = (Timeout, ProxyError, HTTPError, ReadTimeout,
+                    TooManyRedirects)
+    ERRORS = (RequestException,)
+
+    # 初始化方法
+    def __init__(self, workers):
+        self.workers = workers
+        self.local = threading.local()
+        self.sessions = list()
+
+    # 线程会话获取方法
+    def session(self):
+        # 文档字符串
+        '''
+        Returns the keep-alive session of current thread.
+        '''
+        # 方法实现
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers,
+                                  pool_maxsize=self.workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.local.session = session
+            self.sessions.append(session)
+        return session
+
+    # HTTP请求方法
+    def request(self, method, url, **kwargs):
+        return self.session().request(method, url, **kwargs)
+
+    # 响应状态检查方法
+    def raise_for_status(self, response):
+        response.raise_for_status()
+
+    # 响应体分块读取方法
+    def iter_body(self, response, chunk_size):
+        return response.iter_content(chunk_size)
+
+    # 响应释放方法
+    def release(self, response):
+        # 未读完的流式响应直接断开连接，不再下载剩余内容
+        response.close()
+
+    # 会话关闭方法
+    def close(self):
+        # 文档字符串
+        '''
+        Closes sessions of all threads.
+        '''
+        # 方法实现
+        for session in self.sessions:
+            session.close()
+        self.sessions = list()
+        self.local = threading.local()
+
+
+# HTTP/2传输层
+class Http2Transport(object):
+    # 文档字符串
+    '''
+    Http2Transport class sends requests through an `httpx` async client
+    with HTTP/2 enabled, running on an event loop in its own thread. Fetch
+    threads hand their requests over to the loop and wait for responses, so
+    requests of all threads are multiplexed as streams over at most
+    `connections` connections per host, and br bodies are decoded if
+    `brotli` is installed. Raise the fetcher's `workers` to put more
+    requests in flight.
+
+    It takes the keyword arguments of `requests`: `params`, `data`, `json`,
+    `headers`, `timeout`, `proxies` and `allow_redirects`. Hop-by-hop
+    headers which HTTP/2 forbids are dropped. A missing `timeout` falls
+    back to `TIMEOUT` instead of disabling timeouts. `stream` is ignored,
+    bodies are always read on the event loop.
+
+    :Usage:
+        fetcher = Fetcher(workers=64, transport='http2')
+
+    '''
+
+    # 初始化方法
+    def __init__(self, workers, connections=HTTP2_CONNECTIONS, http1=True,
+                 transport=None):
+        # 文档字符串
+        '''
+        Initialize a new instance of the Http2Transport.
+
+        :Args:
+         - workers : an int of concurrent requests of the fetcher.
+         - connections : an int of maximum connections per host.
+         - http1 : a bool of whether to fall back to HTTP/1.1 for hosts
+         without HTTP/2, False to speak HTTP/2 with prior knowledge, e.g.
+         to a cleartext h2c server.
+         - transport : an httpx async transport of clients, e.g.
+         `httpx.MockTransport` in tests, None for network connections.
+        '''
+        # 方法实现
+        # 按需导入httpx，默认的requests传输层不依赖它
+        import httpx
+        self.httpx = httpx
+        self.RETRY_ERRORS = (httpx.TimeoutException, httpx.ProxyError,
+                             httpx.HTTPStatusError, httpx.TooManyRedirects,
+                             httpx.RemoteProtocolError)
+        self.ERRORS = (httpx.HTTPError, httpx.InvalidURL)
+        self.workers = workers
+        self.connections = connections
+        self.http1 = http1
+        self.transport = transport
+        self.clients = dict()
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # 事件循环启动方法
+    def start(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever,
+                                               name='http2', daemon=True)
+                self.thread.start()
+        return self.loop
+
+    # 客户端获取方法
+    def client(self, proxy):
+        # 文档字符串
+        '''
+        Returns the async client of `proxy` in the event loop thread, every
+        proxy needs its own connections.
+        '''
+        # 方法实现
+        client = self.clients.get(proxy)
+        if client is None:
+            limits = self.httpx.Limits(max_connections=self.connections,
+                                       max_keepalive_connections=(
+                                           self.connections))
+            client = self.clients[proxy] = self.httpx.AsyncClient(
+                http1=self.http1, http2=True, proxy=proxy, limits=limits,
+                transport=self.transport)
+        return client
+
+    # 异步请求方法
+    async def send(self, proxy, method, url, **kwargs):
+        return await self.client(proxy).request(method, url, **kwargs)
+
+    # HTTP请求方法
+    def request(self, method, url, **kwargs):
+        # 文档字符串
+        '''
+        Sends a request on the event loop and waits for its response.
+
+        :Returns:
+         - a :class:`httpx.Response`, which has `text`, `content`, `json`,
+           `encoding` and `raise_for_status` as a `requests` response.
+        '''
+        # 方法实现
+        proxy = (kwargs.pop('proxies', None) or {}).get('http')
+        timeout = kwargs.pop('timeout', None) or TIMEOUT
+        if isinstance(timeout, tuple):
+            timeout = self.httpx.Timeout(timeout[1], connect=timeout[0])
+        kwargs['headers'] = {key: value for key, value
+                             in (kwargs.get('headers') or {}).items()
+                             if key.lower() not in HOP_HEADERS}
+        kwargs['follow_redirects'] = kwargs.pop('allow_redirects', True)
+        kwargs.pop('stream', None)
+        future = asyncio.run_coroutine_threadsafe(
+            self.send(proxy, method, url, timeout=timeout, **kwargs),
+            self.loop or self.start())
+        return future.result()
+
+    # 响应状态检查方法
+    def raise_for_status(self, response):
+        # httpx对3xx也抛出异常，与requests一致只检查4xx和5xx
+        if response.is_error:
+            response.raise_for_status()
+
+    # 响应体分块读取方法
+    def iter_body(self, response, chunk_size):
+        return response.iter_bytes(chunk_size)
+
+    # 响应释放方法
+    def release(self, response):
+        # 响应体已在事件循环中读完，连接由客户端继续复用
+        pass
+
+    # 连接关闭方法
+    def close(self):
+        # 文档字符串
+        '''
+        Closes clients and stops the event loop, it starts again on next
+        request.
+        '''
+        # 方法实现
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+
+        async def close_clients():
+            for client in self.clients.values():
+                await client.aclose()
+
+        asyncio.run_coroutine_threadsafe(close_clients(), loop).result()
+        self.clients = dict()
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join()
+        loop.close()
+
+
+# 传输方式名称到传输层类的映射
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'http2': Http2Transport,
+}
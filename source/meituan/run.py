@@ -4,10 +4,37 @@
 '''
 Meituan api spider's main runtime program file. In this file, we instantialize
 an instance of MT_spider.
+
+:Usage:
+    python run.py
+    python run.py --frontier ../mafengwo/SmartTripData/Frontier.sqlite
+    python run.py --frontier ../mafengwo/SmartTripData/Frontier.sqlite --no-seed
+    python run.py --profile
 '''
 
+import argparse
+from contextlib import nullcontext
+
 from spider_develop import MeituanSpider
+from settings import filename, logPath
+
+
+parser = argparse.ArgumentParser(description='Runs the meituan restaurants spider.')
+parser.add_argument('--frontier', help='shared frontier queue path, runs the '
+                                       'spider as a distributed worker')
+parser.add_argument('--no-seed', action='store_true',
+                    help='join a frontier seeded by another worker')
+parser.add_argument('--profile', action='store_true',
+                    help='profile the run and write artefacts into '
+                         f'{logPath}')
+args = parser.parse_args()
 
+# 性能分析模块位于马蜂窝爬虫目录，已由spider_develop加入sys.path
+if args.profile:
+    from profiler import Profiler
+    profiler = Profiler('MeituanSpider', out_dir=logPath)
+else:
+    profiler = nullcontext()
 
 # saveMode ：txt存储为txt文件，csv存储为csv文件，
 # mongodb存储在mongo数据库中，neo4j存储在neo4j数据库中，无输入默认为txt
@@ -17,4 +44,10 @@ spider = MeituanSpider(saveMode='neo4j')
 # spider = MeituanSpider(saveMode='mongodb')
 # spider = MeituanSpider(saveMode='csv')
 
-spider.run()
+with spider, profiler:
+    if args.frontier:
+        from frontier import Frontier
+        with Frontier(args.frontier, scope=filename) as frontier:
+            spider.run_worker(frontier, seed=not args.no_seed)
+    else:
+        spider.run()
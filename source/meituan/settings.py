@@ -22,6 +22,10 @@ headers = [
 # limit setting variable used to limit numbers of restaurants in one request:
 limit = 25
 
+# Distributed crawl setting variable, number of offset pages crawled at once
+# from a shared frontier:
+pageWindow = 4
+
 # Data storage path and filename(.csv or .txt file) setting variables:
 savePath = './meituanRestaurantsInfos'
 filename = 'HaikouRestaurants'
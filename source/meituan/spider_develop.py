@@ -9,16 +9,26 @@ restaurants infos in haikou city.
 import csv
 import json
 import os
+import sys
+import importlib.util
 
 import requests
-import pymysql
 
 import random
 import time
 
-from pymongo import MongoClient
-from py2neo import Graph, Node
-from settings import headers,savePath,filename,mongoConf,collection,limit,neoConf,logPath
+# 美团配置模块与马蜂窝爬虫的settings同名，按文件路径导入为meituan_settings，
+# 美团爬虫才能作为crawl.py的任务在马蜂窝爬虫进程中运行
+spec = importlib.util.spec_from_file_location('meituan_settings', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'settings.py'))
+sys.modules[spec.name] = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sys.modules[spec.name])
+from meituan_settings import headers,savePath,filename,mongoConf,collection,limit,neoConf,logPath,pageWindow
+
+# 共享的数据库连接器模块位于马蜂窝爬虫目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'mafengwo'))
+from connector import registry
 
 
 class MeituanSpider(object):
@@ -38,6 +48,11 @@ class MeituanSpider(object):
                 '累计售出份数','餐厅简介','特色菜','是否小吃','有无外卖','上周订单数',
                 '历史订单数','wifi','支持预定']
     poiList = list()
+    # 接口中的城市94为海口
+    area_name = '海口'
+    # 分布式爬取的任务队列和结果类型
+    QUEUES = ('meituan:offset',)
+    ITEM_KIND = 'restaurant'
 
     # 美团海口地区美食爬虫
     def __init__(self, saveMode='txt'):
@@ -57,20 +72,26 @@ class MeituanSpider(object):
         if saveMode not in self.modeList:
             raise RuntimeError('存储模式指定有误，请输入txt、csv、neo4j或者mongodb')
         self.saveMode = saveMode
+        # 数据文件名和本次保存的商家数
+        self.output = filename
+        self.count = 0
         if not os.path.exists(logPath):
             os.makedirs(logPath)
         self.logObj = open(os.path.join(logPath,'log.txt'), 'w', encoding='utf-8')
 
+        # 使用进程共享的连接器注册表，数据库在第一次存储数据时才连接
+        self.registry = registry
+        self.registry.configure({
+            'mongodb': {'host': mongoConf['host'], 'port': mongoConf['port'],
+                        'username': mongoConf['user'],
+                        'password': mongoConf['password'],
+                        'authSource': mongoConf['database']},
+            'neo4j': neoConf,
+        })
         if self.saveMode == 'mongodb':
             print('>>>> we are in mongodb.')
-            self.database = MongoClient(mongoConf['host'],
-                                        mongoConf['port'])[mongoConf['database']]
-            self.database.authenticate(mongoConf['user'],
-                                       mongoConf['password'])
-            self.collection = self.database[collection]
         elif self.saveMode == 'neo4j':
             print('>>>> we are in neo4j.')
-            self.connector = Graph(**neoConf)
         else:
             print('>>>> we are in files.')
             if not os.path.exists(savePath):
@@ -107,7 +128,74 @@ class MeituanSpider(object):
             time.sleep(random.randint(2,5))
 
 
+    def seed_tasks(self):
+        '''
+        Yields frontier tasks of the first pageWindow offsets, each page found
+        not empty pushes the offset pageWindow pages after it.
+        '''
+        for page in range(pageWindow):
+            yield ('meituan:offset', page*limit, {'offset': page*limit})
+
+
+    def handle_task(self, task):
+        offset = task.payload['offset']
+        itemlist = self.parse(self.baseUrl.format(offset, limit))
+        if not itemlist:
+            return [], []
+        nextOffset = offset + pageWindow*limit
+        return [('meituan:offset', nextOffset, {'offset': nextOffset})], \
+            [(item['poiid'], item) for item in itemlist]
+
+
+    def run_worker(self, frontier, seed=False, planner=None, dump=None):
+        '''
+        Crawls offset pages leased from a shared Frontier until no page is
+        pending or leased, several processes or nodes may run workers on the
+        same frontier.
+
+        :Args:
+         - frontier - Frontier. The frontier shared by workers.
+         - seed - bool. Whether to clear a finished crawl and push the first
+         offsets.
+         - planner - RecrawlPlanner. The planner recording crawled offsets,
+         None to skip recording.
+         - dump - bool. Whether to save all restaurants in sink at the end,
+         None to save them in the seeding worker.
+        '''
+        if seed:
+            frontier.reset(self.QUEUES, [self.ITEM_KIND])
+            frontier.push(self.seed_tasks())
+        while True:
+            tasks = frontier.lease(self.QUEUES)
+            if not tasks:
+                # 等待其他工作者的租约完成或过期
+                if not frontier.active(self.QUEUES) and \
+                        self.QUEUES[0] in frontier.stats():
+                    break
+                time.sleep(random.randint(2,5))
+                continue
+            for task in tasks:
+                try:
+                    newTasks, items = self.handle_task(task)
+                except Exception as e:
+                    self.logObj.write('offset %s failed: %r\n' % (task.key, e))
+                    frontier.release(task)
+                    continue
+                frontier.complete(task, newTasks, [
+                    (self.ITEM_KIND, key, item) for key, item in items])
+                if planner:
+                    planner.observe(task, newTasks, items)
+                print('已成功获取offset %s的%d个商家信息' % (task.key, len(items)))
+                time.sleep(random.randint(2,5))
+        if seed if dump is None else dump:
+            for item in frontier.items(self.ITEM_KIND):
+                if item['poiid'] not in self.poiList:
+                    self.poiList.append(item['poiid'])
+                    self.save_item(item)
+
+
     def save_item(self,item):
+        self.count += 1
         if self.saveMode == 'txt':
             for key,value in item.items():
                 self.file.write(str(key)+':'+str(value) + '\n')
@@ -115,11 +203,13 @@ class MeituanSpider(object):
         elif self.saveMode == 'csv':
             self.csvwriter.writerow(item.values())
         elif self.saveMode == 'mongodb':
-            self.collection.insert_one(item)
+            self.registry.mongodb()[collection].insert_one(item)
         else:
+            # py2neo只在neo4j模式下才导入
+            from py2neo import Node
             meituanShop = Node('restaurant', **item)
             print(dict(meituanShop))
-            self.connector.create(meituanShop)
+            self.registry.neo4j().create(meituanShop)
 
 
     def parse(self,url):
@@ -245,27 +335,25 @@ class MeituanSpider(object):
         return itemlist
 
 
-    def __del__(self):
+    def close(self):
         '''
-        The deconstructor of MeituanSpider class.
-
-        Deconstructs an instance of MeituanSpider, closes MongoDB database and
-        files.
+        Closes log file, data file and database connectors of MeituanSpider.
         '''
         self.logObj.close()
-        if self.saveMode == 'mongodb':
-            print('>>>> closing mongodb.')
-            # self.database.close()
-        elif self.saveMode == 'neo4j':
-            print('>>>> closing neo4j')
-
-        else:
+        self.registry.close()
+        if self.saveMode in ('txt', 'csv'):
             print('>>>> closing file.')
             self.file.close()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 
 # test:
 if __name__ == '__main__':
-    spider = MeituanSpider(saveMode='csv')
-    spider.run()
+    with MeituanSpider(saveMode='csv') as spider:
+        spider.run()
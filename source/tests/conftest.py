@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+'''
+Shared pytest setup: spider modules are flat modules in `mafengwo/`, put it
+on sys.path like `ctripQA/ctripSpider.py` does.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'mafengwo'))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of ResponseArchive: API keys never reach the archive, and an archive
+closed by a fetcher is reopened on next write.
+'''
+
+import gzip
+import os
+
+import pytest
+
+pytest.importorskip('requests')
+
+from archive import ResponseArchive, public_url  # noqa: E402
+from fetcher import Fetcher  # noqa: E402
+
+
+class StubResponse(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.status_code = 200
+        self.reason = 'OK'
+        self.headers = {'Content-Type': 'application/json'}
+        self.content = b'{"status": 0}'
+        self.encoding = 'utf-8'
+
+
+BAIDU_URL = ('http://api.map.baidu.com/place/v2/search?output=json&'
+             'query=%E7%BE%8E%E9%A3%9F&ak=secret-key&page_num=2')
+
+
+def test_public_url_drops_keys_only():
+    assert public_url(BAIDU_URL) == (
+        'http://api.map.baidu.com/place/v2/search?output=json&'
+        'query=%E7%BE%8E%E9%A3%9F&page_num=2')
+    assert public_url('http://a/b?ak=1') == 'http://a/b'
+    assert public_url('http://a/b?akx=1#top') == 'http://a/b?akx=1#top'
+
+
+def test_keys_are_not_archived(tmp_path):
+    with ResponseArchive(str(tmp_path)) as archive:
+        archive.write(StubResponse(BAIDU_URL))
+        (url, *_), = archive.connect().execute('SELECT * FROM records')
+        response = archive.read(BAIDU_URL)
+    assert 'secret-key' not in url
+    assert response.url == url
+    for name in os.listdir(str(tmp_path)):
+        if name.endswith('.warc.gz'):
+            with gzip.open(str(tmp_path / name)) as file:
+                assert b'secret-key' not in file.read()
+
+
+def test_fetcher_close_closes_archive(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    fetcher = Fetcher(archive=archive)
+    archive.write(StubResponse('http://a/1'))
+    fetcher.close()
+    assert archive.file is None and archive.connection is None
+    archive.write(StubResponse('http://a/2'))
+    assert archive.count()[:2] == (2, 2)
+    archive.close()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+'''
+Round trip tests of the file save backends.
+'''
+
+import pytest
+
+from backends import get_backend, backend_names
+
+
+HOTELS = [
+    {'hotel_id': 345, 'hotel_name': '三亚酒店', 'lowest_price': 388,
+     'hotel_score': 4.6, 'ctrip_qualified': True, 'newbooking': None,
+     'hotel_label': ['免费', 'wifi'], 'recommend': '123', 'contact': '',
+     'hotel_policy': {'入住': '14:00以后'}, 'address': 'null'},
+    {'hotel_id': 346, 'hotel_name': 'B', 'lowest_price': 99,
+     'hotel_score': 0, 'ctrip_qualified': False, 'newbooking': '1小时前',
+     'hotel_label': [], 'recommend': 'true', 'contact': '"quoted"',
+     'hotel_policy': {}, 'address': '海棠湾 路'},
+]
+
+
+@pytest.mark.parametrize('save_mode', [
+    name for name in backend_names('file', 'records')
+    if not get_backend(name).requires])
+def test_records_round_trip(save_mode, tmp_path):
+    backend = get_backend(save_mode, kind='file')
+    path = backend.path('Hotels', str(tmp_path))
+    backend.dump(HOTELS, path, 'hotel', '三亚')
+    assert backend.load(path, '三亚') == HOTELS
+
+
+@pytest.mark.parametrize('save_mode', backend_names('file', 'stream'))
+def test_stream_backends_take_iterators(save_mode, tmp_path):
+    backend = get_backend(save_mode, kind='file')
+    path = backend.path('Items', str(tmp_path))
+    items = ['q1', 'q2'] if save_mode == 'txt' else HOTELS
+    backend.dump(iter(items), path, None, 'all')
+    assert backend.load(path) == items
+
+
+@pytest.mark.parametrize('save_mode', ['parquet', 'feather'])
+def test_columnar_keeps_nested_map_values(save_mode, tmp_path):
+    pytest.importorskip('pyarrow')
+    backend = get_backend(save_mode, kind='file')
+    path = backend.path('POIs', str(tmp_path))
+    detail = {'tag': '美食', 'overall_rating': 4.5, 'price': None,
+              'children': [{'uid': 'b'}]}
+    backend.dump([{'uid': 'a', 'detail_info': detail}], path, 'poi')
+    (record,) = backend.load(path)
+    assert record['detail_info'] == detail
+
+
+@pytest.mark.parametrize('kind', [None, 'restaurant'])
+def test_columnar_kinds_without_schema(kind, tmp_path):
+    pytest.importorskip('pyarrow')
+    backend = get_backend('parquet', kind='file')
+    path = backend.path('Items', str(tmp_path))
+    backend.dump(HOTELS, path, kind)
+    assert backend.load(path) == HOTELS
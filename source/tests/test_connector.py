@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of ConnectorRegistry confs and returning MySQL connections.
+'''
+
+from connector import ConnectorRegistry
+
+
+class StubConnection(object):
+    def __init__(self):
+        self.open = True
+        self.closes = 0
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        if not self.open:
+            raise RuntimeError('Already closed')
+        self.open = False
+        self.closes += 1
+
+
+def borrowed(registry):
+    connection = StubConnection()
+    registry.clients.setdefault('mysql', list()).append(connection)
+    return connection
+
+
+def test_release_after_close_closes_connection():
+    registry = ConnectorRegistry({'mysql': {}}, pool_size=4)
+    connection = borrowed(registry)
+    registry.close()
+    registry.release_mysql(connection)
+    assert connection.closes == 1
+    assert registry.mysql_pool.empty()
+
+
+def test_release_of_unknown_connection_is_closed():
+    registry = ConnectorRegistry({'mysql': {}}, pool_size=4)
+    connection = StubConnection()
+    registry.release_mysql(connection)
+    assert not connection.open
+    assert registry.mysql_pool.empty()
+
+
+def test_release_pools_or_closes_owned_connections():
+    registry = ConnectorRegistry({'mysql': {}}, pool_size=1)
+    first, second = borrowed(registry), borrowed(registry)
+    registry.release_mysql(first)
+    registry.release_mysql(second)
+    assert registry.acquire_mysql() is first
+    assert not second.open
+    assert registry.clients['mysql'] == [first]
+
+
+def test_configure_keeps_configured_backends():
+    registry = ConnectorRegistry({'mongodb': {'host': 'a'}})
+    registry.configure({'mongodb': {'host': 'b'}, 'neo4j': {'host': 'c'}})
+    assert registry.conf('mongodb') == {'host': 'a'}
+    assert registry.conf('neo4j') == {'host': 'c'}
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of QuestionDeduper buckets persisted in its SQLite index.
+'''
+
+import sqlite3
+
+from dedup import QuestionDeduper
+
+
+QUESTION = '三亚哪里好玩？'
+NEAR = '三亚哪里好玩'
+
+
+def test_buckets_are_stable_digests(tmp_path):
+    with QuestionDeduper(str(tmp_path / 'dedup.sqlite')) as deduper:
+        keys = list(deduper.band_keys(deduper.signature(NEAR)))
+    assert keys[:2] == [(0, -4633007052754095546),
+                        (1, -6471899750044384126)]
+
+
+def test_index_of_old_buckets_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite')
+    with QuestionDeduper(path) as deduper:
+        assert list(deduper.filter([QUESTION])) == [QUESTION]
+    connection = sqlite3.connect(path)
+    connection.execute("DELETE FROM meta WHERE key = 'bucket_version'")
+    connection.execute('UPDATE buckets SET bucket = bucket + 1')
+    connection.commit()
+    connection.close()
+    with QuestionDeduper(path) as deduper:
+        assert deduper.is_duplicate(NEAR)
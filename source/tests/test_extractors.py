@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+'''
+Parity tests of parser backends: every backend must give the same items as
+the lxml reference backend on the checked-in pages of every page type.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('lxml')
+pytest.importorskip('selectolax')
+
+from extractors import PAGE_TYPES, BACKENDS, extract  # noqa: E402
+
+
+PAGES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'fixtures', 'pages')
+
+
+# 与`benchmark.py parity --pages`相同的<page_type>/<name>.html样本布局
+def read_page(page_type, name='sample.html'):
+    with open(os.path.join(PAGES_PATH, page_type, name), 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('page_type', PAGE_TYPES)
+@pytest.mark.parametrize('backend', sorted(set(BACKENDS) - {'lxml'}))
+def test_backend_parity(page_type, backend):
+    for name in sorted(os.listdir(os.path.join(PAGES_PATH, page_type))):
+        page = read_page(page_type, name)
+        assert extract(page_type, page, backend) == \
+            extract(page_type, page, 'lxml'), name
+
+
+def test_resort():
+    item = extract('resort', read_page('resort'), 'lxml')
+    assert item['resortName'] == '天涯海角'
+    assert (item['areaName'], item['areaId']) == ('三亚', 10030)
+    assert item['address'] == '三亚市天涯区'
+    assert item['poi'] == '{"poi_id":"3474"}'
+    assert item['details'] == {'交通': '公交 25路', '门票': '81元'}
+    assert item['baseinfo'] == {'tel': '0898-123', 'item_site': 'http://x'}
+
+
+def test_hotel_list():
+    result = extract('hotel_list', read_page('hotel_list'), 'lxml')
+    assert result['pages'] == 37
+    first, second = result['hotels']
+    assert (first['hotel_id'], first['hotel_name']) == (345, '三亚酒店')
+    assert (first['business_zone'], first['lowest_price']) == ('大东海', 388)
+    assert first['hotel_label'] == ['免费', '停车 ', 'wifi']
+    assert (first['ctrip_star'], first['ctrip_qualified']) == (4, True)
+    assert first['ctrip_corporate'] == 'ico_partner_gold'
+    assert (first['hotel_score'], first['judge_count']) == (4.6, 1200)
+    assert (second['country_star'], second['hotel_level']) == (5, None)
+
+
+def test_hotel_detail():
+    detail = extract('hotel_detail', read_page('hotel_detail'), 'lxml')
+    assert detail['contact'] == '0898-88888888'
+    assert detail['hotel_facilities'] == {'通用': ['wifi', '电梯']}
+    assert detail['hotel_policy'] == {'入住': '14:00 以后'}
+    assert detail['surround_facilities'] == {'交通': ['机场 ', '火车站']}
+
+
+def test_question():
+    assert extract('question', read_page('question'), 'lxml') == [
+        '三亚哪里好玩？', '海口住哪里方便']
+
+
+def test_ask():
+    questions, last_page = extract('ask', read_page('ask'), 'lxml')
+    assert questions == ['海南 几月 去最好？', '三亚亚龙湾哪家酒店性价比高']
+    assert last_page == 12
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the Fetcher with a stubbed transport: coalescing of identical
+requests in flight and fetch timing.
+'''
+
+import threading
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('lxml')
+
+from fetcher import Fetcher  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+
+PAGE = ('<html><body><div id="hotel_info_comment"><p>简介</p></div>'
+        + '<p>tail</p>' * 1000 + '</body></html>').encode('utf-8')
+TARGET = ('div', 'id', 'hotel_info_comment')
+
+
+class StubResponse(object):
+
+    def __init__(self, url, content, status_code=200):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        self.encoding = None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise StubError(self.status_code)
+
+
+class StubError(Exception):
+    pass
+
+
+class StubTransport(object):
+    '''
+    Serves `PAGE` for every request, the first request is held until
+    `release_first` is set so that concurrent callers pile up behind it.
+    '''
+
+    RETRY_ERRORS = (StubError,)
+    ERRORS = (StubError,)
+
+    def __init__(self):
+        self.calls = list()
+        self.lock = threading.Lock()
+        self.release_first = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.calls.append((method, url, kwargs.get('stream', False)))
+        self.release_first.wait(5)
+        return StubResponse(url, PAGE)
+
+    def raise_for_status(self, response):
+        response.raise_for_status()
+
+    def iter_body(self, response, chunk_size):
+        for i in range(0, len(response.content), chunk_size):
+            yield response.content[i:i+chunk_size]
+
+    def release(self, response):
+        pass
+
+    def close(self):
+        pass
+
+
+def fetch_concurrently(fetch, callers=8):
+    results = [None] * callers
+    started = threading.Barrier(callers + 1)
+
+    def call(num):
+        started.wait()
+        results[num] = fetch()
+
+    threads = [threading.Thread(target=call, args=(num,))
+               for num in range(callers)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    return threads, results
+
+
+@pytest.mark.parametrize('target', [TARGET, None])
+def test_identical_requests_are_coalesced(target):
+    metrics.reset()
+    transport = StubTransport()
+    fetcher = Fetcher(workers=8, transport=transport, archive=False)
+    threads, results = fetch_concurrently(
+        lambda: fetcher.request_until('GET', 'http://stub/a', target,
+                                      params={'p': 1}))
+    # 7个跟随者都等待领头请求后再放行领头请求
+    key = ('requests_coalesced_total', (('host', 'stub'),))
+    for _ in range(500):
+        if metrics.counters.get(key) == 7:
+            break
+        threading.Event().wait(0.01)
+    transport.release_first.set()
+    for thread in threads:
+        thread.join()
+    assert len(transport.calls) == 1
+    assert transport.calls[0][2] == (target is not None)
+    assert all(result is results[0] for result in results)
+
+
+def test_streamed_fetch_is_timed_once():
+    metrics.reset()
+    transport = StubTransport()
+    transport.release_first.set()
+    fetcher = Fetcher(transport=transport, archive=False)
+    page = fetcher.request_until('GET', 'http://stub/b', TARGET)
+    assert page.complete
+    fetches = [histogram.count for (name, labels), histogram
+               in metrics.histograms.items()
+               if name == 'stage_seconds' and ('stage', 'fetch') in labels]
+    assert fetches == [1]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of Frontier job scopes, resets of finished crawls and tasks failed by
+errors which are not retried.
+'''
+
+from fetcher import Fetcher
+from frontier import Frontier, DONE, FAILED, PENDING
+from keypool import QuotaExhausted
+from spider import BaseSpider, BaiduApiError
+
+
+class StubSpider(BaseSpider):
+    ITEM_KIND = 'poi'
+    QUEUES = ('stub:page',)
+    FATAL_ERRORS = (BaiduApiError,)
+    STOP_ERRORS = (QuotaExhausted,)
+
+    def __init__(self, pages, errors=None):
+        super(StubSpider, self).__init__(fetcher=Fetcher(workers=2))
+        self.pages = pages
+        self.errors = errors or dict()
+        self.calls = list()
+
+    def seed_tasks(self):
+        return [('stub:page', page, {'page': page}) for page in self.pages]
+
+    def handle_task(self, task):
+        self.calls.append(task.key)
+        if task.key in self.errors:
+            raise self.errors[task.key]
+        return [], [(task.key, {'page': task.payload['page']})]
+
+
+def test_scopes_keep_jobs_apart(tmp_path):
+    path = str(tmp_path / 'frontier.sqlite')
+    with Frontier(path, scope='sanya') as sanya, \
+            Frontier(path, scope='haikou') as haikou:
+        sanya.push([('stub:page', 1, {})])
+        assert haikou.lease(['stub:page']) == []
+        (task,) = sanya.lease(['stub:page'])
+        assert task.queue == 'stub:page'
+        sanya.complete(task, items=[('poi', 'a', {'id': 'a'})])
+        assert list(sanya.items('poi')) == [{'id': 'a'}]
+        assert list(haikou.items('poi')) == []
+        assert haikou.stats() == {}
+
+
+def test_reset_clears_only_finished_crawls(tmp_path):
+    with Frontier(str(tmp_path / 'frontier.sqlite')) as frontier:
+        frontier.push([('stub:page', 1, {}), ('stub:page', 2, {})])
+        (task,) = frontier.lease(['stub:page'])
+        frontier.complete(task, items=[('poi', 'a', {})])
+        assert not frontier.reset(['stub:page'], ['poi'])
+        (task,) = frontier.lease(['stub:page'])
+        frontier.complete(task)
+        assert frontier.reset(['stub:page'], ['poi'])
+        assert frontier.stats() == {}
+        assert list(frontier.items('poi')) == []
+        assert frontier.push([('stub:page', 1, {})]) == 1
+
+
+def test_rerun_crawls_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'frontier.sqlite')
+    for _ in range(2):
+        spider = StubSpider([1, 2])
+        with Frontier(path) as frontier:
+            spider.run_worker(frontier, seed=True, dump=False)
+        assert sorted(spider.calls) == ['1', '2']
+
+
+def test_api_errors_are_not_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = StubSpider([1, 2], {'1': BaiduApiError(2, '参数错误')})
+    with Frontier(str(tmp_path / 'frontier.sqlite')) as frontier:
+        spider.run_worker(frontier, seed=True, dump=False)
+        assert frontier.stats() == {'stub:page': {DONE: 1, FAILED: 1}}
+    assert sorted(spider.calls) == ['1', '2']
+
+
+def test_quota_exhaustion_stops_and_keeps_tasks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = StubSpider([1], {'1': QuotaExhausted('配额已用完')})
+    with Frontier(str(tmp_path / 'frontier.sqlite')) as frontier:
+        spider.run_worker(frontier, seed=True, dump=False)
+        assert frontier.stats() == {'stub:page': {PENDING: 1}}
+        (task,) = frontier.lease(['stub:page'])
+        assert task.attempts == 1
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of KeyPool quota and time slots shared through its state file.
+'''
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from keypool import KeyPool, QuotaExhausted
+
+
+def acquire_all(state_path):
+    pool = KeyPool(['ak1', 'ak2'], qps=1000, quota=20, state_path=state_path)
+    count = 0
+    try:
+        while True:
+            pool.acquire()
+            count += 1
+    except QuotaExhausted:
+        return count
+
+
+def test_quota_is_shared_across_processes(tmp_path):
+    state_path = str(tmp_path / 'quota.json')
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        counts = list(pool.map(acquire_all, [state_path] * 4))
+    assert sum(counts) == 40
+    with open(state_path, encoding='utf-8') as file:
+        state = json.load(file)
+    (today,) = state.values()
+    assert {ak: key['used'] for ak, key in today.items()} == \
+        {'ak1': 20, 'ak2': 20}
+
+
+def test_pools_merge_instead_of_overwriting(tmp_path):
+    state_path = str(tmp_path / 'quota.json')
+    first = KeyPool('ak1', qps=1000, quota=5, state_path=state_path)
+    second = KeyPool('ak1', qps=1000, quota=5, state_path=state_path)
+    for _ in range(3):
+        first.acquire()
+    second.acquire()
+    second.save()
+    first.save()
+    assert KeyPool('ak1', quota=5, state_path=state_path).remaining() == 1
+    second.acquire()
+    with pytest.raises(QuotaExhausted):
+        first.acquire()
+
+
+def test_time_slots_are_shared(tmp_path):
+    state_path = str(tmp_path / 'quota.json')
+    first = KeyPool('ak1', qps=2, state_path=state_path)
+    second = KeyPool('ak1', qps=2, state_path=state_path)
+    first.acquire()
+    second.acquire()
+    with open(state_path, encoding='utf-8') as file:
+        (today,) = json.load(file).values()
+    # 两个进程的请求占用了相邻的两个时间槽
+    assert today['ak1']['used'] == 2
+    assert today['ak1']['next'] - os.path.getmtime(state_path) > 0.5
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of KeywordIndex incremental counters: questions ingested again are
+not counted twice.
+'''
+
+import json
+
+import pytest
+
+pytest.importorskip('jieba')
+
+from keywords import KeywordIndex  # noqa: E402
+
+
+QUESTIONS = ['三亚哪里的海滩最好玩？', '海口有什么好吃的美食？',
+             '三亚海滩需要门票吗？']
+
+
+def counts(index, area):
+    counters = index.areas[area]
+    return counters['docs'], dict(counters['tf']), dict(counters['df'])
+
+
+def test_ingesting_a_file_again_keeps_counts(tmp_path):
+    path = tmp_path / 'questions.txt'
+    path.write_text('\n'.join(QUESTIONS) + '\n', encoding='utf-8')
+    index_path = str(tmp_path / 'keywords.json')
+    index = KeywordIndex(index_path)
+    assert index.ingest_file(str(path), area='海南') == 3
+    before = counts(index, '海南')
+    assert index.ingest_file(str(path), area='海南') == 0
+    # 重写的文件从头读取，已计数的问题仍被跳过
+    path.write_text('\n'.join(QUESTIONS[:2]) + '\n', encoding='utf-8')
+    reloaded = KeywordIndex(index_path)
+    assert reloaded.ingest_file(str(path), area='海南') == 0
+    assert counts(reloaded, '海南') == before == counts(index, '海南')
+    assert before[0] == 3
+
+
+def test_partial_last_line_is_read_next_time(tmp_path):
+    path = tmp_path / 'questions.txt'
+    path.write_text(QUESTIONS[0] + '\n' + QUESTIONS[1], encoding='utf-8')
+    index = KeywordIndex(str(tmp_path / 'keywords.json'))
+    assert index.ingest_file(str(path), area='海南') == 1
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('\n' + QUESTIONS[2] + '\n')
+    assert index.ingest_file(str(path), area='海南') == 2
+    with open(tmp_path / 'keywords.json', encoding='utf-8') as file:
+        assert len(json.load(file)['seen']['海南']) == 3
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the Prometheus text export of Metrics.
+'''
+
+from metrics import Metrics
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc('items_total', tag='a"b\\c\nd')
+    assert metrics.to_prometheus() == \
+        'smarttrip_items_total{tag="a\\"b\\\\c\\nd"} 1\n'
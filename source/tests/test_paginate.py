@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of BaseSpider.paginate: the first page probes the page count and
+failed pages are retried.
+'''
+
+import os
+from collections import Counter
+
+from fetcher import Fetcher
+from settings import FETCH_RETRIES
+from spider import BaseSpider, MafengwoQASpider, BaiduPoiSpider
+
+
+class ListSpider(BaseSpider):
+    '''
+    Serves a list of 4 pages, pages in `failures` fail that many times.
+    '''
+
+    def __init__(self, failures):
+        super(ListSpider, self).__init__(fetcher=Fetcher(workers=2))
+        self.failures = Counter(failures)
+        self.calls = Counter()
+
+    def fetch_list(self, scope, page):
+        self.calls[page] += 1
+        if self.calls[page] <= self.failures[page]:
+            return None
+        return {'pages': 4, 'page': page}
+
+    def page_count(self, scope, result):
+        return result['pages']
+
+
+def test_failed_pages_are_retried():
+    spider = ListSpider({1: 2, 3: 1})
+    results = {page: result for _, page, result in spider.paginate(['a'])}
+    assert sorted(results) == [1, 2, 3, 4]
+    assert all(results.values())
+    assert spider.calls == {1: 3, 2: 1, 3: 2, 4: 1}
+
+
+def test_pages_failing_every_retry_are_yielded_as_failed():
+    spider = ListSpider({3: 10})
+    results = {page: result for _, page, result in spider.paginate(['a'])}
+    assert results[3] is None
+    assert spider.calls[3] == spider.PAGE_RETRIES + 1
+
+
+class QASpider(MafengwoQASpider):
+    '''
+    Serves 3 ajax question pages of one question each, pages in `failures`
+    fail that many times.
+    '''
+
+    def __init__(self, failures):
+        super(QASpider, self).__init__(fetcher=Fetcher(workers=2))
+        self.failures = Counter(failures)
+        self.calls = Counter()
+
+    def request_html(self, *args, **kwargs):
+        return None
+
+    def fetch_page(self, page):
+        self.calls[page] += 1
+        if self.calls[page] <= self.failures[page]:
+            return None
+        return {'total': 40, 'html': f'q{page}'}
+
+    def extract_questions(self, html):
+        return [html]
+
+
+def test_qa_pages_follow_a_recovered_first_page(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = QASpider({0: BaseSpider.PAGE_RETRIES + 1})
+    spider.run()
+    path = os.path.join('SmartTripData', spider.output + '.txt')
+    with open(path, encoding='utf-8') as file:
+        assert sorted(file.read().split()) == ['q0', 'q1', 'q2']
+    assert spider.calls == {0: BaseSpider.PAGE_RETRIES + 2, 1: 1, 2: 1}
+
+
+class PoiSpider(BaiduPoiSpider):
+    '''
+    Counts Baidu API requests, every request fails.
+    '''
+
+    def __init__(self):
+        super(PoiSpider, self).__init__(
+            [{'ak': 'ak1', 'qps': 1000, 'quota': 1000}],
+            fetcher=Fetcher(workers=2))
+        self.requests = 0
+
+    def request_html(self, *args, **kwargs):
+        self.requests += 1
+        return None
+
+
+def test_failed_poi_pages_are_retried_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = PoiSpider()
+    results = list(spider.paginate([('美食', 'bound')]))
+    assert results == [(('美食', 'bound'), 0, None)]
+    assert spider.requests == FETCH_RETRIES
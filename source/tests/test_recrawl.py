@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of RecrawlPlanner with a scoped Frontier: planned tasks are crawled
+again although they are done, and jobs don't plan each other's tasks.
+'''
+
+import time
+
+from fetcher import Fetcher
+from frontier import Frontier
+from recrawl import RecrawlPlanner, DAY, schedule
+from spider import BaseSpider
+
+
+class PageSpider(BaseSpider):
+    ITEM_KIND = 'poi'
+    QUEUES = ('stub:page',)
+
+    def __init__(self, area_name):
+        super(PageSpider, self).__init__(area_name, fetcher=Fetcher(workers=2))
+        self.calls = list()
+
+    def seed_tasks(self):
+        return [('stub:page', f'{self.area_name}|{page}', {'page': page})
+                for page in (1, 2)]
+
+    def handle_task(self, task):
+        self.calls.append(task.key)
+        return [], [(task.key, {'page': task.payload['page']})]
+
+
+def crawl(tmp_path, area, budget=None, days=365, path='frontier.sqlite'):
+    spider = PageSpider(area)
+    with RecrawlPlanner(str(tmp_path / 'recrawl.sqlite'), {},
+                        scope=area) as planner, \
+            Frontier(str(tmp_path / path), scope=area) as frontier:
+        seed = schedule(planner, frontier, spider.QUEUES, budget,
+                        now=time.time() + days * DAY)
+        spider.run_worker(frontier, seed=seed, planner=planner, dump=False)
+    return sorted(spider.calls)
+
+
+def test_due_done_tasks_are_recrawled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert crawl(tmp_path, 'sanya') == ['sanya|1', 'sanya|2']
+    assert crawl(tmp_path, 'sanya', budget=1) in (['sanya|1'], ['sanya|2'])
+
+
+def test_jobs_only_plan_their_own_tasks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    crawl(tmp_path, 'sanya')
+    assert crawl(tmp_path, 'haikou') == ['haikou|1', 'haikou|2']
+    assert crawl(tmp_path, 'haikou') == ['haikou|1', 'haikou|2']
+
+
+def test_known_job_is_seeded_into_an_empty_frontier(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    crawl(tmp_path, 'sanya')
+    assert crawl(tmp_path, 'sanya', days=0, path='moved.sqlite') == \
+        ['sanya|1', 'sanya|2']
+    assert crawl(tmp_path, 'sanya', days=0, path='moved.sqlite') == []
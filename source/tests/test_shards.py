@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of shard names, stale manifest locks and rewrites of dataset keys.
+'''
+
+import os
+import socket
+
+from shards import ShardWriter, manifest_lock, read_manifest, \
+                   load_shards, write_dataset
+
+
+def test_keys_sanitized_alike_keep_their_shards(tmp_path):
+    path = write_dataset([{'id': 1}], 'Items', 'a b', str(tmp_path))
+    write_dataset([{'id': 2}], 'Items', 'a_b', str(tmp_path))
+    assert load_shards(path, 'a b') == [{'id': 1}]
+    assert load_shards(path, 'a_b') == [{'id': 2}]
+
+
+def test_stale_lock_is_broken(tmp_path):
+    lock_path = tmp_path / 'manifest.lock'
+    lock_path.write_text(f'{socket.gethostname()}-{2 ** 22 + 1}')
+    with manifest_lock(str(tmp_path), timeout=0):
+        assert lock_path.read_text().endswith(f'-{os.getpid()}')
+    assert not lock_path.exists()
+
+
+def test_rewrite_switches_shards_through_manifest(tmp_path):
+    path = write_dataset([{'id': 1}], 'Items', '三亚', str(tmp_path))
+    (old,) = read_manifest('Items', str(tmp_path))['shards']
+    with ShardWriter('Items', '三亚', str(tmp_path)) as writer:
+        writer.write({'id': 2})
+        writer.finish_shard()
+        assert os.path.exists(os.path.join(path, old['file']))
+        assert load_shards(path) == [{'id': 1}]
+    (new,) = read_manifest('Items', str(tmp_path))['shards']
+    assert new['file'] != old['file']
+    assert not os.path.exists(os.path.join(path, old['file']))
+    assert load_shards(path) == [{'id': 2}]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the HTTP/2 transport against a mocked httpx transport: requests
+keep the fetcher's timeout and semantics of the `requests` transport.
+'''
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('h2')
+
+from fetcher import Fetcher  # noqa: E402
+from settings import TIMEOUT  # noqa: E402
+from transport import Http2Transport  # noqa: E402
+
+
+def mocked(handler):
+    requests = list()
+
+    def record(request):
+        requests.append(request)
+        return handler(request)
+
+    return Http2Transport(4, transport=httpx.MockTransport(record)), requests
+
+
+def test_missing_timeout_falls_back_to_settings():
+    transport, requests = mocked(lambda request: httpx.Response(200))
+    try:
+        transport.request('GET', 'http://stub/a', timeout=None,
+                          headers={'Host': 'stub', 'Connection': 'close',
+                                   'User-Agent': 'test'})
+    finally:
+        transport.close()
+    (request,) = requests
+    timeout = request.extensions['timeout']
+    assert (timeout['connect'], timeout['read']) == TIMEOUT
+    # 逐跳首部被丢弃，只剩httpx自己的默认值
+    assert request.headers.get('connection') != 'close'
+    assert request.headers['user-agent'] == 'test'
+
+
+def test_only_error_statuses_raise():
+    statuses = {'/moved': 302, '/missing': 404}
+    transport, _ = mocked(lambda request: httpx.Response(
+        statuses[request.url.path], headers={'Location': '/elsewhere'}))
+    try:
+        moved = transport.request('GET', 'http://stub/moved',
+                                  allow_redirects=False)
+        transport.raise_for_status(moved)
+        missing = transport.request('GET', 'http://stub/missing')
+        with pytest.raises(httpx.HTTPStatusError):
+            transport.raise_for_status(missing)
+    finally:
+        transport.close()
+
+
+def test_fetcher_returns_redirects_when_not_followed():
+    transport, requests = mocked(lambda request: httpx.Response(
+        302, headers={'Location': '/elsewhere'}))
+    fetcher = Fetcher(workers=2, transport=transport, archive=False)
+    try:
+        response = fetcher.request('GET', 'http://stub/moved',
+                                   allow_redirects=False)
+    finally:
+        fetcher.close()
+    assert response.status_code == 302
+    assert len(requests) == 1